@@ -1,7 +1,13 @@
 from django.contrib import admin
-from .models import Choice, Company, Job, CourseCategory, Course, Enrollment, Question, Quiz, QuizAttempt, QuizCategory, UserAnswer
+from django.core.exceptions import ObjectDoesNotExist
+from .models import Choice, Company, Job, JobRecommendation, Tag, CourseCategory, Course, CourseNeighbor, Enrollment, Question, QuestionStats, Quiz, QuizAttempt, QuizCategory, UserAnswer
 from .models import UserProfile, Experience, Education, Skill, Project, Language, Certificate
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'normalized_name']
+    search_fields = ['name', 'normalized_name']
+
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
     list_display = ['name', 'description']
@@ -14,6 +20,16 @@ class JobAdmin(admin.ModelAdmin):
     search_fields = ['title', 'company__name', 'location', 'skills_required']
     list_editable = ['is_active']
 
+@admin.register(JobRecommendation)
+class JobRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'job', 'score', 'computed_at']
+    search_fields = ['user__username', 'job__title']
+
+@admin.register(CourseNeighbor)
+class CourseNeighborAdmin(admin.ModelAdmin):
+    list_display = ['course', 'neighbor', 'score', 'computed_at']
+    search_fields = ['course__title', 'neighbor__title']
+
 @admin.register(CourseCategory)
 class CourseCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'description']
@@ -38,17 +54,57 @@ class QuizCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'description']
     search_fields = ['name']
 
+def _stat(obj, name):
+    # Stats rows appear at the first `manage.py analyze_quizzes` run
+    try:
+        return getattr(obj.stats, name)
+    except ObjectDoesNotExist:
+        return None
+
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'instructor', 'difficulty', 'duration_minutes', 'rating', 'attempts_count', 'is_active']
+    list_display = ['title', 'category', 'instructor', 'difficulty', 'duration_minutes', 'rating', 'attempts_count',
+                    'mean_score', 'reliability', 'is_active']
     list_filter = ['category', 'difficulty', 'is_active', 'created_date']
+    list_select_related = ['category', 'stats']
     search_fields = ['title', 'instructor']
+    
+    @admin.display(description='Mean score')
+    def mean_score(self, obj):
+        return _stat(obj, 'mean_score')
+    
+    @admin.display(description='Reliability (KR-20)')
+    def reliability(self, obj):
+        return _stat(obj, 'reliability')
+
+class QuestionStatsInline(admin.StackedInline):
+    model = QuestionStats
+    can_delete = False
+    readonly_fields = ['responses', 'difficulty', 'discrimination', 'functional_distractors', 'choice_stats', 'computed_at']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ['question_text', 'quiz', 'question_type', 'order', 'points']
+    list_display = ['question_text', 'quiz', 'question_type', 'order', 'points',
+                    'difficulty', 'discrimination', 'functional_distractors']
     list_filter = ['quiz', 'question_type']
+    list_select_related = ['quiz', 'stats']
     search_fields = ['question_text']
+    inlines = [QuestionStatsInline]
+    
+    @admin.display(description='Difficulty (p)')
+    def difficulty(self, obj):
+        return _stat(obj, 'difficulty')
+    
+    @admin.display(description='Discrimination')
+    def discrimination(self, obj):
+        return _stat(obj, 'discrimination')
+    
+    @admin.display(description='Working distractors')
+    def functional_distractors(self, obj):
+        return _stat(obj, 'functional_distractors')
 
 @admin.register(Choice)
 class ChoiceAdmin(admin.ModelAdmin):
@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import pagecache
+from .models import Choice, Question
+
+# Answer keys kept as objects in each process, least recently used first
+LOCAL_KEYS = getattr(settings, 'ANSWER_KEY_LOCAL_SIZE', 256)
+
+_lock = threading.Lock()
+_local = OrderedDict()
+
+
+def normalize_answer(text):
+    return ' '.join((text or '').split()).casefold()
+
+
+class AnswerKey:
+    """
+    Ordered questions of one quiz with their choices and correct answers, as
+    plain data so it can live in the cache. Rebuilt whenever a Question or
+    Choice of the quiz is saved, since that gives the quiz a new version.
+
+    Short answer questions keep their choices hidden: the correct ones are the
+    accepted answers. True/false questions may be answered with a choice or
+    with the text "true" or "false".
+    """
+
+    def __init__(self, quiz_id, version, questions, choices):
+        self.quiz_id = quiz_id
+        self.version = version
+        # [{'id', 'order', 'question_text', 'question_type', 'points', 'choices'}, ...]
+        self.questions = []
+        self.index = {}
+        self.correct = {}
+        self.accepted = {}
+        self.choice_texts = {}
+        choices_by_question = {}
+        for choice_id, question_id, choice_text, is_correct in choices:
+            choices_by_question.setdefault(question_id, []).append({'id': choice_id, 'choice_text': choice_text})
+            self.choice_texts[choice_id] = choice_text
+            if is_correct:
+                self.correct.setdefault(question_id, set()).add(choice_id)
+                self.accepted.setdefault(question_id, set()).add(normalize_answer(choice_text))
+        for question_id, order, text, question_type, points in questions:
+            self.index[question_id] = len(self.questions)
+            self.questions.append({
+                'id': question_id,
+                'order': order,
+                'question_text': text,
+                'question_type': question_type,
+                'points': points,
+                'choices': [] if question_type == 'short_answer' else choices_by_question.get(question_id, []),
+            })
+        self.total_points = sum(question['points'] for question in self.questions)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def question(self, question_id):
+        position = self.index.get(question_id)
+        return None if position is None else self.questions[position]
+
+    def grade(self, question_id, choice_id=None, text=''):
+        """
+        Whether an answer to a question is right, or None when it is no answer
+        at all: an unknown question, a choice from another question, or empty
+        text.
+        """
+        question = self.question(question_id)
+        if question is None:
+            return None
+        if choice_id is not None:
+            if not any(choice['id'] == choice_id for choice in question['choices']):
+                return None
+            return choice_id in self.correct.get(question_id, ())
+        text = normalize_answer(text)
+        if question['question_type'] == 'short_answer' and text:
+            return text in self.accepted.get(question_id, ())
+        if question['question_type'] == 'true_false' and text in ('true', 'false'):
+            return text in self.accepted.get(question_id, ())
+        return None
+
+    def correct_texts(self, question_id):
+        """Texts of a question's correct choices, in choice order."""
+        correct = self.correct.get(question_id, ())
+        return [text for choice_id, text in self.choice_texts.items() if choice_id in correct]
+
+    def score(self, earned_points):
+        """Percentage of the quiz's points earned."""
+        if not self.total_points:
+            return 0
+        return earned_points / self.total_points * 100
+
+
+def _load(quiz_id, version):
+    questions = Question.objects.filter(quiz_id=quiz_id).order_by('order', 'id').values_list(
+        'id', 'order', 'question_text', 'question_type', 'points',
+    )
+    choices = Choice.objects.filter(question__quiz_id=quiz_id).order_by('id').values_list(
+        'id', 'question_id', 'choice_text', 'is_correct',
+    )
+    return AnswerKey(quiz_id, version, list(questions), list(choices))
+
+
+def get_key(quiz_id):
+    """
+    The current AnswerKey of a quiz, from two per-process tiers: the last
+    LOCAL_KEYS keys used, as objects, then the default cache, which holds
+    more keys but pickled. A miss in both costs two queries. Only the quiz
+    version is shared between processes: it is read from the 'versions'
+    cache on every call, so a question edited through another process is
+    graded by the new key here too.
+    """
+    version = pagecache.version('quiz', quiz_id)
+    with _lock:
+        key = _local.get(quiz_id)
+        if key is not None and key.version == version:
+            _local.move_to_end(quiz_id)
+            return key
+    key = pagecache.get_object('answerkey', quiz_id, version, lambda: _load(quiz_id, version))
+    with _lock:
+        _local[quiz_id] = key
+        _local.move_to_end(quiz_id)
+        while len(_local) > LOCAL_KEYS:
+            _local.popitem(last=False)
+    return key
+
+
+def forget(*quiz_ids):
+    """Drop this process's copy of the quizzes' answer keys."""
+    with _lock:
+        for quiz_id in quiz_ids:
+            _local.pop(quiz_id, None)
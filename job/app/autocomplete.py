@@ -0,0 +1,397 @@
+import threading
+import time
+import unicodedata
+from collections import Counter
+from itertools import islice
+
+from django.db import DatabaseError, connection
+
+from . import pagecache
+from .models import Company, Job
+
+SUGGESTION_LIMIT = 8
+MAX_LIMIT = 20
+
+# Suggestions kept pre-ranked on every trie node
+TOP_K = 20
+
+# Trie depth; longer prefixes are answered by filtering the node's bucket
+MAX_PREFIX_LENGTH = 24
+
+# Minimum trigram (Jaccard) similarity for a typo-tolerant match
+MIN_SIMILARITY = 0.3
+
+# Upper bound on entries scored per fuzzy lookup
+MAX_CANDIDATES = 300
+
+# The shared version is checked, and a stale index rebuilt in the
+# background, at most this often
+REFRESH_INTERVAL = 60
+
+# Guards the fields below and the index's contents; never held for I/O
+_lock = threading.Lock()
+# One build at a time per process
+_build_lock = threading.Lock()
+_index = None
+_checked_at = 0.0
+_refreshing = False
+
+
+def normalize(text):
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.split()).casefold()
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Node:
+    __slots__ = ('children', 'top', 'terminals', 'bucket')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+        # Keys ending exactly here, and keys longer than MAX_PREFIX_LENGTH
+        self.terminals = None
+        self.bucket = None
+
+
+class Entry:
+    __slots__ = ('key', 'kind', 'text', 'weight', 'trigrams')
+
+    def __init__(self, key, kind, text):
+        self.key = key
+        self.kind = kind
+        self.text = text
+        self.weight = 0
+        self.trigrams = trigrams(key[1])
+
+    def as_dict(self):
+        return {'text': self.text, 'kind': self.kind, 'count': self.weight}
+
+
+class AutocompleteIndex:
+    """
+    Titles, company names and locations of active jobs, weighted by how many
+    active jobs use them. A character trie answers prefix queries from the
+    pre-ranked ``top`` list of a single node; a trigram inverted index fills
+    in fuzzy matches for typos.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.entries = {}
+        self.postings = {}
+        # job id -> (title key, location key, company id), to undo a job's contribution
+        self.jobs = {}
+        # company id -> (company key, active job count)
+        self.companies = {}
+        self.version = None
+
+    # Building and incremental updates
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        index.version = version()
+        names = dict(Company.objects.values_list('id', 'name'))
+        weights = Counter()
+        texts = {}
+        for job_id, title, location, company_id in (
+            Job.objects.filter(is_active=True).values_list('id', 'title', 'location', 'company_id').iterator()
+        ):
+            company_name = names.get(company_id, '')
+            title_key = ('title', normalize(title))
+            location_key = ('location', normalize(location))
+            company_key = ('company', normalize(company_name))
+            for key, text in ((title_key, title), (location_key, location), (company_key, company_name)):
+                weights[key] += 1
+                texts.setdefault(key, text)
+            index.jobs[job_id] = (title_key, location_key, company_id)
+            key, count = index.companies.get(company_id, (company_key, 0))
+            index.companies[company_id] = (key, count + 1)
+
+        # Insert every entry once with its final weight, best-ranked first, so
+        # each trie node's ranking is just its first TOP_K arrivals
+        ranked = sorted((key for key in weights if key[1]), key=lambda key: (-weights[key], len(key[1])))
+        for key in ranked:
+            entry = index.entries[key] = Entry(key, key[0], texts[key])
+            entry.weight = weights[key]
+            for trigram in entry.trigrams:
+                index.postings.setdefault(trigram, set()).add(key)
+            node = index.root
+            for char in key[1][:MAX_PREFIX_LENGTH]:
+                if len(node.top) < TOP_K:
+                    node.top.append(key)
+                node = node.children.setdefault(char, _Node())
+            if len(node.top) < TOP_K:
+                node.top.append(key)
+            attr = 'bucket' if len(key[1]) > MAX_PREFIX_LENGTH else 'terminals'
+            if getattr(node, attr) is None:
+                setattr(node, attr, set())
+            getattr(node, attr).add(key)
+        return index
+
+    def update_job(self, job):
+        self.remove_job(job.id)
+        if job.is_active:
+            company = job.company
+            self._add_job(job.id, job.title, job.location, company.id, company.name)
+
+    def remove_job(self, job_id):
+        previous = self.jobs.pop(job_id, None)
+        if previous is None:
+            return
+        title_key, location_key, company_id = previous
+        self._adjust(title_key, None, -1)
+        self._adjust(location_key, None, -1)
+        company_key, count = self.companies[company_id]
+        self._adjust(company_key, None, -1)
+        if count > 1:
+            self.companies[company_id] = (company_key, count - 1)
+        else:
+            del self.companies[company_id]
+
+    def rename_company(self, company):
+        current = self.companies.get(company.id)
+        if current is None:
+            return
+        old_key, count = current
+        new_key = ('company', normalize(company.name))
+        if new_key == old_key:
+            self.entries[old_key].text = company.name
+            return
+        self._adjust(old_key, None, -count)
+        self._adjust(new_key, company.name, count)
+        self.companies[company.id] = (new_key, count)
+
+    def _add_job(self, job_id, title, location, company_id, company_name):
+        title_key = ('title', normalize(title))
+        location_key = ('location', normalize(location))
+        self._adjust(title_key, title, 1)
+        self._adjust(location_key, location, 1)
+        company_key, count = self.companies.get(company_id, (('company', normalize(company_name)), 0))
+        self._adjust(company_key, company_name, 1)
+        self.companies[company_id] = (company_key, count + 1)
+        self.jobs[job_id] = (title_key, location_key, company_id)
+
+    def _adjust(self, key, text, delta):
+        if not key[1]:
+            return
+        entry = self.entries.get(key)
+        if entry is None:
+            if delta <= 0:
+                return
+            entry = self.entries[key] = Entry(key, key[0], text)
+            for trigram in entry.trigrams:
+                self.postings.setdefault(trigram, set()).add(key)
+        entry.weight += delta
+        if entry.weight <= 0:
+            del self.entries[key]
+            for trigram in entry.trigrams:
+                keys = self.postings.get(trigram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[trigram]
+        self._update_path(entry, delta)
+
+    def _update_path(self, entry, delta):
+        key = entry.key
+        removed = entry.weight <= 0
+        path = [self.root]
+        node = self.root
+        for char in key[1][:MAX_PREFIX_LENGTH]:
+            node = node.children.setdefault(char, _Node())
+            path.append(node)
+        attr = 'bucket' if len(key[1]) > MAX_PREFIX_LENGTH else 'terminals'
+        if getattr(node, attr) is None:
+            setattr(node, attr, set())
+        if removed:
+            getattr(node, attr).discard(key)
+        else:
+            getattr(node, attr).add(key)
+
+        # Bottom-up, so each node can be refilled from its children's rankings
+        for node in reversed(path):
+            if key in node.top:
+                if delta < 0:
+                    self._refill(node)
+                else:
+                    node.top.sort(key=self._rank, reverse=True)
+            elif removed:
+                continue
+            elif len(node.top) < TOP_K:
+                node.top.append(key)
+                node.top.sort(key=self._rank, reverse=True)
+            elif self._rank(key) > self._rank(node.top[-1]):
+                node.top[-1] = key
+                node.top.sort(key=self._rank, reverse=True)
+
+    def _refill(self, node):
+        """Rebuild a node's ranking from its children after an entry dropped out."""
+        candidates = set(node.top)
+        if node.terminals:
+            candidates |= node.terminals
+        if node.bucket:
+            candidates |= node.bucket
+        for child in node.children.values():
+            candidates.update(child.top)
+        candidates &= self.entries.keys()
+        node.top = sorted(candidates, key=self._rank, reverse=True)[:TOP_K]
+
+    def _rank(self, key):
+        entry = self.entries.get(key)
+        return (entry.weight, -len(key[1])) if entry else (0, 0)
+
+    # Queries
+
+    def _prefix(self, query):
+        node = self.root
+        for char in query[:MAX_PREFIX_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if len(query) <= MAX_PREFIX_LENGTH:
+            return list(node.top)
+        matches = [key for key in (node.bucket or ()) if key[1].startswith(query)]
+        return sorted(matches, key=self._rank, reverse=True)[:TOP_K]
+
+    def _fuzzy(self, query, exclude, limit):
+        query_trigrams = trigrams(query)
+        # Gather candidates from the rarest trigrams first, so a query made of
+        # common trigrams ("er ", "ion") cannot turn into a full scan
+        candidates = set()
+        for trigram in sorted(query_trigrams, key=lambda trigram: len(self.postings.get(trigram, ()))):
+            keys = self.postings.get(trigram, ())
+            candidates.update(islice(keys, MAX_CANDIDATES - len(candidates)))
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+
+        scored = []
+        for key in candidates - exclude:
+            entry = self.entries[key]
+            shared = len(query_trigrams & entry.trigrams)
+            similarity = shared / (len(query_trigrams) + len(entry.trigrams) - shared)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((similarity, entry.weight, key))
+        scored.sort(reverse=True)
+        return [key for _, _, key in scored[:limit]]
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT):
+        query = normalize(query)
+        if not query:
+            return []
+        keys = self._prefix(query)[:limit]
+        if len(keys) < limit:
+            keys += self._fuzzy(query, set(keys), limit - len(keys))
+        return [self.entries[key].as_dict() for key in keys]
+
+
+def version():
+    """Shared version of the indexed jobs and companies, a token from pagecache."""
+    return pagecache.version('autocomplete', 'job')
+
+
+def invalidate():
+    """Mark every process's index stale; each rebuilds within REFRESH_INTERVAL."""
+    pagecache.invalidate('autocomplete', 'job')
+
+
+def _build(stale):
+    """Build and swap in a new index, unless another thread already replaced ``stale``."""
+    global _index, _checked_at
+    with _build_lock:
+        with _lock:
+            if _index is not stale:
+                return _index
+        index = AutocompleteIndex.build()
+        with _lock:
+            _index, _checked_at = index, time.monotonic()
+        return index
+
+
+def _refresh(index):
+    """Rebuild ``index`` if a write changed the shared version since it was built."""
+    global _refreshing
+    try:
+        if version() != index.version:
+            _build(index)
+    except DatabaseError:
+        # Keep serving the previous index; the next check retries
+        pass
+    finally:
+        with _lock:
+            _refreshing = False
+        # This thread owns its own connection; don't leave it open
+        connection.close()
+
+
+def _start_refresh(index):
+    threading.Thread(target=_refresh, args=(index,), name='autocomplete', daemon=True).start()
+
+
+def get_index():
+    """
+    The process-wide index. Built on first use; after that the shared
+    version is checked, and a stale index rebuilt, in a background thread
+    at most once per REFRESH_INTERVAL while the current index keeps serving.
+    """
+    global _checked_at, _refreshing
+    with _lock:
+        index = _index
+        start = (
+            index is not None and not _refreshing and
+            time.monotonic() - _checked_at >= REFRESH_INTERVAL
+        )
+        if start:
+            _refreshing = True
+            _checked_at = time.monotonic()
+    if index is None:
+        return _build(None)
+    if start:
+        _start_refresh(index)
+    return index
+
+
+def warm():
+    """Build the index at worker startup; a missing database just defers it."""
+    try:
+        get_index()
+    except DatabaseError:
+        pass
+
+
+def suggest(query, limit=SUGGESTION_LIMIT):
+    """Suggestions from the process-wide index, read under the lock its updates take."""
+    index = get_index()
+    with _lock:
+        return index.suggest(query, limit)
+
+
+def _apply(update):
+    # Only patch an index this process already built; get_index() would
+    # otherwise run a full build inside a save signal. The patched index
+    # keeps its version, so the next check still rebuilds it in case other
+    # processes wrote too.
+    with _lock:
+        if _index is not None:
+            update(_index)
+    invalidate()
+
+
+def job_saved(job):
+    _apply(lambda index: index.update_job(job))
+
+
+def job_deleted(job):
+    _apply(lambda index: index.remove_job(job.id))
+
+
+def company_saved(company):
+    _apply(lambda index: index.rename_company(company))
@@ -0,0 +1,191 @@
+import numpy as np
+import scipy.sparse as sp
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import pagecache
+from .models import Course, CourseNeighbor, Enrollment
+
+# Neighbors stored per course
+TOP_K = 10
+
+# Weight of an enrollment grows from 1 (just enrolled) to 1 + PROGRESS_WEIGHT
+# (every lesson completed), so courses people actually finish count for more
+PROGRESS_WEIGHT = 1.0
+
+# Pairs of courses need at least this many shared learners to be neighbors
+MIN_SHARED = 2
+
+
+def _weight(completed, total):
+    return 1.0 + PROGRESS_WEIGHT * (min(completed / total, 1.0) if total else 0.0)
+
+
+def _enrollments():
+    return Enrollment.objects.values_list('user_id', 'course_id', 'completed_lessons_count', 'course__total_lessons')
+
+
+def build_matrix(user_ids=None):
+    """
+    Sparse users x courses matrix of enrollment weights, of every user or
+    only ``user_ids`` (a list or subquery). Returns ``(matrix, course_ids)``
+    where ``course_ids[column]`` is a Course id.
+    """
+    rows, cols, weights = [], [], []
+    user_index, course_index = {}, {}
+    enrollments = _enrollments()
+    if user_ids is not None:
+        enrollments = enrollments.filter(user_id__in=user_ids)
+    for user_id, course_id, completed, total in enrollments.iterator():
+        rows.append(user_index.setdefault(user_id, len(user_index)))
+        cols.append(course_index.setdefault(course_id, len(course_index)))
+        weights.append(_weight(completed, total))
+
+    matrix = sp.csr_matrix(
+        (np.array(weights), (rows, cols)),
+        shape=(len(user_index), len(course_index)),
+    )
+    course_ids = np.array(list(course_index), dtype=np.int64)
+    return matrix, course_ids
+
+
+def column_norms(course_ids):
+    """Norm of each course's enrollment column over every user, in ``course_ids`` order."""
+    squares = dict.fromkeys(course_ids.tolist(), 0.0)
+    for _, course_id, completed, total in _enrollments().filter(course_id__in=list(squares)).iterator():
+        squares[course_id] += _weight(completed, total) ** 2
+    return np.sqrt(np.array(list(squares.values())))
+
+
+def similarity(matrix, rows=None, norms=None):
+    """
+    Course x course cosine similarity of the enrollment columns, as a sparse
+    matrix with self pairs and pairs under MIN_SHARED learners dropped.
+
+    With ``rows`` (column positions), only those courses' rows are computed,
+    as a ``len(rows) x courses`` matrix. ``norms`` are the full column norms
+    when ``matrix`` holds only some users, e.g. those of the ``rows`` courses:
+    every learner shared with those courses is then in the matrix.
+    """
+    if norms is None:
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms = np.where(norms == 0, 1, norms)
+    normalized = (matrix @ sp.diags(1.0 / norms)).tocsc()
+    binary = (matrix > 0).astype(np.float64).tocsc()
+    rows = np.arange(matrix.shape[1]) if rows is None else np.asarray(rows, dtype=np.int64)
+
+    scores = (normalized[:, rows].T @ normalized).tocsr()
+    shared = (binary[:, rows].T @ binary).tocsr()
+    scores = scores.multiply(shared >= MIN_SHARED).tocsr()
+    own = sp.csr_matrix((np.ones(len(rows)), (np.arange(len(rows)), rows)), shape=scores.shape)
+    scores = (scores - scores.multiply(own)).tocsr()
+    scores.eliminate_zeros()
+    return scores
+
+
+def top_neighbors(scores, row, k):
+    """``[(column, score), ...]`` of the ``k`` best entries of one sparse row, best first."""
+    start, end = scores.indptr[row], scores.indptr[row + 1]
+    columns, values = scores.indices[start:end], scores.data[start:end]
+    if len(values) > k:
+        best = np.argpartition(-values, k - 1)[:k]
+        columns, values = columns[best], values[best]
+    order = np.argsort(-values, kind='stable')
+    return list(zip(columns[order].tolist(), values[order].tolist()))
+
+
+def compute_neighbors(course_ids=None, k=TOP_K):
+    """
+    Recompute and store the top-``k`` neighbors of every course, or only of
+    ``course_ids`` for an incremental refresh. An incremental refresh reads
+    only the enrollments of those courses' learners and scores only their
+    rows. Returns the number of courses whose neighbors were replaced.
+    """
+    if course_ids is None:
+        matrix, columns = build_matrix()
+        norms = None
+    else:
+        course_ids = list(course_ids)
+        matrix, columns = build_matrix(
+            user_ids=Enrollment.objects.filter(course_id__in=course_ids).values('user_id'),
+        )
+        norms = column_norms(columns)
+    column_of = {int(course_id): column for column, course_id in enumerate(columns)}
+
+    targets = list(column_of) if course_ids is None else [pk for pk in course_ids if pk in column_of]
+    neighbors = []
+    if targets:
+        scores = similarity(matrix, [column_of[course_id] for course_id in targets], norms)
+        neighbors = [
+            CourseNeighbor(course_id=course_id, neighbor_id=int(columns[column]), score=score)
+            for row, course_id in enumerate(targets)
+            for column, score in top_neighbors(scores, row, k)
+        ]
+    with transaction.atomic():
+        stale = CourseNeighbor.objects.all() if course_ids is None else CourseNeighbor.objects.filter(
+            course_id__in=course_ids,
+        )
+        stale.delete()
+        CourseNeighbor.objects.bulk_create(neighbors, batch_size=1000)
+
+    # Related courses are part of the cached course page
+    pagecache.invalidate('course', *(targets if course_ids is None else course_ids))
+    return len(targets)
+
+
+def enrollment_removed(enrollment):
+    # The enrollment row is gone, so its course records the change
+    Course.objects.filter(pk=enrollment.course_id).update(enrollments_changed_at=timezone.now())
+
+
+def changed_courses(since):
+    """
+    Courses whose enrollment weights changed since ``since`` (an enrollment
+    created, deleted or progressed, or lessons added or deleted), plus every
+    course whose scores with them moved: those sharing a learner with them,
+    and those listing them as neighbors (pairs that may have dropped out).
+    """
+    changed = set(
+        Enrollment.objects.filter(progress_changed_at__gte=since).values_list('course_id', flat=True).distinct()
+    )
+    changed |= set(Course.objects.filter(enrollments_changed_at__gte=since).values_list('pk', flat=True))
+    learners = Enrollment.objects.filter(course_id__in=changed).values('user_id')
+    shared = set(Enrollment.objects.filter(user_id__in=learners).values_list('course_id', flat=True).distinct())
+    listing = set(CourseNeighbor.objects.filter(neighbor_id__in=changed).values_list('course_id', flat=True))
+    return sorted(changed | shared | listing)
+
+
+def related_courses(course, limit=3):
+    """Courses most often taken with ``course``, falling back to its category."""
+    related = [
+        link.neighbor for link in CourseNeighbor.objects.filter(course=course, neighbor__is_active=True)
+        .select_related('neighbor')[:limit]
+    ]
+    if related:
+        return related
+    return list(
+        Course.objects.filter(is_active=True, category_id=course.category_id)
+        .exclude(id=course.id).order_by('-created_date')[:limit]
+    )
+
+
+def suggested_courses(enrolled_course_ids, limit=4):
+    """
+    Neighbors of the courses a user is enrolled in, ranked by summed
+    similarity; newest courses fill in when there are too few.
+    """
+    enrolled_course_ids = list(enrolled_course_ids)
+    suggested = list(
+        Course.objects.filter(is_active=True, neighbor_of__course_id__in=enrolled_course_ids)
+        .exclude(id__in=enrolled_course_ids)
+        .annotate(similarity=Sum('neighbor_of__score'))
+        .order_by(F('similarity').desc(), '-id')[:limit]
+    )
+    if len(suggested) < limit:
+        suggested += list(
+            Course.objects.filter(is_active=True)
+            .exclude(id__in=enrolled_course_ids + [course.id for course in suggested])
+            .order_by('-created_date')[:limit - len(suggested)]
+        )
+    return suggested
@@ -0,0 +1,96 @@
+import hashlib
+
+from django.contrib import messages
+from django.shortcuts import get_object_or_404
+
+from . import pagecache
+from .models import Quiz
+
+
+def _has_messages(request):
+    # A 304 would swallow a pending flash message until the next full render
+    return bool(len(messages.get_messages(request)))
+
+
+def _etag(request, *versions):
+    """
+    Validator for a page built from the given cache versions. The nav differs
+    per visitor, so the user and the full path are part of every tag.
+    Versions come from the shared 'versions' cache (see pagecache), so every
+    worker hands out the same tag for the same page.
+    """
+    if _has_messages(request):
+        return None
+    user = request.user.pk if request.user.is_authenticated else ''
+    raw = '\x00'.join(str(part) for part in (request.get_full_path(), user, *versions))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified(request, loader):
+    """
+    Only anonymous pages get a date: a logged-in page also changes when the
+    user's own data does, which only the ETag tracks.
+    """
+    if request.user.is_authenticated or _has_messages(request):
+        return None
+    return loader()
+
+
+def catalog_version(kind):
+    """Replaced on any write to the 'job', 'course' or 'quiz' catalog."""
+    return pagecache.version('catalog', kind)
+
+
+def progress_version(user):
+    """Replaced whenever one of the user's enrollments or lesson completions changes."""
+    return pagecache.version('progress', user.pk)
+
+
+def home_etag(request):
+    # Logged-in visitors also see recommendations, which change without any catalog write
+    if request.user.is_authenticated:
+        return None
+    return _etag(request, catalog_version('job'), catalog_version('course'))
+
+
+def job_list_etag(request):
+    return _etag(request, catalog_version('job'))
+
+
+def job_detail_etag(request, job_id):
+    return _etag(request, pagecache.version('job', job_id))
+
+
+def job_detail_last_modified(request, job_id):
+    def loader():
+        # Same cached object the view renders, so no query on a hit
+        job = pagecache.get_job(job_id, pagecache.version('job', job_id))
+        return max(job.updated_at, job.company.updated_at)
+    return _last_modified(request, loader)
+
+
+def course_list_etag(request):
+    if request.GET.get('tab') == 'my_courses':
+        if not request.user.is_authenticated:
+            return None
+        return _etag(request, catalog_version('course'), progress_version(request.user))
+    return _etag(request, catalog_version('course'))
+
+
+def course_detail_etag(request, course_id):
+    return _etag(request, pagecache.version('course', course_id), progress_version(request.user))
+
+
+def quiz_list_etag(request):
+    return _etag(request, catalog_version('quiz'))
+
+
+def quiz_detail_etag(request, quiz_id):
+    attempts = pagecache.version('attempts', request.user.pk) if request.user.is_authenticated else ''
+    return _etag(request, pagecache.version('quiz', quiz_id), attempts)
+
+
+def quiz_detail_last_modified(request, quiz_id):
+    return _last_modified(request, lambda: get_object_or_404(
+        Quiz.objects.only('updated_at'), id=quiz_id, is_active=True
+    ).updated_at)
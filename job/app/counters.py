@@ -0,0 +1,150 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Round
+
+from . import pagecache
+from .models import Course, CounterShard, Quiz
+
+# Rows each counter is spread over; more shards, fewer writers per row
+SHARDS = getattr(settings, 'COUNTER_SHARDS', 8)
+
+# Counted models, and the page cache kind that renders their counters
+MODELS = {
+    Course._meta.label_lower: (Course, 'course'),
+    Quiz._meta.label_lower: (Quiz, 'quiz'),
+}
+
+MIN_RATING = 1
+MAX_RATING = 5
+
+
+def increment(model, object_id, field, amount=1):
+    """
+    Add ``amount`` to ``model.field`` of one object without writing its row:
+    the increment lands in a random shard and reaches the object at the next
+    ``rollup``.
+    """
+    if not amount:
+        return
+    key = {
+        'model': model._meta.label_lower, 'object_id': object_id,
+        'field': field, 'shard': random.randrange(SHARDS),
+    }
+    shard = CounterShard.objects.filter(**key)
+    # A rollup may delete the shard between creating and updating it
+    while not shard.update(value=F('value') + amount):
+        CounterShard.objects.bulk_create([CounterShard(**key)], ignore_conflicts=True)
+
+
+def rollup():
+    """
+    Move every pending increment into its object in one transaction: one
+    UPDATE per object adds the shard values read, and the same values are
+    subtracted from the shards rather than deleting them, so increments
+    landing after the read stay pending for the next rollup. Only shards
+    left at zero are deleted. Returns the number of objects updated.
+    """
+    with transaction.atomic():
+        shards = list(CounterShard.objects.values_list('id', 'model', 'object_id', 'field', 'value'))
+        totals = {}
+        for _, label, object_id, field, value in shards:
+            fields = totals.setdefault((label, object_id), {})
+            fields[field] = fields.get(field, 0) + value
+
+        invalidated = {}
+        for (label, object_id), fields in totals.items():
+            if label not in MODELS:
+                continue
+            model, kind = MODELS[label]
+            changes = {field: F(field) + value for field, value in fields.items() if value}
+            if not changes:
+                continue
+            model.objects.filter(pk=object_id).update(**changes)
+            if 'rating_total' in fields or 'rating_count' in fields:
+                _refresh_rating(model, object_id)
+            invalidated.setdefault(kind, []).append(object_id)
+
+        read = {}
+        for shard_id, _, _, _, value in shards:
+            read.setdefault(value, []).append(shard_id)
+        for value, shard_ids in read.items():
+            if value:
+                CounterShard.objects.filter(id__in=shard_ids).update(value=F('value') - value)
+        CounterShard.objects.filter(id__in=[shard[0] for shard in shards], value=0).delete()
+
+    # Queryset updates bypass post_save, which would otherwise do this
+    for kind, object_ids in invalidated.items():
+        pagecache.invalidate(kind, *object_ids)
+        pagecache.invalidate('catalog', kind)
+    return sum(len(object_ids) for object_ids in invalidated.values())
+
+
+def _refresh_rating(model, object_id):
+    model.objects.filter(pk=object_id, rating_count__gt=0).update(
+        rating=Round(Cast('rating_total', FloatField()) / F('rating_count'), 1),
+    )
+
+
+def enrollment_added(enrollment):
+    increment(Course, enrollment.course_id, 'students_count')
+
+
+def enrollment_removed(enrollment):
+    increment(Course, enrollment.course_id, 'students_count', -1)
+    if enrollment.rating:
+        _rating_changed(Course, enrollment.course_id, enrollment.rating, None)
+
+
+def attempt_completed(attempt):
+    increment(Quiz, attempt.quiz_id, 'attempts_count')
+
+
+def attempt_removed(attempt):
+    # attempts_count counts every attempt ever completed, so a retake
+    # replacing the earlier attempt (see start_quiz) still adds one; only
+    # the removed attempt's rating is taken back
+    if attempt.rating:
+        _rating_changed(Quiz, attempt.quiz_id, attempt.rating, None)
+
+
+def _rating_changed(model, object_id, old, new):
+    increment(model, object_id, 'rating_total', (new or 0) - (old or 0))
+    increment(model, object_id, 'rating_count', (new is not None) - (old is not None))
+
+
+def _rate(rated, model, object_id, stars):
+    """
+    Set ``rated.rating`` to ``stars`` with a conditional UPDATE on the old
+    value, so concurrent re-ratings each count exactly once. Returns False
+    for stars out of range.
+    """
+    if not MIN_RATING <= stars <= MAX_RATING:
+        return False
+    manager = type(rated).objects
+    while True:
+        old = manager.values_list('rating', flat=True).get(pk=rated.pk)
+        if old == stars:
+            break
+        # rating=None filters IS NULL, so a first rating is a compare-and-swap too
+        if manager.filter(pk=rated.pk, rating=old).update(rating=stars):
+            _rating_changed(model, object_id, old, stars)
+            break
+    rated.rating = stars
+    return True
+
+
+def rate_course(enrollment, stars):
+    """Record the enrolled student's rating of the course; see ``_rate``."""
+    if not _rate(enrollment, Course, enrollment.course_id, stars):
+        return False
+    # The course page shows the student's own rating
+    pagecache.invalidate('progress', enrollment.user_id)
+    return True
+
+
+def rate_quiz(attempt, stars):
+    """Record the quiz taker's rating of the quiz; see ``_rate``."""
+    return _rate(attempt, Quiz, attempt.quiz_id, stars)
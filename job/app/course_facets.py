@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db.models import Q
+
+from . import course_search
+from .faceting import FacetCounter
+from .models import Course, Tag
+
+# (value, label, low, high): a course is in the band when low <= price < high,
+# or price == low when low == high; None leaves that end open. Bands may
+# overlap. Override with COURSE_PRICE_BANDS in settings.
+DEFAULT_PRICE_BANDS = [
+    ('free', 'Free', 0, 0),
+    ('under_1000', 'Under 1000 Tk', None, 1000),
+    ('over_1000', 'Over 1000 Tk', 1000, None),
+]
+
+
+def price_bands():
+    return getattr(settings, 'COURSE_PRICE_BANDS', DEFAULT_PRICE_BANDS)
+
+
+def _band(value):
+    for band in price_bands():
+        if band[0] == value:
+            return band
+    return None
+
+
+def _in_band(price, band):
+    _, _, low, high = band
+    if low is not None and low == high:
+        return price == low
+    return (low is None or price >= low) and (high is None or price < high)
+
+
+def filter_price(queryset, value):
+    """Courses in the price band named ``value``; unknown bands filter nothing."""
+    band = _band(value)
+    if band is None:
+        return queryset
+    _, _, low, high = band
+    if low is not None and low == high:
+        return queryset.filter(price=low)
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return queryset.filter(condition)
+
+
+def _price_matches(row, selected):
+    band = _band(selected)
+    return band is None or _in_band(row['price'], band)
+
+
+def _category_matches(row, selected):
+    # Selected by name, which several categories may share: a set of ids
+    return row['category'] in selected
+
+
+counter = FacetCounter('course_facets', matchers={'price': _price_matches, 'category': _category_matches})
+# Drops every cached facet count; called whenever a Course changes
+invalidate = counter.invalidate
+
+
+def _combinations(search_query, skill):
+    """
+    Count active courses per distinct (category, difficulty, price), restricted
+    to the search query and skill tag only. One grouped aggregate, cached until
+    the next Course write; every facet, price bands included, is then summed
+    from these rows in Python.
+    """
+    courses = course_search.match_courses(Course.objects.filter(is_active=True), search_query)
+    if skill:
+        courses = courses.filter(tags__normalized_name=Tag.normalize(skill))
+    fields = {'category': 'category_id', 'difficulty': 'difficulty', 'price': 'price'}
+    return counter.combinations((search_query, skill), courses, fields)
+
+
+def course_count(search_query='', selected=None, skill=''):
+    """Number of active courses matching the search and every selected filter."""
+    return counter.count(_combinations(search_query, skill), selected)
+
+
+def course_facets(categories, search_query='', selected=None, skill=''):
+    """
+    Return ``{facet: [{'value', 'label', 'count'}, ...]}`` for the course list,
+    with ``category``, ``difficulty`` and ``price`` facets.
+
+    ``categories`` are the CourseCategory rows offered in the filter.
+    ``selected`` maps facet names to the active filter values, with the
+    category as the set of ids sharing the selected name. Each facet is counted
+    with every *other* active filter applied.
+    """
+    combinations = _combinations(search_query, skill)
+
+    by_category = counter.counts_by(combinations, selected, 'category')
+    names = {}
+    for category in categories:
+        names[category.name] = names.get(category.name, 0) + by_category.get(category.id, 0)
+
+    by_difficulty = counter.counts_by(combinations, selected, 'difficulty')
+    price_rows = counter.rows(combinations, counter.clean(selected), exclude='price')
+    return {
+        'category': [{'value': name, 'label': name, 'count': count} for name, count in names.items()],
+        'difficulty': [
+            {'value': value, 'label': label, 'count': by_difficulty.get(value, 0)}
+            for value, label in Course.DIFFICULTY_LEVELS
+        ],
+        'price': [
+            {'value': band[0], 'label': band[1], 'count': sum(
+                count for row, count in price_rows if _in_band(row['price'], band)
+            )}
+            for band in price_bands()
+        ],
+    }
@@ -0,0 +1,22 @@
+from . import fts
+from .models import Course
+
+# SQLite FTS5 table mirroring the searchable text of every Course (rowid = course id)
+FTS_TABLE = 'app_course_fts'
+
+index = fts.FullTextIndex(
+    Course, FTS_TABLE,
+    # FTS column -> Course field, in table order, with their bm25() weights
+    {column: column for column in ['title', 'instructor', 'skills_covered', 'short_description', 'description']},
+    weights=[10.0, 5.0, 4.0, 2.0, 1.0],
+    fallback_fields=['title', 'instructor', 'skills_covered'],
+)
+
+create_index = index.create
+fts_available = index.available
+index_courses = index.index
+unindex_courses = index.unindex
+rebuild_index = index.rebuild
+match_courses = index.match
+# Annotates search_rank (lower is better), constant for queries with no words
+search_courses = index.search
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+# Bump when the layout changes, so every cached CV is regenerated
+FORMAT_VERSION = 1
+
+# Generated CVs, as <user id>/<content hash>.pdf
+CV_ROOT = Path(getattr(settings, 'CV_ROOT', Path(settings.MEDIA_ROOT) / 'cv'))
+
+# CVs rendered at once; further downloads queue for a worker
+WORKERS = getattr(settings, 'CV_WORKERS', 2)
+
+# Seconds a download asks the client to wait while its CV is rendered
+RETRY_AFTER = getattr(settings, 'CV_RETRY_AFTER', 5)
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='cv')
+_pending = {}
+_pending_lock = threading.Lock()
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+# Average Helvetica glyph width as a share of the font size, for wrapping
+CHAR_WIDTH = 0.5
+
+
+def _dates(start, end, current):
+    end = 'Present' if current else (end.strftime('%b %Y') if end else '')
+    return ' - '.join(part for part in (start.strftime('%b %Y') if start else '', end) if part)
+
+
+def cv_data(document):
+    """The parts of a profile document (see ``app.profiles``) that go into its CV, as plain data."""
+    user = document['profile_user']
+    profile = document['profile']
+    return {
+        'format': FORMAT_VERSION,
+        'name': user.get_full_name() or user.username,
+        'email': user.email,
+        'title': profile.title,
+        'location': profile.location,
+        'phone': profile.phone,
+        'links': [link for link in (profile.website, profile.linkedin, profile.github) if link],
+        'bio': profile.bio,
+        'experiences': [
+            [e.position, e.company, _dates(e.start_date, e.end_date, e.current), e.description]
+            for e in document['experiences']
+        ],
+        'educations': [
+            [e.degree, e.institution, e.field_of_study, _dates(e.start_date, e.end_date, e.current), e.description]
+            for e in document['educations']
+        ],
+        'skills': [[s.name, s.get_proficiency_display()] for s in document['skills']],
+        'projects': [
+            [p.title, ', '.join(p.get_technologies_list()), p.description, p.project_url or p.github_url]
+            for p in document['projects']
+        ],
+        'languages': [[l.name, l.get_proficiency_display()] for l in document['languages']],
+        'certificates': [
+            [c.title, c.issuing_organization, c.issue_date.strftime('%b %Y') if c.issue_date else '']
+            for c in document['certificates']
+        ],
+    }
+
+
+def content_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _wrap(text, size, width=PAGE_WIDTH - 2 * MARGIN):
+    per_line = max(int(width / (size * CHAR_WIDTH)), 1)
+    lines = []
+    for paragraph in (text or '').splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            while len(word) > per_line:
+                if line:
+                    lines.append(line)
+                    line = ''
+                lines.append(word[:per_line])
+                word = word[per_line:]
+            if line and len(line) + 1 + len(word) > per_line:
+                lines.append(line)
+                line = word
+            else:
+                line = f'{line} {word}' if line else word
+        lines.append(line)
+    return lines
+
+
+def _lines(data):
+    """``[(bold, size, text), ...]`` top to bottom; ``None`` entries are paragraph gaps."""
+    lines = [(True, 20, data['name'])]
+    if data['title']:
+        lines.append((False, 12, data['title']))
+    contact = ' | '.join(part for part in (data['email'], data['phone'], data['location']) if part)
+    for text in [contact, *data['links']]:
+        if text:
+            lines.extend((False, 9, line) for line in _wrap(text, 9))
+    if data['bio']:
+        lines.append(None)
+        lines.extend((False, 10, line) for line in _wrap(data['bio'], 10))
+
+    def section(title, entries):
+        if entries:
+            lines.extend([None, (True, 14, title)])
+            for entry in entries:
+                lines.extend(entry)
+
+    def entry(heading, details=(), body=''):
+        rows = [(True, 11, line) for line in _wrap(heading, 11)]
+        rows += [(False, 9, line) for detail in details if detail for line in _wrap(detail, 9)]
+        if body:
+            rows += [(False, 10, line) for line in _wrap(body, 10)]
+        return rows + [None]
+
+    section('Experience', [
+        entry(f'{position} - {company}', [dates], description)
+        for position, company, dates, description in data['experiences']
+    ])
+    section('Education', [
+        entry(f'{degree} - {institution}', [field, dates], description)
+        for degree, institution, field, dates, description in data['educations']
+    ])
+    section('Skills', [
+        [(False, 10, line) for line in _wrap(', '.join(f'{name} ({level})' for name, level in data['skills']), 10)]
+    ] if data['skills'] else [])
+    section('Projects', [
+        entry(title, [technologies, url], description)
+        for title, technologies, description, url in data['projects']
+    ])
+    section('Languages', [
+        [(False, 10, line) for line in _wrap(', '.join(f'{name} ({level})' for name, level in data['languages']), 10)]
+    ] if data['languages'] else [])
+    section('Certificates', [
+        entry(title, [' - '.join(part for part in (organization, issued) if part)])
+        for title, organization, issued in data['certificates']
+    ])
+    return lines
+
+
+def _escape(text):
+    text = text.encode('cp1252', 'replace')
+    return text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def render_pdf(data):
+    """A plain text PDF of ``cv_data``, in the standard Helvetica fonts so nothing is embedded."""
+    pages = [[]]
+    y = PAGE_HEIGHT - MARGIN
+    for line in _lines(data):
+        if line is None:
+            y -= 6
+            continue
+        bold, size, text = line
+        if y - size < MARGIN:
+            pages.append([])
+            y = PAGE_HEIGHT - MARGIN
+        y -= size * 1.3
+        font = b'/F2' if bold else b'/F1'
+        pages[-1].append(b'BT %s %d Tf %d %.1f Td (%s) Tj ET' % (font, size, MARGIN, y, _escape(text)))
+
+    # Objects 1-4 are the catalog, page tree and fonts; each page then adds
+    # its content stream and page object
+    page_ids = [6 + 2 * index for index in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % i for i in page_ids), len(pages)),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    for page_id, page in zip(page_ids, pages):
+        stream = b'\n'.join(page)
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, page_id - 1)
+        )
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def _generate(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf = render_pdf(data)
+    # Written under a temporary name and renamed, so readers never see half a file
+    fd, temp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(temp, path)
+    # Older CVs of the same user are superseded
+    for old in path.parent.glob('*.pdf'):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def _submit(path, data):
+    """The future generating ``path``; concurrent downloads of one CV share it."""
+    with _pending_lock:
+        future = _pending.get(path)
+        if future is None:
+            future = _executor.submit(_generate, path, data)
+            _pending[path] = future
+            future.add_done_callback(lambda _: _pending.pop(path, None))
+        return future
+
+
+def get_cv(user_id, document):
+    """
+    Path of the user's generated CV, or None if this version of their
+    profile has none yet: it is then queued for the worker pool, and the
+    download should be retried after RETRY_AFTER seconds. Request threads
+    never wait for a render.
+    """
+    data = cv_data(document)
+    path = CV_ROOT / str(user_id) / f'{content_hash(data)}.pdf'
+    if path.exists():
+        return path
+    _submit(path, data)
+    return None
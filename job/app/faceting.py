@@ -0,0 +1,86 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import pagecache
+
+CACHE_TIMEOUT = 60 * 15
+
+
+class FacetCounter:
+    """
+    Facet counts summed in Python from one grouped aggregate: the number of
+    objects per distinct combination of facet values, as ``[(row, count)]``
+    with each row a ``{field: value}`` dict. The combinations are cached under
+    ``name`` until the next ``invalidate``, whose version is a pagecache
+    token so a write in any process reaches every process.
+
+    ``matchers`` maps a field to ``matcher(row, selected)`` where a selected
+    value means more than equality (e.g. a location substring or a price band).
+    """
+
+    def __init__(self, name, matchers=None, timeout=CACHE_TIMEOUT):
+        self.name = name
+        self.matchers = matchers or {}
+        self.timeout = timeout
+
+    def invalidate(self):
+        """Drop every cached count; called whenever an object changes."""
+        pagecache.invalidate('facets', self.name)
+
+    def cached(self, kind, params, loader):
+        """``loader()``, cached per ``params`` until the next ``invalidate``."""
+        version = pagecache.version('facets', self.name)
+        digest = hashlib.md5('\x00'.join(str(param) for param in params).encode()).hexdigest()
+        key = f'{self.name}:{kind}:{version}:{digest}'
+        value = cache.get(key)
+        if value is None:
+            value = loader()
+            cache.set(key, value, self.timeout)
+        return value
+
+    def combinations(self, params, queryset, fields):
+        """
+        Objects of ``queryset`` per combination of ``fields``, cached per
+        ``params``. ``fields`` are field names, or a dict of row keys to lookups.
+        """
+        if not isinstance(fields, dict):
+            fields = {field: field for field in fields}
+        return self.cached('combinations', params, lambda: [
+            (dict(zip(fields, row[:-1])), row[-1])
+            for row in queryset.order_by().values_list(*fields.values()).annotate(count=Count('pk'))
+        ])
+
+    def matches(self, row, field, selected):
+        matcher = self.matchers.get(field)
+        if matcher:
+            return matcher(row, selected)
+        return row[field] == selected
+
+    @staticmethod
+    def clean(selected):
+        # Empty collections are real filters (e.g. a name matching no category)
+        return {field: value for field, value in (selected or {}).items() if value not in ('', None)}
+
+    def rows(self, combinations, selected, exclude=None):
+        """The combinations matching every selected filter except the one on ``exclude``."""
+        others = [(field, value) for field, value in selected.items() if field != exclude]
+        return [
+            (row, count) for row, count in combinations
+            if all(self.matches(row, field, value) for field, value in others)
+        ]
+
+    def count(self, combinations, selected):
+        """Number of objects matching every selected filter."""
+        return sum(count for _, count in self.rows(combinations, self.clean(selected)))
+
+    def counts_by(self, combinations, selected, field):
+        """
+        ``{value: count}`` of ``field`` with every *other* selected filter
+        applied, so each option shows how many objects picking it would return.
+        """
+        counts = {}
+        for row, count in self.rows(combinations, self.clean(selected), exclude=field):
+            counts[row[field]] = counts.get(row[field], 0) + count
+        return counts
@@ -0,0 +1,155 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.functions import Cast, Floor
+
+from . import search
+from .faceting import FacetCounter
+from .models import Job, Tag
+
+# Job fields shown as filter facets, in display order
+FACETS = ['location', 'job_type', 'experience_level', 'work_mode', 'category']
+
+# Width of a salary histogram bucket, in the same unit as Job.salary_min (k)
+SALARY_BUCKET_WIDTH = 10
+
+# Smallest step and (exclusive) bound of what Job's salary fields can hold
+_salary_field = Job._meta.get_field('salary_min')
+SALARY_STEP = Decimal(1).scaleb(-_salary_field.decimal_places)
+SALARY_LIMIT = Decimal(10) ** (_salary_field.max_digits - _salary_field.decimal_places)
+
+
+def _location_matches(row, selected):
+    # Mirrors the location filter in job_list, where "remote" means work_mode
+    if selected == 'remote':
+        return row['work_mode'] == 'remote'
+    return selected.lower() in row['location'].lower()
+
+
+counter = FacetCounter('job_facets', matchers={'location': _location_matches})
+# Drops every cached facet count and salary bucket; called whenever a Job changes
+invalidate = counter.invalidate
+
+
+def parse_salary(value):
+    """
+    A salary amount that fits Job's salary fields, rounded to cents, or None
+    for anything else: blanks, junk, NaN, Infinity, out of range.
+    """
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    # Checked before rounding, which can't handle huge exponents
+    if not amount.is_finite() or abs(amount) >= SALARY_LIMIT:
+        return None
+    amount = amount.quantize(SALARY_STEP, rounding=ROUND_HALF_UP)
+    return amount if abs(amount) < SALARY_LIMIT else None
+
+
+def filter_salary(queryset, salary):
+    """Jobs whose [salary_min, salary_max] overlaps the (low, high) range; either end may be None."""
+    low, high = salary
+    if low is not None:
+        queryset = queryset.filter(salary_max__gte=low)
+    if high is not None:
+        queryset = queryset.filter(salary_min__lte=high)
+    return queryset
+
+
+def _combinations(search_query, skill, salary):
+    """
+    Count active jobs per distinct combination of facet values, restricted to
+    the search query, skill tag and salary range only. One grouped aggregate,
+    cached until the next Job write; every facet is then summed from these
+    rows in Python.
+    """
+    jobs = search.match_jobs(Job.objects.filter(is_active=True), search_query)
+    if skill:
+        jobs = jobs.filter(tags__normalized_name=Tag.normalize(skill))
+    jobs = filter_salary(jobs, salary)
+    return counter.combinations((search_query, skill, salary), jobs, FACETS)
+
+
+def job_count(search_query='', selected=None, skill='', salary=(None, None)):
+    """Number of active jobs matching the search and every selected filter."""
+    return counter.count(_combinations(search_query, skill, salary), selected)
+
+
+def job_facets(search_query='', selected=None, skill='', salary=(None, None)):
+    """
+    Return ``{facet: [{'value', 'label', 'count'}, ...]}`` for the job list.
+
+    ``selected`` maps facet names to the active filter values. Each facet is
+    counted with every *other* active filter applied, so its options show how
+    many jobs picking them would return.
+    """
+    combinations = _combinations(search_query, skill, salary)
+
+    facets = {}
+    for field in FACETS:
+        counts = counter.counts_by(combinations, selected, field)
+        choices = Job._meta.get_field(field).choices
+        if choices:
+            options = [
+                {'value': value, 'label': label, 'count': counts.get(value, 0)}
+                for value, label in choices
+            ]
+        else:
+            options = [
+                {'value': value, 'label': value, 'count': count}
+                for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            ]
+        facets[field] = options
+    return facets
+
+
+def _salary_buckets():
+    """
+    Count active jobs per (category, experience level, bucket of salary_min,
+    bucket of salary_max), cached until the next Job write. The grouped scan
+    only reads columns covered by the ``job_salary_histogram_idx`` index.
+    """
+    def load():
+        width = Value(SALARY_BUCKET_WIDTH)
+        return list(
+            Job.objects.filter(is_active=True)
+            .order_by()
+            .annotate(
+                low=Cast(Floor(F('salary_min') / width), IntegerField()),
+                high=Cast(Floor(F('salary_max') / width), IntegerField()),
+            )
+            .values_list('category', 'experience_level', 'low', 'high')
+            .annotate(count=Count('id'))
+        )
+    return counter.cached('salary_buckets', (SALARY_BUCKET_WIDTH,), load)
+
+
+def salary_histogram(category='', experience_level=''):
+    """
+    Return ``[{'min', 'max', 'count'}, ...]`` where ``count`` is the number of
+    active jobs whose salary range overlaps the bucket, optionally restricted
+    to one category and/or experience level.
+    """
+    delta = {}
+    for row_category, row_level, low, high, count in _salary_buckets():
+        if category and row_category != category:
+            continue
+        if experience_level and row_level != experience_level:
+            continue
+        low, high = min(low, high), max(low, high)
+        # Difference array: a job counts in every bucket from low to high
+        delta[low] = delta.get(low, 0) + count
+        delta[high + 1] = delta.get(high + 1, 0) - count
+
+    histogram = []
+    if delta:
+        running = 0
+        for bucket in range(min(delta), max(delta)):
+            running += delta.get(bucket, 0)
+            histogram.append({
+                'min': bucket * SALARY_BUCKET_WIDTH,
+                'max': (bucket + 1) * SALARY_BUCKET_WIDTH,
+                'count': running,
+            })
+    return histogram
@@ -0,0 +1,182 @@
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+# Who moves the bytes once Django has allowed a download:
+# - 'django': this process, through the WSGI server's file_wrapper (sendfile
+#   where the server supports it, e.g. gunicorn)
+# - 'x-accel-redirect': nginx, from an internal location mapping
+#   FILE_SERVE_ACCEL_PREFIX onto MEDIA_ROOT
+# - 'x-sendfile': Apache mod_xsendfile or lighttpd, by absolute path
+BACKEND = getattr(settings, 'FILE_SERVE_BACKEND', 'django')
+ACCEL_PREFIX = getattr(settings, 'FILE_SERVE_ACCEL_PREFIX', '/protected-media/')
+
+# Media only handed out through views that check permissions; blobs/ holds
+# the same content as every upload (see app.storage), resumes included
+PROTECTED_MEDIA = getattr(settings, 'PROTECTED_MEDIA_PREFIXES', ('resumes/', 'cv/', 'blobs/'))
+
+# Browser cache lifetime of public media; protected files are always revalidated
+PUBLIC_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 60 * 60 * 24)
+# Files whose name changes with their content never need revalidating
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileRange:
+    """
+    Reads ``length`` bytes of an open file from its current position. Keeps
+    ``fileno`` so sendfile-capable servers still skip the copy; they bound
+    the transfer by Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _byte_range(request, size, etag, mtime):
+    """
+    ``(start, end)`` of the single byte range asked for, None for the whole
+    file, or False when the range can't be satisfied. Several ranges, or a
+    stale If-Range, get the whole file, as RFC 9110 allows.
+    """
+    header = request.headers.get('Range')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range is not None and if_range != etag:
+        date = parse_http_date_safe(if_range)
+        if date is None or int(mtime) > date:
+            return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _offload_headers(response, path):
+    """Hand the transfer to the front server; False if the file is out of its reach."""
+    if BACKEND == 'x-sendfile':
+        response['X-Sendfile'] = str(path)
+        return True
+    if BACKEND == 'x-accel-redirect':
+        try:
+            relative = Path(path).resolve().relative_to(Path(settings.MEDIA_ROOT).resolve())
+        except ValueError:
+            return False
+        response['X-Accel-Redirect'] = ACCEL_PREFIX + relative.as_posix()
+        return True
+    return False
+
+
+def serve_file(request, path, filename=None, as_attachment=False, public=False, immutable=False):
+    """
+    Response for a file the view has already decided ``request`` may read:
+    validators and caching headers, 304s, single byte ranges with If-Range,
+    and the body either offloaded to the front server (FILE_SERVE_BACKEND)
+    or streamed by the WSGI server's file_wrapper. ``immutable`` files are
+    public and cached for a year.
+    """
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    etag, mtime = _etag(stat), stat.st_mtime
+    filename = filename or os.path.basename(path)
+
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+    else:
+        byte_range = None if BACKEND != 'django' else _byte_range(request, stat.st_size, etag, mtime)
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif BACKEND != 'django':
+            response = HttpResponse(content_type=content_type)
+            # The front server fills in the body, its length and any range
+            if not _offload_headers(response, path):
+                raise Http404('File not found')
+        elif byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            file = open(path, 'rb')
+            file.seek(start)
+            response = FileResponse(_FileRange(file, end - start + 1), status=206, content_type=content_type)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        if response.status_code != 416:
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    if immutable:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    elif public:
+        patch_cache_control(response, public=True, max_age=PUBLIC_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def media_path(name):
+    """Absolute path of a media file name, refusing anything outside MEDIA_ROOT."""
+    try:
+        return safe_join(Path(settings.MEDIA_ROOT).resolve(), name)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+
+
+def is_protected(path):
+    """Whether an absolute media path (see ``media_path``) is under a protected prefix."""
+    relative = Path(path).relative_to(Path(settings.MEDIA_ROOT).resolve()).as_posix()
+    return (relative + '/').startswith(PROTECTED_MEDIA)
@@ -0,0 +1,170 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import CharField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Markers around matched terms in raw snippets, see search.highlight
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def build_match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class FullTextIndex:
+    """
+    SQLite FTS5 table mirroring the searchable text of one model, with the
+    object's pk as rowid. Backends without FTS5 fall back to substring
+    matching on ``fallback_fields``.
+
+    ``columns`` maps FTS column names, in table order, to the model lookups
+    they are filled from (e.g. ``'company_name': 'company__name'``);
+    ``weights`` are the matching bm25() column weights. With
+    ``snippet_tokens``, ``search`` also annotates a raw ``search_snippet``.
+    """
+
+    def __init__(self, model, table, columns, weights, fallback_fields=None, snippet_tokens=None):
+        self.model = model
+        self.table = table
+        self.columns = list(columns)
+        self.lookups = list(columns.values())
+        self.weights = weights
+        self.fallback_fields = fallback_fields or self.lookups
+        self.snippet_tokens = snippet_tokens
+        # Per-connection flag, so each table is looked up once
+        self._available_attr = f'_{table}_available'
+
+    def create(self, schema_editor=None):
+        """Create the FTS5 table. Returns False when the backend has no FTS5."""
+        conn = schema_editor.connection if schema_editor else connection
+        if conn.vendor != 'sqlite':
+            return False
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5({', '.join(self.columns)}, tokenize='porter unicode61')"
+            )
+        setattr(conn, self._available_attr, True)
+        return True
+
+    def available(self):
+        # Checked once per connection; the table only appears through a migration
+        available = getattr(connection, self._available_attr, None)
+        if available is None:
+            available = (
+                connection.vendor == 'sqlite' and
+                self.table in connection.introspection.table_names()
+            )
+            setattr(connection, self._available_attr, available)
+        return available
+
+    def _insert(self, cursor, rows):
+        placeholders = ', '.join(['%s'] * (len(self.columns) + 1))
+        cursor.executemany(
+            f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) VALUES ({placeholders})",
+            rows,
+        )
+
+    def _rows(self, queryset):
+        return queryset.values_list('pk', *self.lookups)
+
+    def index(self, ids):
+        """(Re)index the given objects. Ids that no longer exist are dropped from the index."""
+        if not self.available():
+            return
+        ids = list(ids)
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        rows = list(self._rows(self.model.objects.filter(pk__in=ids)))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", ids)
+            self._insert(cursor, rows)
+
+    def unindex(self, ids):
+        if not self.available():
+            return
+        ids = list(ids)
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", ids)
+
+    def rebuild(self, batch_size=1000):
+        """Drop and repopulate the whole index from the model's table."""
+        if not self.create():
+            return 0
+        rows = self._rows(self.model.objects.order_by('pk'))
+        indexed = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._insert(cursor, batch)
+                    indexed += len(batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+                indexed += len(batch)
+        return indexed
+
+    def match(self, queryset, query):
+        """Restrict a queryset to the objects matching ``query``, without ranking."""
+        match = build_match_expression(query)
+        if not match:
+            return queryset
+
+        if not self.available():
+            # Fallback for backends without FTS5: substring matching
+            condition = Q()
+            for word in query.split():
+                word_condition = Q()
+                for field in self.fallback_fields:
+                    word_condition |= Q(**{f'{field}__icontains': word})
+                condition &= word_condition
+            return queryset.filter(condition)
+
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", (match,))
+        )
+
+    def search(self, queryset, query):
+        """
+        ``match`` plus a ``search_rank`` annotation (lower is better) for
+        ordering by relevance, and ``search_snippet`` when the index has
+        snippets. Both are constant when the query has no words to match
+        (e.g. only punctuation) or there is no FTS5, so ordering by them
+        always works.
+        """
+        match = build_match_expression(query)
+        queryset = self.match(queryset, query)
+        if not match or not self.available():
+            annotations = {'search_rank': Value(0.0, output_field=FloatField())}
+            if self.snippet_tokens:
+                annotations['search_snippet'] = Value('', output_field=CharField())
+            return queryset.annotate(**annotations)
+
+        weights = ', '.join(str(weight) for weight in self.weights)
+        row = f"{self.table} MATCH %s AND rowid = {self.model._meta.db_table}.{self.model._meta.pk.column}"
+        annotations = {
+            'search_rank': RawSQL(
+                f"SELECT bm25({self.table}, {weights}) FROM {self.table} WHERE {row}",
+                (match,),
+                output_field=FloatField(),
+            ),
+        }
+        if self.snippet_tokens:
+            annotations['search_snippet'] = RawSQL(
+                f"SELECT snippet({self.table}, -1, %s, %s, '…', {self.snippet_tokens}) "
+                f"FROM {self.table} WHERE {row}",
+                (MARK_START, MARK_END, match),
+                output_field=CharField(),
+            )
+        return queryset.annotate(**annotations)
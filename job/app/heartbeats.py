@@ -0,0 +1,211 @@
+import atexit
+import math
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import Enrollment, Lesson, LessonCompletion
+
+# Flush at least this often, or as soon as this many lessons are pending
+FLUSH_INTERVAL = 10
+FLUSH_SIZE = 500
+
+# Most watch time one heartbeat can claim; players beat far more often
+MAX_HEARTBEAT_SECONDS = 60
+
+# Sub-minute remainders of lessons nobody has beaten for this long are
+# written rounded to the nearest minute, and their beat times forgotten
+IDLE_SECONDS = 5 * 60
+
+_lock = threading.Lock()
+# One flush at a time per process; two would contend for SQLite's write lock
+_flush_lock = threading.Lock()
+# (enrollment_id, lesson_id) -> seconds not yet written; carries sub-minute
+# remainders across flushes since time_spent_minutes is whole minutes
+_seconds = {}
+# Keys of _seconds holding at least a minute, i.e. worth a flush
+_ready = set()
+# (enrollment_id, lesson_id) -> monotonic time of its latest heartbeat
+_beat_at = {}
+# enrollment_id -> monotonic time of its latest heartbeat, on any lesson
+_enrollment_beat_at = {}
+# enrollment_id -> time of its latest heartbeat
+_last_seen = {}
+_wake = threading.Event()
+_flusher = None
+
+
+def enrollment_owner(enrollment_id):
+    """``(user_id, course_id)`` of an enrollment, cached so heartbeats skip the lookup."""
+    return cache.get_or_set(
+        f'heartbeats:enrollment:{enrollment_id}',
+        lambda: Enrollment.objects.filter(pk=enrollment_id).values_list('user_id', 'course_id').first(),
+        60 * 60,
+    )
+
+
+def record(enrollment_id, lesson_id, seconds):
+    """
+    Buffer one heartbeat; a full buffer wakes the flusher early. A beat never
+    claims more than the time since the enrollment's previous one reached
+    this process, so replayed or parallel beats can't inflate watch time.
+    """
+    now = time.monotonic()
+    seconds = max(0, min(int(seconds), MAX_HEARTBEAT_SECONDS))
+    with _lock:
+        previous = _enrollment_beat_at.get(enrollment_id)
+        if previous is not None:
+            seconds = min(seconds, math.ceil(now - previous))
+        _enrollment_beat_at[enrollment_id] = now
+        key = (enrollment_id, lesson_id)
+        _beat_at[key] = now
+        _seconds[key] = _seconds.get(key, 0) + seconds
+        if _seconds[key] >= 60:
+            _ready.add(key)
+        _last_seen[enrollment_id] = timezone.now()
+        full = len(_ready) >= FLUSH_SIZE
+    _ensure_flusher()
+    if full:
+        _wake.set()
+
+
+def _take():
+    """
+    Swap out everything worth writing. Sub-minute remainders stay buffered
+    while their lesson is being watched; idle ones are rounded and written.
+    """
+    idle_since = time.monotonic() - IDLE_SECONDS
+    with _lock:
+        minutes = {}
+        for key in _ready:
+            minutes[key], _seconds[key] = divmod(_seconds[key], 60)
+        _ready.clear()
+        for key, seconds in list(_seconds.items()):
+            if _beat_at.get(key, idle_since) <= idle_since:
+                if seconds >= 30:
+                    minutes[key] = minutes.get(key, 0) + 1
+                del _seconds[key]
+            elif not seconds:
+                del _seconds[key]
+        for beats in (_beat_at, _enrollment_beat_at):
+            for key, beat_at in list(beats.items()):
+                if beat_at <= idle_since:
+                    del beats[key]
+        last_seen = dict(_last_seen)
+        _last_seen.clear()
+    return minutes, last_seen
+
+
+def _give_back(minutes, last_seen):
+    # A failed flush puts its batch back so nothing is lost, only delayed
+    with _lock:
+        for key, count in minutes.items():
+            _seconds[key] = _seconds.get(key, 0) + count * 60
+            _ready.add(key)
+        for enrollment_id, seen in last_seen.items():
+            _last_seen[enrollment_id] = max(seen, _last_seen.get(enrollment_id, seen))
+
+
+def write(minutes, last_seen):
+    """
+    Apply a batch in one transaction: one SELECT for the existing completion
+    rows, one INSERT for missing ones, then one batched UPDATE adding the
+    minutes and one setting last_accessed. Minutes are added in SQL, so
+    concurrent flushes from other processes are merged, not overwritten.
+    """
+    with transaction.atomic():
+        if minutes:
+            enrollment_ids = {enrollment_id for enrollment_id, _ in minutes}
+            lesson_ids = {lesson_id for _, lesson_id in minutes}
+            existing = {
+                (enrollment_id, lesson_id): pk
+                for pk, enrollment_id, lesson_id in LessonCompletion.objects.filter(
+                    enrollment_id__in=enrollment_ids, lesson_id__in=lesson_ids,
+                ).values_list('pk', 'enrollment_id', 'lesson_id')
+            }
+            # Compact enrollments only have rows for completed lessons. Skip
+            # enrollments or lessons deleted since the heartbeat, or the
+            # batch would fail its foreign keys on every retry
+            missing = [key for key in minutes if key not in existing]
+            if missing:
+                live_enrollments = set(Enrollment.objects.filter(pk__in=enrollment_ids).values_list('pk', flat=True))
+                live_lessons = set(Lesson.objects.filter(pk__in=lesson_ids).values_list('pk', flat=True))
+                missing = [
+                    (enrollment_id, lesson_id) for enrollment_id, lesson_id in missing
+                    if enrollment_id in live_enrollments and lesson_id in live_lessons
+                ]
+            if missing:
+                LessonCompletion.objects.bulk_create([
+                    LessonCompletion(enrollment_id=enrollment_id, lesson_id=lesson_id)
+                    for enrollment_id, lesson_id in missing
+                ], ignore_conflicts=True)
+                existing.update(
+                    ((enrollment_id, lesson_id), pk)
+                    for pk, enrollment_id, lesson_id in LessonCompletion.objects.filter(
+                        enrollment_id__in={enrollment_id for enrollment_id, _ in missing},
+                        lesson_id__in={lesson_id for _, lesson_id in missing},
+                    ).values_list('pk', 'enrollment_id', 'lesson_id')
+                )
+            added = [(count, existing[key]) for key, count in minutes.items() if key in existing]
+            _executemany(LessonCompletion, 'time_spent_minutes', 'time_spent_minutes + %s', added)
+        if last_seen:
+            field = Enrollment._meta.get_field('last_accessed')
+            _executemany(Enrollment, 'last_accessed', '%s', [
+                (field.get_db_prep_save(seen, connection), pk) for pk, seen in last_seen.items()
+            ])
+
+
+def _executemany(model, column, value_sql, params):
+    """
+    One prepared ``UPDATE ... WHERE id = %s`` run for every row. A CASE WHEN
+    per row costs far more ORM time than the write itself; this does not.
+    """
+    quote = connection.ops.quote_name
+    sql = f'UPDATE {quote(model._meta.db_table)} SET {quote(column)} = {value_sql} WHERE id = %s'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def flush():
+    with _flush_lock:
+        minutes, last_seen = _take()
+        if not minutes and not last_seen:
+            return
+        try:
+            write(minutes, last_seen)
+        except DatabaseError:
+            _give_back(minutes, last_seen)
+            raise
+
+
+def _run_flusher():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except DatabaseError:
+            pass
+        finally:
+            # This thread owns its own connection; don't leave it open between flushes
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        with _lock:
+            if _flusher is None or not _flusher.is_alive():
+                _flusher = threading.Thread(target=_run_flusher, name='heartbeat-flusher', daemon=True)
+                _flusher.start()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except DatabaseError:
+        pass
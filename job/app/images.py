@@ -0,0 +1,159 @@
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404
+from django.utils.crypto import salted_hmac
+from PIL import Image, ImageOps
+
+from . import fileserve
+from .models import Company, Course, Quiz, UserProfile
+
+# Bump when rendering changes, so every derivative gets a new name
+FORMAT_VERSION = 1
+
+# Derivative sizes: (width, height, crop). Cropped sizes fill the box,
+# the others fit inside it; both are about twice the displayed size.
+SIZES = {
+    'avatar': (96, 96, True),
+    'photo': (400, 400, True),
+    'card': (800, 500, True),
+    'hero': (1200, 800, False),
+}
+
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+DEFAULT_FORMAT = getattr(settings, 'IMAGE_FORMAT', 'webp')
+QUALITY = {'webp': 80, 'jpg': 82}
+
+# Image fields and the sizes templates show them at, rendered at upload
+FIELDS = {
+    Company: {'logo': ('avatar',)},
+    Course: {'thumbnail': ('avatar', 'card', 'hero'), 'instructor_photo': ('avatar', 'photo')},
+    Quiz: {'instructor_photo': ('avatar',)},
+    UserProfile: {'profile_picture': ('avatar', 'photo')},
+}
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='images')
+_pending = {}
+_pending_lock = threading.Lock()
+
+DERIVED_RE = re.compile(r'^derived/(?P<size>\w+)/(?P<digest>[0-9a-f]{16})/(?P<name>.+)\.(?P<format>webp|jpg)$')
+
+
+def _digest(name, mtime_ns, size, fmt):
+    # Keyed, so only names this site handed out can make it render anything
+    return salted_hmac('app.images', f'{name}:{mtime_ns}:{size}:{fmt}:{FORMAT_VERSION}').hexdigest()[:16]
+
+
+def derivative_name(name, size, fmt=DEFAULT_FORMAT):
+    """
+    Media name of a source image's derivative, or None if the source is
+    missing. The name changes whenever the source does, so it can be cached
+    forever.
+    """
+    try:
+        mtime_ns = os.stat(fileserve.media_path(name)).st_mtime_ns
+    except (OSError, Http404):
+        return None
+    return f'derived/{size}/{_digest(name, mtime_ns, size, fmt)}/{name}.{fmt}'
+
+
+def derivative_url(file, size, fmt=DEFAULT_FORMAT):
+    """URL of a derivative of ``file`` (an ImageField value); the original's URL if its source is missing."""
+    if not file:
+        return ''
+    name = derivative_name(file.name, size, fmt)
+    if name is None:
+        return file.url
+    return settings.MEDIA_URL + name
+
+
+def render(source, target, size, fmt):
+    """Write the ``size`` derivative of the image at ``source`` to ``target``."""
+    width, height, crop = SIZES[size]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if crop:
+            # Fill the box, but never scale small images up
+            scale = min(1, image.width / width, image.height / height)
+            image = ImageOps.fit(image, (max(int(width * scale), 1), max(int(height * scale), 1)), Image.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.LANCZOS)
+
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if fmt == 'jpg' and has_alpha:
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name and renamed, so readers never see half a file
+        fd, temp = tempfile.mkstemp(dir=target.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            if fmt == 'jpg':
+                image.save(f, FORMATS[fmt], quality=QUALITY[fmt], optimize=True, progressive=True)
+            else:
+                image.save(f, FORMATS[fmt], quality=QUALITY[fmt], method=6)
+        os.replace(temp, target)
+    return target
+
+
+def _submit(source, target, size, fmt):
+    """The future rendering ``target``; concurrent requests for it share one render."""
+    with _pending_lock:
+        future = _pending.get(target)
+        if future is None:
+            future = _executor.submit(render, source, target, size, fmt)
+            _pending[target] = future
+            future.add_done_callback(lambda _: _pending.pop(target, None))
+        return future
+
+
+def derivative_path(name):
+    """
+    Path of the derivative with media name ``name``, rendering it in the
+    worker pool if needed. Raises Http404 for names this site didn't hand
+    out, stale ones included.
+    """
+    match = DERIVED_RE.match(name)
+    if not match or match['size'] not in SIZES:
+        raise Http404('File not found')
+    source = fileserve.media_path(match['name'])
+    if fileserve.is_protected(source) or derivative_name(match['name'], match['size'], match['format']) != name:
+        raise Http404('File not found')
+    target = Path(fileserve.media_path(name))
+    if not target.exists():
+        try:
+            _submit(source, target, match['size'], match['format']).result()
+        except (OSError, Image.DecompressionBombError):
+            raise Http404('File not found')
+    return target
+
+
+def pending_derivatives(instance):
+    """``[(source, target, size, format), ...]`` of ``instance``'s images not yet rendered."""
+    missing = []
+    for field, sizes in FIELDS.get(type(instance), {}).items():
+        file = getattr(instance, field)
+        if not file:
+            continue
+        for size in sizes:
+            name = derivative_name(file.name, size)
+            if name is None:
+                continue
+            target = Path(fileserve.media_path(name))
+            if not target.exists():
+                missing.append((fileserve.media_path(file.name), target, size, DEFAULT_FORMAT))
+    return missing
+
+
+def pregenerate(instance):
+    """Queue the missing derivatives of a saved object's images, so first views don't wait."""
+    for source, target, size, fmt in pending_derivatives(instance):
+        _submit(source, target, size, fmt)
@@ -0,0 +1,174 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Choice, Question, QuestionStats, Quiz, QuizAttempt, QuizStats, UserAnswer
+
+# A distractor works when at least this share of responses picks it and it
+# draws weaker students more than strong ones (negative discrimination)
+FUNCTIONAL_SHARE = 0.05
+
+
+def _correlations(columns, scores):
+    """
+    Pearson correlation of every column of ``columns`` (n x k) with the
+    matching column of ``scores`` (n x k, or n for one shared score).
+    NaN where either side has no variance.
+    """
+    if scores.ndim == 1:
+        scores = scores[:, None]
+    centered = columns - columns.mean(axis=0)
+    centered_scores = scores - scores.mean(axis=0)
+    numerator = (centered * centered_scores).sum(axis=0)
+    denominator = np.sqrt((centered ** 2).sum(axis=0) * (centered_scores ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _or_none(value, digits=4):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def analyze(question_ids, points, choices, answers):
+    """
+    Item analysis of one quiz from plain arrays:
+
+    - ``question_ids``, ``points``: the quiz's questions in order
+    - ``choices``: ``[(choice_id, question_id, is_correct), ...]``
+    - ``answers``: ``[(attempt_id, question_id, choice_id, is_correct), ...]``
+      of completed attempts
+
+    Returns ``(quiz_stats, {question_id: question_stats})`` as dicts of
+    QuizStats and QuestionStats field values.
+    """
+    question_index = {question_id: column for column, question_id in enumerate(question_ids)}
+    choice_index = {choice_id: column for column, (choice_id, _, _) in enumerate(choices)}
+    answers = [answer for answer in answers if answer[1] in question_index]
+    attempt_ids = sorted({answer[0] for answer in answers})
+    attempt_index = {attempt_id: row for row, attempt_id in enumerate(attempt_ids)}
+    n, k, m = len(attempt_ids), len(question_ids), len(choices)
+
+    # Attempts x questions: answered, answered correctly; attempts x choices: picked
+    answered = np.zeros((n, k))
+    correct = np.zeros((n, k))
+    picked = np.zeros((n, m))
+    if answers:
+        rows = np.array([attempt_index[answer[0]] for answer in answers])
+        columns = np.array([question_index[answer[1]] for answer in answers])
+        answered[rows, columns] = 1
+        correct[rows, columns] = np.array([answer[3] for answer in answers], dtype=float)
+        chosen = [(row, choice_index[answer[2]]) for row, answer in zip(rows, answers) if answer[2] in choice_index]
+        if chosen:
+            chosen = np.array(chosen)
+            picked[chosen[:, 0], chosen[:, 1]] = 1
+
+    weights = np.array(points, dtype=float)
+    totals = correct @ weights
+    responses = answered.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = np.where(responses > 0, correct.sum(axis=0) / responses, np.nan)
+    # Corrected point-biserial: each item against the score on the other items
+    discrimination = _correlations(correct, totals[:, None] - correct * weights) if n else np.full(k, np.nan)
+
+    choice_counts = picked.sum(axis=0)
+    choice_discrimination = _correlations(picked, totals) if n else np.full(m, np.nan)
+
+    question_stats = {
+        question_id: {
+            'responses': int(responses[column]),
+            'difficulty': _or_none(difficulty[column]),
+            'discrimination': _or_none(discrimination[column]),
+            'functional_distractors': 0,
+            'choice_stats': {},
+        }
+        for question_id, column in question_index.items()
+    }
+    for column, (choice_id, question_id, is_correct) in enumerate(choices):
+        stats = question_stats.get(question_id)
+        if stats is None:
+            continue
+        share = choice_counts[column] / stats['responses'] if stats['responses'] else 0.0
+        choice_r = _or_none(choice_discrimination[column])
+        functional = bool(
+            not is_correct and share >= FUNCTIONAL_SHARE and choice_r is not None and choice_r < 0
+        )
+        stats['choice_stats'][str(choice_id)] = {
+            'count': int(choice_counts[column]),
+            'share': round(float(share), 4),
+            'discrimination': choice_r,
+            'functional': functional,
+        }
+        stats['functional_distractors'] += functional
+
+    # KR-20 on the unweighted item scores
+    reliability = None
+    if n > 1 and k > 1:
+        p = correct.mean(axis=0)
+        variance = correct.sum(axis=1).var()
+        if variance > 0:
+            reliability = round(float(k / (k - 1) * (1 - (p * (1 - p)).sum() / variance)), 4)
+
+    total_points = weights.sum()
+    quiz_stats = {
+        'attempts': n,
+        'mean_score': round(float(totals.mean() / total_points * 100), 2) if n and total_points else None,
+        'reliability': reliability,
+    }
+    return quiz_stats, question_stats
+
+
+def analyze_quiz(quiz_id):
+    """Recompute and store the item analysis of one quiz, in four queries plus the writes."""
+    # Counted first: an attempt completed after this only makes the stats stale again
+    completed_attempts = QuizAttempt.objects.filter(quiz_id=quiz_id, completed_at__isnull=False).count()
+    questions = list(
+        Question.objects.filter(quiz_id=quiz_id).order_by('order', 'id').values_list('id', 'points')
+    )
+    choices = list(
+        Choice.objects.filter(question__quiz_id=quiz_id).order_by('id').values_list('id', 'question_id', 'is_correct')
+    )
+    answers = list(
+        UserAnswer.objects.filter(attempt__quiz_id=quiz_id, attempt__completed_at__isnull=False)
+        .values_list('attempt_id', 'question_id', 'selected_choice_id', 'is_correct')
+    )
+    quiz_stats, question_stats = analyze(
+        [question_id for question_id, _ in questions], [points for _, points in questions], choices, answers,
+    )
+
+    with transaction.atomic():
+        QuizStats.objects.update_or_create(
+            quiz_id=quiz_id, defaults={**quiz_stats, 'completed_attempts': completed_attempts},
+        )
+        QuestionStats.objects.filter(question__quiz_id=quiz_id).delete()
+        QuestionStats.objects.bulk_create([
+            QuestionStats(question_id=question_id, **stats) for question_id, stats in question_stats.items()
+        ])
+    return quiz_stats
+
+
+def stale_quizzes():
+    """
+    Quizzes whose stats are missing or behind: an attempt completed since,
+    a different number of completed attempts than they were computed from
+    (retakes delete the earlier attempt), or questions edited since.
+    """
+    completed = QuizAttempt.objects.filter(quiz=OuterRef('pk'), completed_at__isnull=False)
+    return list(Quiz.objects.annotate(
+        completed_attempts=Coalesce(
+            Subquery(completed.values('quiz').annotate(count=Count('pk')).values('count')), 0,
+        ),
+    ).filter(
+        Q(stats__isnull=True) |
+        ~Q(stats__completed_attempts=F('completed_attempts')) |
+        Q(Exists(completed.filter(completed_at__gt=OuterRef('stats__computed_at')))) |
+        Q(updated_at__gt=F('stats__computed_at'))
+    ).values_list('id', flat=True))
+
+
+def refresh(quiz_ids=None):
+    """Analyze ``quiz_ids``, or every stale quiz. Returns how many were analyzed."""
+    quiz_ids = stale_quizzes() if quiz_ids is None else quiz_ids
+    for quiz_id in quiz_ids:
+        analyze_quiz(quiz_id)
+    return len(quiz_ids)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import itemanalysis
+from app.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Refresh question difficulty, discrimination and distractor stats of quizzes with new attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Analyze every quiz, not only stale ones')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        quiz_ids = list(Quiz.objects.values_list('id', flat=True)) if options['all'] else None
+        analyzed = itemanalysis.refresh(quiz_ids)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Analyzed {analyzed} quizzes in {elapsed:.1f}s'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from app.storage import DedupStorage
+
+
+class Command(BaseCommand):
+    help = 'Delete media blobs no upload links to; --adopt first moves older uploads into the blob store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adopt', action='store_true', help='Deduplicate files saved before DedupStorage')
+        parser.add_argument(
+            '--grace', type=float, default=1, metavar='HOURS',
+            help='Keep blobs whose links changed this recently (default 1)',
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, DedupStorage):
+            raise CommandError('The default storage is not app.storage.DedupStorage')
+        started = time.monotonic()
+        if options['adopt']:
+            adopted = default_storage.adopt_files()
+            self.stdout.write(f'Adopted {adopted} files into the blob store')
+        removed, freed = default_storage.collect_garbage(grace=options['grace'] * 60 * 60)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} orphaned blobs ({freed / 1024:.0f} KiB) in {elapsed:.1f}s'
+        ))
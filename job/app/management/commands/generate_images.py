@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import images
+
+
+class Command(BaseCommand):
+    help = 'Render the missing resized derivatives of every uploaded logo, photo and thumbnail'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rendered = 0
+        for model, fields in images.FIELDS.items():
+            for instance in model.objects.only('pk', *fields).iterator():
+                for source, target, size, fmt in images.pending_derivatives(instance):
+                    try:
+                        images.render(source, target, size, fmt)
+                    except OSError as error:
+                        self.stderr.write(f'{source}: {error}')
+                        continue
+                    rendered += 1
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} image derivatives in {elapsed:.1f}s'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app import course_facets, course_search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for courses'
+
+    def handle(self, *args, **options):
+        indexed = course_search.rebuild_index()
+        course_facets.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} courses'))
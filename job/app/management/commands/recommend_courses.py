@@ -0,0 +1,27 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app import coenrollment
+
+
+class Command(BaseCommand):
+    help = 'Precompute the courses most often taken together with each course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=coenrollment.TOP_K, help='Neighbors stored per course')
+        parser.add_argument(
+            '--changed-since', type=float, metavar='HOURS',
+            help='Only refresh courses whose enrollments changed in the last HOURS',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        course_ids = None
+        if options['changed_since'] is not None:
+            course_ids = coenrollment.changed_courses(timezone.now() - timedelta(hours=options['changed_since']))
+        courses = coenrollment.compute_neighbors(course_ids, k=options['limit'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Refreshed neighbors of {courses} courses in {elapsed:.1f}s'))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import matching
+
+
+class Command(BaseCommand):
+    help = 'Precompute recommended jobs for every user with skills or languages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Jobs stored per user')
+        parser.add_argument('--chunk-size', type=int, default=64, help='Users scored per matrix product')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = matching.score_all_users(limit=options['limit'], chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Scored {users} users in {elapsed:.1f}s'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app import progress
+
+
+class Command(BaseCommand):
+    help = 'Repair drifted lesson totals and enrollment progress counters'
+
+    def handle(self, *args, **options):
+        courses, enrollments = progress.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Fixed {courses} courses and {enrollments} enrollments'))
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import counters
+
+
+class Command(BaseCommand):
+    help = 'Add pending counter shards into students_count, attempts_count and ratings'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated = counters.rollup()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Rolled up counters of {updated} objects in {elapsed:.1f}s'))
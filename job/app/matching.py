@@ -0,0 +1,276 @@
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import scipy.sparse as sp
+from django.db import DatabaseError, connection, transaction
+
+from . import pagecache
+from .models import Experience, Job, JobRecommendation, JobTag, Language, Skill, Tag
+
+# Minimum years of experience implied by each Job.experience_level
+EXPERIENCE_YEARS = {
+    'entry': 0,
+    'mid': 2,
+    'senior': 5,
+    'top': 8,
+}
+
+# Weight of a spoken language in the skill vector, by Language.proficiency
+LANGUAGE_WEIGHTS = {
+    'basic': 0.25,
+    'conversational': 0.5,
+    'professional': 0.8,
+    'native': 1.0,
+}
+
+SKILL_WEIGHT = 0.8
+EXPERIENCE_WEIGHT = 0.2
+
+# A stale matrix is rebuilt at most this often, so a burst of Job writes
+# costs one rebuild rather than one per request in between
+REBUILD_INTERVAL = 30
+
+# Guards the fields below; held only to read or swap them
+_lock = threading.Lock()
+# One build at a time per process
+_build_lock = threading.Lock()
+_matrix = None
+_matrix_version = None
+_built_at = 0.0
+_rebuilding = False
+
+
+class JobMatrix:
+    """
+    Every active job as a row of a sparse jobs x tags matrix, rows scaled so
+    that a candidate who knows all of a job's skills at 100% scores 1.0.
+    """
+
+    def __init__(self, job_ids, tag_index, skills, required_years):
+        self.job_ids = job_ids
+        self.tag_index = tag_index
+        self.skills = skills
+        self.required_years = required_years
+
+    @classmethod
+    def build(cls):
+        jobs = list(Job.objects.filter(is_active=True).order_by('id').values_list('id', 'experience_level'))
+        row_of = {job_id: row for row, (job_id, _) in enumerate(jobs)}
+
+        tag_index = {}
+        rows, cols = [], []
+        links = JobTag.objects.filter(job__is_active=True).values_list('job_id', 'tag__normalized_name')
+        for job_id, name in links.iterator():
+            rows.append(row_of[job_id])
+            cols.append(tag_index.setdefault(name, len(tag_index)))
+
+        skills = sp.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(jobs), len(tag_index)),
+        )
+        required = np.asarray(skills.sum(axis=1)).ravel()
+        required[required == 0] = 1
+        skills = sp.diags(1.0 / required) @ skills
+
+        return cls(
+            job_ids=np.array([job_id for job_id, _ in jobs], dtype=np.int64),
+            tag_index=tag_index,
+            skills=skills.tocsr(),
+            required_years=np.array(
+                [EXPERIENCE_YEARS.get(level, 0) for _, level in jobs], dtype=np.float64
+            ),
+        )
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def user_vector(self, skills, languages):
+        """Dense tag vector from (name, percentage) skills and (name, proficiency) languages."""
+        vector = np.zeros(len(self.tag_index))
+        weighted = [(name, percentage / 100) for name, percentage in skills]
+        weighted += [(name, LANGUAGE_WEIGHTS.get(proficiency, 0.5)) for name, proficiency in languages]
+        for name, weight in weighted:
+            column = self.tag_index.get(Tag.normalize(name))
+            if column is not None:
+                vector[column] = max(vector[column], min(max(weight, 0.0), 1.0))
+        return vector
+
+    def experience_fit(self, years):
+        """1.0 once ``years`` meets each job's level, scaled down below it."""
+        return np.minimum(1.0, (np.asarray(years, dtype=np.float64)[..., None] + 1) / (self.required_years + 1))
+
+    def score(self, vector, years):
+        coverage = self.skills @ vector
+        scores = SKILL_WEIGHT * coverage + EXPERIENCE_WEIGHT * self.experience_fit(years)
+        # Only recommend jobs sharing at least one skill with the candidate
+        return np.where(coverage > 0, scores, 0.0)
+
+    def top(self, scores, limit):
+        """Indices of the ``limit`` best non-zero scores, best first."""
+        limit = min(limit, int(np.count_nonzero(scores)))
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        return best[np.argsort(-scores[best], kind='stable')]
+
+
+def version():
+    """
+    Shared version of the active jobs, so a Job write in any process reaches
+    every matrix. A pagecache token: an evicted key never comes back as a
+    version some process still holds.
+    """
+    return pagecache.version('matrix', 'job')
+
+
+def invalidate():
+    """Mark the matrix of every process stale; each rebuilds it in the background."""
+    pagecache.invalidate('matrix', 'job')
+
+
+def _rebuild(version):
+    """Build the matrix for ``version`` (read before building) and swap it in."""
+    global _matrix, _matrix_version, _built_at
+    with _build_lock:
+        with _lock:
+            if _matrix is not None and _matrix_version == version:
+                return _matrix
+        matrix = JobMatrix.build()
+        with _lock:
+            _matrix, _matrix_version, _built_at = matrix, version, time.monotonic()
+        return matrix
+
+
+def _rebuild_in_background(version):
+    global _rebuilding
+    try:
+        _rebuild(version)
+    except DatabaseError:
+        # Keep serving the previous matrix; the next request retries
+        pass
+    finally:
+        with _lock:
+            _rebuilding = False
+        # This thread owns its own connection; don't leave it open
+        connection.close()
+
+
+def _start_rebuild(version):
+    threading.Thread(target=_rebuild_in_background, args=(version,), name='job-matrix', daemon=True).start()
+
+
+def get_matrix(wait=False):
+    """
+    The per-process job matrix. Built on first use; once a Job changes it is
+    rebuilt in a background thread, at most once per REBUILD_INTERVAL, and
+    the previous matrix is served meanwhile. With ``wait``, a stale matrix
+    is rebuilt before returning instead.
+    """
+    global _rebuilding
+    current = version()
+    with _lock:
+        matrix = _matrix
+        if matrix is not None and _matrix_version == current:
+            return matrix
+        start = (
+            matrix is not None and not wait and not _rebuilding and
+            time.monotonic() - _built_at >= REBUILD_INTERVAL
+        )
+        if start:
+            _rebuilding = True
+    if matrix is None or wait:
+        return _rebuild(current)
+    if start:
+        _start_rebuild(current)
+    return matrix
+
+
+def experience_years(periods, today=None):
+    """Total years across (start_date, end_date) pairs; open-ended periods run to today."""
+    today = today or date.today()
+    days = sum(((end or today) - start).days for start, end in periods if start)
+    return max(days, 0) / 365.25
+
+
+def score_user(user, limit=5):
+    """Return ``[(job_id, score), ...]`` for one user, best first."""
+    matrix = get_matrix()
+    if not len(matrix):
+        return []
+    vector = matrix.user_vector(
+        Skill.objects.filter(user=user).values_list('name', 'percentage'),
+        Language.objects.filter(user=user).values_list('name', 'proficiency'),
+    )
+    years = experience_years(Experience.objects.filter(user=user).values_list('start_date', 'end_date'))
+    scores = matrix.score(vector, years)
+    return [(int(matrix.job_ids[row]), float(scores[row])) for row in matrix.top(scores, limit)]
+
+
+def recommended_jobs(user, limit=5):
+    """
+    Jobs recommended to ``user``, each with a ``match_score`` attribute.
+    Uses the nightly precomputed rows when present, else scores live.
+    """
+    stored = list(
+        JobRecommendation.objects.filter(user=user, job__is_active=True)
+        .select_related('job__company')[:limit]
+    )
+    if stored:
+        jobs = []
+        for recommendation in stored:
+            recommendation.job.match_score = recommendation.score
+            jobs.append(recommendation.job)
+        return jobs
+
+    ranked = score_user(user, limit)
+    jobs = Job.objects.select_related('company').in_bulk([job_id for job_id, _ in ranked])
+    result = []
+    for job_id, score in ranked:
+        if job_id in jobs:
+            jobs[job_id].match_score = score
+            result.append(jobs[job_id])
+    return result
+
+
+def score_all_users(limit=20, chunk_size=64):
+    """
+    Score every user with skills or languages against every active job and
+    replace their stored JobRecommendation rows. Users are scored a chunk at
+    a time as one sparse (users x tags) @ (tags x jobs) product, so memory
+    stays at ``chunk_size x jobs`` floats. Returns the number of users scored.
+    """
+    matrix = get_matrix(wait=True)
+    if not len(matrix):
+        return 0
+
+    profiles = {}
+    for user_id, name, percentage in Skill.objects.values_list('user_id', 'name', 'percentage').iterator():
+        profiles.setdefault(user_id, ([], []))[0].append((name, percentage))
+    for user_id, name, proficiency in Language.objects.values_list('user_id', 'name', 'proficiency').iterator():
+        profiles.setdefault(user_id, ([], []))[1].append((name, proficiency))
+    periods = {}
+    for user_id, start, end in Experience.objects.values_list('user_id', 'start_date', 'end_date').iterator():
+        periods.setdefault(user_id, []).append((start, end))
+
+    user_ids = sorted(profiles)
+    transposed = matrix.skills.T.tocsc()
+    for offset in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[offset:offset + chunk_size]
+        vectors = sp.csr_matrix(np.vstack([matrix.user_vector(*profiles[user_id]) for user_id in chunk]))
+        years = np.array([experience_years(periods.get(user_id, [])) for user_id in chunk])
+
+        coverage = (vectors @ transposed).toarray()
+        scores = SKILL_WEIGHT * coverage + EXPERIENCE_WEIGHT * matrix.experience_fit(years)
+        scores = np.where(coverage > 0, scores, 0.0)
+
+        recommendations = [
+            JobRecommendation(user_id=user_id, job_id=int(matrix.job_ids[row]), score=float(scores[i, row]))
+            for i, user_id in enumerate(chunk)
+            for row in matrix.top(scores[i], limit)
+        ]
+        with transaction.atomic():
+            JobRecommendation.objects.filter(user_id__in=chunk).delete()
+            JobRecommendation.objects.bulk_create(recommendations)
+    return len(user_ids)
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+FTS_TABLE = 'app_job_fts'
+
+
+def create_job_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends fall back to substring search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, company_name, skills_required, description, requirements, "
+            f"tokenize='porter unicode61')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} "
+            f"(rowid, title, company_name, skills_required, description, requirements) "
+            f"SELECT j.id, j.title, c.name, j.skills_required, j.description, j.requirements "
+            f"FROM app_job j INNER JOIN app_company c ON c.id = j.company_id"
+        )
+
+
+def drop_job_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_certificate_education_experience_language_project_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_job_search_index, drop_job_search_index),
+    ]
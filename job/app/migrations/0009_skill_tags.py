@@ -0,0 +1,132 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# (model, CSV field, through model, FK name on the through model)
+TAGGED_MODELS = [
+    ('Job', 'skills_required', 'JobTag', 'job'),
+    ('Course', 'skills_covered', 'CourseTag', 'course'),
+    ('Project', 'technologies', 'ProjectTag', 'project'),
+]
+
+
+def normalize(name):
+    return ' '.join(name.split()).casefold()
+
+
+def backfill_tags(apps, schema_editor):
+    Tag = apps.get_model('app', 'Tag')
+    tags = {}
+
+    for model_name, field, through_name, fk_name in TAGGED_MODELS:
+        model = apps.get_model('app', model_name)
+        through = apps.get_model('app', through_name)
+        links = []
+        for obj_id, value in model.objects.values_list('id', field).iterator():
+            seen = set()
+            for name in (value or '').split(','):
+                name = ' '.join(name.split())[:100]
+                key = normalize(name)
+                if not name or key in seen:
+                    continue
+                seen.add(key)
+                if key not in tags:
+                    tags[key] = Tag.objects.create(name=name, normalized_name=key)
+                links.append(through(**{f'{fk_name}_id': obj_id, 'tag': tags[key], 'position': len(seen) - 1}))
+        through.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='app.project')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_links', to='app.tag')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='app.job')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_links', to='app.tag')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='app.course')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_links', to='app.tag')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='courses', through='app.CourseTag', to='app.tag'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='jobs', through='app.JobTag', to='app.tag'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='projects', through='app.ProjectTag', to='app.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='projecttag',
+            index=models.Index(fields=['tag', 'project'], name='projecttag_tag_project_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='projecttag',
+            unique_together={('project', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='jobtag',
+            index=models.Index(fields=['tag', 'job'], name='jobtag_tag_job_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobtag',
+            unique_together={('job', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='coursetag',
+            index=models.Index(fields=['tag', 'course'], name='coursetag_tag_course_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coursetag',
+            unique_together={('course', 'tag')},
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_progress(apps, schema_editor):
+    Course = apps.get_model('app', 'Course')
+    Enrollment = apps.get_model('app', 'Enrollment')
+    Lesson = apps.get_model('app', 'Lesson')
+    LessonCompletion = apps.get_model('app', 'LessonCompletion')
+
+    Course.objects.update(total_lessons=Coalesce(Subquery(
+        Lesson.objects.filter(course=OuterRef('pk'))
+        .order_by().values('course').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0)))
+
+    completed = LessonCompletion.objects.filter(enrollment=OuterRef('pk'), completed=True)
+    Enrollment.objects.update(completed_lessons_count=Coalesce(Subquery(
+        completed.order_by().values('enrollment').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0)))
+
+    completed = LessonCompletion.objects.filter(enrollment=OuterRef(OuterRef('pk')), completed=True)
+    Enrollment.objects.update(next_lesson=Subquery(
+        Lesson.objects.filter(course=OuterRef('course'))
+        .exclude(id__in=completed.values('lesson'))
+        .order_by('order', 'id').values('id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_lessons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='next_lesson',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.lesson'),
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:27
+
+from django.db import migrations, models
+
+
+def assign_slots(apps, schema_editor):
+    Course = apps.get_model('app', 'Course')
+    Lesson = apps.get_model('app', 'Lesson')
+    for course in Course.objects.all().iterator():
+        lessons = list(Lesson.objects.filter(course=course).order_by('order', 'id'))
+        for slot, lesson in enumerate(lessons):
+            lesson.slot = slot
+        Lesson.objects.bulk_update(lessons, ['slot'], batch_size=500)
+        Course.objects.filter(pk=course.pk).update(lesson_slots=len(lessons))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lesson_slots',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='compact',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completion_bits',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='slot',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(assign_slots, migrations.RunPython.noop),
+    ]
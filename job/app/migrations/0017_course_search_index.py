@@ -0,0 +1,38 @@
+from django.db import migrations
+
+FTS_TABLE = 'app_course_fts'
+
+
+def create_course_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends fall back to substring search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, instructor, skills_covered, short_description, description, "
+            f"tokenize='porter unicode61')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} "
+            f"(rowid, title, instructor, skills_covered, short_description, description) "
+            f"SELECT id, title, instructor, skills_covered, short_description, description FROM app_course"
+        )
+
+
+def drop_course_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_course_neighbors'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_course_search_index, drop_course_search_index),
+    ]
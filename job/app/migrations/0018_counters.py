@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def backfill_counters(apps, schema_editor):
+    Course = apps.get_model('app', 'Course')
+    Enrollment = apps.get_model('app', 'Enrollment')
+    Quiz = apps.get_model('app', 'Quiz')
+    QuizAttempt = apps.get_model('app', 'QuizAttempt')
+
+    # students_count was never maintained; attempts_count lost concurrent updates
+    Course.objects.update(students_count=Coalesce(Subquery(
+        Enrollment.objects.filter(course=OuterRef('pk'))
+        .order_by().values('course').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0)))
+    Quiz.objects.update(attempts_count=Coalesce(Subquery(
+        QuizAttempt.objects.filter(quiz=OuterRef('pk'), completed_at__isnull=False)
+        .order_by().values('quiz').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0)))
+
+    # Keep the existing averages: rating_total is whatever they stand for
+    for model in (Course, Quiz):
+        model.objects.update(rating_total=Round(F('rating') * F('rating_count')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_course_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='rating',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='rating',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=50)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('model', 'object_id', 'field', 'shard')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
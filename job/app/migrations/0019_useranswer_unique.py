@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+from django.db import migrations
+from django.db.models import Min
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    # A double submit used to store the same question twice; keep the first answer
+    UserAnswer = apps.get_model('app', 'UserAnswer')
+    first_ids = (
+        UserAnswer.objects.order_by().values('attempt', 'question').annotate(first=Min('id')).values_list('first', flat=True)
+    )
+    UserAnswer.objects.exclude(id__in=list(first_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='useranswer',
+            unique_together={('attempt', 'question')},
+        ),
+    ]
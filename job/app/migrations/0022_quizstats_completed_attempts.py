@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_versions_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizstats',
+            name='completed_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_changes(apps, schema_editor):
+    # Changes were detected by last_accessed until now; start from it so the
+    # next incremental refresh covers the same enrollments
+    Enrollment = apps.get_model('app', 'Enrollment')
+    Enrollment.objects.update(progress_changed_at=F('last_accessed'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_quizstats_completed_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollments_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='progress_changed_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
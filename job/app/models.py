@@ -1,11 +1,33 @@
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
+class Tag(models.Model):
+    """Canonical skill/technology tag shared by jobs, courses and projects."""
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return self.name
+    
+    @staticmethod
+    def normalize(name):
+        return ' '.join(name.split()).casefold()
+
+
+def _prefetched_tag_names(obj):
+    """Tag names in CSV order when the view prefetched ``tag_links__tag``, else None."""
+    links = getattr(obj, '_prefetched_objects_cache', {}).get('tag_links')
+    if links is None:
+        return None
+    return [link.tag.name for link in links]
+
+
 class Company(models.Model):
     name = models.CharField(max_length=200)
     logo = models.ImageField(upload_to='company_logos/', blank=True, null=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -43,8 +65,21 @@ class Job(models.Model):
     requirements = models.TextField()
     skills_required = models.CharField(max_length=500)
     posted_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     category = models.CharField(max_length=100, default='General')
+    tags = models.ManyToManyField(Tag, through='JobTag', related_name='jobs', blank=True)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)  # Partner feed id
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', '-posted_date', '-id'], name='job_active_posted_idx'),
+            models.Index(fields=['is_active', 'salary_min', 'salary_max'], name='job_salary_range_idx'),
+            models.Index(
+                fields=['is_active', 'category', 'experience_level', 'salary_min', 'salary_max'],
+                name='job_salary_histogram_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} at {self.company.name}"
@@ -53,10 +88,39 @@ class Job(models.Model):
         return f"${self.salary_min}k - ${self.salary_max}k"
     
     def get_skills_list(self):
+        names = _prefetched_tag_names(self)
+        if names is not None:
+            return names
         return [skill.strip() for skill in self.skills_required.split(',')]
     
     def get_formatted_date(self):
         return self.posted_date.strftime('%d/%m/%Y')
+
+class JobTag(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='job_links')
+    position = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position']
+        unique_together = ['job', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'job'], name='jobtag_tag_job_idx'),
+        ]
+    
+class JobRecommendation(models.Model):
+    """Precomputed job match for a user, refreshed by ``manage.py recommend_jobs``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='job_recommendations')
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
+    score = models.FloatField()
+    computed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-score']
+        unique_together = ['user', 'job']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.job.title} ({self.score:.2f})"
     
 class CourseCategory(models.Model):
     name = models.CharField(max_length=100)
@@ -83,17 +147,32 @@ class Course(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     duration_weeks = models.IntegerField()
     lessons_count = models.IntegerField()
+    total_lessons = models.PositiveIntegerField(default=0)  # Lesson rows, kept by app.progress
+    lesson_slots = models.PositiveIntegerField(default=0, editable=False)  # Bitmap positions handed out so far
     skills_covered = models.CharField(max_length=500)
     rating = models.DecimalField(max_digits=3, decimal_places=1, default=4.5)
     rating_count = models.IntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0, editable=False)  # Sum of the stars behind rating
     students_count = models.IntegerField(default=0)
     created_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Last enrollment removed or lesson added/deleted, see app.coenrollment.changed_courses
+    enrollments_changed_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
     is_active = models.BooleanField(default=True)
+    tags = models.ManyToManyField(Tag, through='CourseTag', related_name='courses', blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', '-created_date', '-id'], name='course_active_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
     def get_skills_list(self):
+        names = _prefetched_tag_names(self)
+        if names is not None:
+            return names
         return [skill.strip() for skill in self.skills_covered.split(',')]
     
     def get_difficulty_badge_class(self):
@@ -109,6 +188,18 @@ class Course(models.Model):
         index = self.id % len(colors) if self.id else 0
         return colors[index]
 
+class CourseTag(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='course_links')
+    position = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position']
+        unique_together = ['course', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'course'], name='coursetag_tag_course_idx'),
+        ]
+
 class Lesson(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
     title = models.CharField(max_length=200)
@@ -116,12 +207,25 @@ class Lesson(models.Model):
     video_url = models.URLField(blank=True, null=True)
     duration_minutes = models.IntegerField()
     order = models.IntegerField(default=0)
+    # Bit position in Enrollment.completion_bits; fixed for life, so reordering
+    # lessons never moves completion state
+    slot = models.PositiveIntegerField(null=True, editable=False)
     
     class Meta:
         ordering = ['order']
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+    
+    def save(self, *args, **kwargs):
+        if self.slot is None:
+            # Slots are never reused, so a deleted lesson's bits can't leak onto a new one
+            with transaction.atomic():
+                Course.objects.filter(pk=self.course_id).update(lesson_slots=models.F('lesson_slots') + 1)
+                self.slot = Course.objects.values_list('lesson_slots', flat=True).get(pk=self.course_id) - 1
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
 class Enrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -129,6 +233,16 @@ class Enrollment(models.Model):
     enrolled_date = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
     last_accessed = models.DateTimeField(default=timezone.now)  # Changed from auto_now=True
+    # Denormalized progress, kept in step by app.progress
+    completed_lessons_count = models.PositiveIntegerField(default=0)
+    next_lesson = models.ForeignKey('Lesson', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Compact enrollments keep completion as one bit per Lesson.slot and only
+    # create LessonCompletion rows for lessons actually completed
+    compact = models.BooleanField(default=False)
+    completion_bits = models.BinaryField(default=b'', editable=False)
+    rating = models.PositiveSmallIntegerField(null=True, blank=True)  # 1-5 stars, counted by app.counters
+    # Last change of completed_lessons_count, see app.coenrollment.changed_courses
+    progress_changed_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     class Meta:
         unique_together = ['user', 'course']
@@ -144,36 +258,34 @@ class Enrollment(models.Model):
     
     def get_progress_percentage(self):
         """Calculate progress percentage based on completed lessons"""
-        try:
-            completed_lessons = LessonCompletion.objects.filter(
-                enrollment=self, 
-                completed=True
-            ).count()
-            total_lessons = self.course.lessons.count()
-            if total_lessons == 0:
-                return 0
-            return int((completed_lessons / total_lessons) * 100)
-        except:
+        total_lessons = self.course.total_lessons
+        if total_lessons == 0:
             return 0
+        return min(int((self.completed_lessons_count / total_lessons) * 100), 100)
     
     def get_completed_lessons_count(self):
-        try:
-            return LessonCompletion.objects.filter(enrollment=self, completed=True).count()
-        except:
-            return 0
+        return self.completed_lessons_count
     
     def get_next_lesson(self):
         """Get the next uncompleted lesson"""
-        try:
-            completed_lessons = LessonCompletion.objects.filter(
-                enrollment=self, 
-                completed=True
-            ).values_list('lesson_id', flat=True)
-            
-            next_lesson = self.course.lessons.exclude(id__in=completed_lessons).first()
-            return next_lesson
-        except:
-            return None
+        return self.next_lesson
+
+class CourseNeighbor(models.Model):
+    """Course often taken together with ``course``, refreshed by ``manage.py recommend_courses``."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbor_of')
+    score = models.FloatField()
+    computed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-score']
+        unique_together = ['course', 'neighbor']
+        indexes = [
+            models.Index(fields=['course', '-score'], name='neighbor_course_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.course.title} -> {self.neighbor.title} ({self.score:.2f})"
 
 class LessonCompletion(models.Model):
     enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE)
@@ -216,9 +328,16 @@ class Quiz(models.Model):
     passing_score = models.IntegerField(default=70)
     rating = models.DecimalField(max_digits=3, decimal_places=1, default=5.0)
     rating_count = models.IntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0, editable=False)  # Sum of the stars behind rating
     attempts_count = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', '-created_date', '-id'], name='quiz_active_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -271,6 +390,7 @@ class QuizAttempt(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     passed = models.BooleanField(default=False)
+    rating = models.PositiveSmallIntegerField(null=True, blank=True)  # 1-5 stars, counted by app.counters
     
     class Meta:
         unique_together = ['user', 'quiz']
@@ -278,6 +398,38 @@ class QuizAttempt(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title}"
 
+class QuizStats(models.Model):
+    """Item analysis totals of a quiz, refreshed by ``manage.py analyze_quizzes``."""
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)  # Completed attempts analysed
+    completed_attempts = models.PositiveIntegerField(default=0)  # Completed attempts when computed, answered or not
+    mean_score = models.FloatField(null=True, blank=True)
+    reliability = models.FloatField(null=True, blank=True)  # KR-20
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'quiz stats'
+    
+    def __str__(self):
+        return f"{self.quiz.title} ({self.attempts} attempts)"
+
+class QuestionStats(models.Model):
+    """Item analysis of one question, refreshed with its quiz's QuizStats."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='stats')
+    responses = models.PositiveIntegerField(default=0)
+    difficulty = models.FloatField(null=True, blank=True)  # p-value: share of responses that were right
+    discrimination = models.FloatField(null=True, blank=True)  # Point-biserial with the rest of the score
+    functional_distractors = models.PositiveSmallIntegerField(default=0)
+    # {choice_id: {'count', 'share', 'discrimination', 'functional'}}
+    choice_stats = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'question stats'
+    
+    def __str__(self):
+        return f"Stats for {self.question}"
+
 class UserAnswer(models.Model):
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='user_answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -285,6 +437,9 @@ class UserAnswer(models.Model):
     answer_text = models.TextField(blank=True)
     is_correct = models.BooleanField(default=False)
     
+    class Meta:
+        unique_together = ['attempt', 'question']
+    
     def __str__(self):
         return f"{self.attempt.user.username} - {self.question.question_text}"
     
@@ -351,6 +506,7 @@ class Project(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     technologies = models.CharField(max_length=500)
+    tags = models.ManyToManyField(Tag, through='ProjectTag', related_name='projects', blank=True)
     project_url = models.URLField(blank=True)
     github_url = models.URLField(blank=True)
     start_date = models.DateField()
@@ -360,8 +516,23 @@ class Project(models.Model):
         return self.title
     
     def get_technologies_list(self):
+        names = _prefetched_tag_names(self)
+        if names is not None:
+            return names
         return [tech.strip() for tech in self.technologies.split(',')]
 
+class ProjectTag(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='project_links')
+    position = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position']
+        unique_together = ['project', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'project'], name='projecttag_tag_project_idx'),
+        ]
+
 class Language(models.Model):
     PROFICIENCY_LEVELS = [
         ('basic', 'Basic'),
@@ -387,4 +558,22 @@ class Certificate(models.Model):
     credential_url = models.URLField(blank=True)
     
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class CounterShard(models.Model):
+    """
+    Pending increments of one counter field, spread over several rows so that
+    concurrent writers rarely touch the same one. ``manage.py rollup_counters``
+    adds them into the real field and deletes them.
+    """
+    model = models.CharField(max_length=100)  # e.g. 'app.course'
+    object_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['model', 'object_id', 'field', 'shard']
+    
+    def __str__(self):
+        return f"{self.model}:{self.object_id}.{self.field}[{self.shard}] {self.value:+d}"
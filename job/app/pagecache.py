@@ -0,0 +1,74 @@
+import time
+
+from django.core.cache import cache, caches
+from django.shortcuts import get_object_or_404
+
+from .models import Course, Job
+from .tags import with_tags
+
+# Detail pages keep their object and rendered fragments this long; saves
+# invalidate sooner, this only bounds relative dates like "posted 3 days ago"
+CACHE_TIMEOUT = 60 * 15
+
+
+def _version_key(kind, pk):
+    return f'pagecache:{kind}:{pk}:version'
+
+
+def _versions():
+    # Shared by every process (see CACHES), unlike the objects themselves
+    return caches['versions']
+
+
+def version(kind, pk):
+    """
+    Current cache version of one object, e.g. ``version('job', 42)``. Read
+    from the shared 'versions' cache, so a save in any process is seen here;
+    objects and fragments cached in this process are keyed by it.
+    """
+    key = _version_key(kind, pk)
+    versions = _versions()
+    value = versions.get(key)
+    if value is None:
+        value = time.time_ns()
+        # add(), so two processes missing at once agree on one token
+        if not versions.add(key, value, None):
+            value = versions.get(key, value)
+    return value
+
+
+def invalidate(kind, *pks):
+    """
+    Give each object a fresh version so its cached object and fragments are
+    never read again. Versions are timestamps rather than counters so that
+    many objects can be bumped with one ``set_many``, and an evicted version
+    key can never fall back to a version that was already used.
+    """
+    if pks:
+        token = time.time_ns()
+        _versions().set_many({_version_key(kind, pk): token for pk in pks}, None)
+
+
+def get_object(kind, pk, cache_version, loader):
+    """Return the cached object for ``(kind, pk, cache_version)``, calling ``loader()`` on a miss."""
+    key = f'pagecache:{kind}:{pk}:{cache_version}'
+    obj = cache.get(key)
+    if obj is None:
+        obj = loader()
+        cache.set(key, obj, CACHE_TIMEOUT)
+    return obj
+
+
+def get_job(job_id, cache_version):
+    """Active job with company and tags, as rendered by job_detail."""
+    return get_object('job', job_id, cache_version, lambda: get_object_or_404(
+        with_tags(Job.objects.select_related('company')), id=job_id, is_active=True
+    ))
+
+
+def get_course(course_id, cache_version):
+    """Active course with category, tags and lessons, as rendered by course_detail."""
+    return get_object('course', course_id, cache_version, lambda: get_object_or_404(
+        with_tags(Course.objects.select_related('category').prefetch_related('lessons')),
+        id=course_id, is_active=True,
+    ))
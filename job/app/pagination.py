@@ -0,0 +1,167 @@
+import datetime
+import decimal
+import json
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+_TOKEN_SALT = 'app.pagination'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values, direction):
+    return signing.dumps(
+        {'k': values, 'd': direction},
+        salt=_TOKEN_SALT,
+        serializer=_CursorSerializer,
+        compress=True,
+    )
+
+
+def decode_cursor(token):
+    try:
+        data = signing.loads(token, salt=_TOKEN_SALT, serializer=_CursorSerializer)
+        return data['k'], data['d']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor(token)
+
+
+class _CursorEncoder(json.JSONEncoder):
+    # Unlike DjangoJSONEncoder, keeps full microsecond precision so that a
+    # cursor compares equal to the row it was taken from
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date)):
+            return o.isoformat()
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        return super().default(o)
+
+
+class _CursorSerializer:
+    def dumps(self, obj):
+        return _CursorEncoder(separators=(',', ':')).encode(obj).encode('latin-1')
+
+    def loads(self, data):
+        return signing.JSONSerializer().loads(data)
+
+
+def _keyset_condition(ordering, values, forward):
+    """
+    Build the WHERE clause selecting rows strictly after (or before, when not
+    ``forward``) the row whose ordering key is ``values``:
+    (a > va) OR (a = va AND b > vb) OR ...
+    """
+    condition = Q()
+    equal_so_far = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = f'{name}__lt' if descending == forward else f'{name}__gt'
+        condition |= equal_so_far & Q(**{lookup: value})
+        equal_so_far &= Q(**{name: value})
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset. Iterates like a list and exposes
+    opaque ``next_token``/``previous_token`` cursors for the adjacent pages.
+    """
+
+    def __init__(self, object_list, queryset, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self._queryset = queryset
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @cached_property
+    def count(self):
+        """Total number of rows across all pages (one COUNT query)."""
+        return self._queryset.count()
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    @cached_property
+    def next_token(self):
+        if not self.has_next:
+            return None
+        return encode_cursor(self._key(self.object_list[-1]), 'n')
+
+    @cached_property
+    def previous_token(self):
+        if not self.has_previous:
+            return None
+        return encode_cursor(self._key(self.object_list[0]), 'p')
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(queryset, request, ordering, page_size=None):
+    """
+    Return the page of ``queryset`` selected by the ``cursor`` GET parameter.
+
+    ``ordering`` must end with a unique field (normally ``-id``) so that the
+    key identifies exactly one row; every page then costs one indexed range
+    query of ``page_size + 1`` rows, however deep into the listing it is.
+    An invalid or tampered cursor falls back to the first page.
+    """
+    ordering = list(ordering)
+    if page_size is None:
+        page_size = get_page_size(request)
+
+    values, direction = None, 'n'
+    token = request.GET.get('cursor')
+    if token:
+        try:
+            values, direction = decode_cursor(token)
+        except InvalidCursor:
+            values, direction = None, 'n'
+
+    forward = direction != 'p'
+    page_qs = queryset
+    if values is not None:
+        page_qs = page_qs.filter(_keyset_condition(ordering, values, forward))
+    page_qs = page_qs.order_by(*(ordering if forward else _reverse(ordering)))
+
+    rows = list(page_qs[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if forward:
+        has_next, has_previous = has_more, values is not None
+    else:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+
+    return KeysetPage(rows, queryset, ordering, has_next, has_previous)
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from . import pagecache
+from .models import Certificate, Education, Experience, Language, Project, Skill, UserProfile
+from .tags import with_tags
+
+# Username -> user id, checked against the document it leads to
+USERNAME_TIMEOUT = 60 * 60 * 24
+
+
+def _load(user_id):
+    user = get_object_or_404(User, id=user_id)
+    return {
+        'profile_user': user,
+        # Users without a profile row yet see an empty one; rows are created
+        # on signup and by edit_profile, never when a profile is viewed
+        'profile': UserProfile.objects.filter(user=user).first() or UserProfile(user=user),
+        'experiences': list(Experience.objects.filter(user=user).order_by('-start_date')),
+        'educations': list(Education.objects.filter(user=user).order_by('-start_date')),
+        'skills': list(Skill.objects.filter(user=user).order_by('-percentage')),
+        'projects': list(with_tags(Project.objects.filter(user=user)).order_by('-start_date')),
+        'languages': list(Language.objects.filter(user=user)),
+        'certificates': list(Certificate.objects.filter(user=user).order_by('-issue_date')),
+    }
+
+
+def get_document(user_id):
+    """
+    Everything the profile page shows about a user, as one cached document:
+    the user, their UserProfile and the experience, education, skill,
+    project, language and certificate lists. Saving or deleting any of them
+    gives the user's document a new version.
+    """
+    version = pagecache.version('profile', user_id)
+    return pagecache.get_object('profile', user_id, version, lambda: _load(user_id))
+
+
+def get_document_by_username(username):
+    """
+    ``get_document`` for a username. The user id is cached too; a renamed or
+    deleted user no longer matches, so a stale id falls back to the database.
+    """
+    key = f'profiles:username:{username}'
+    user_id = cache.get(key)
+    if user_id is not None:
+        try:
+            document = get_document(user_id)
+        except Http404:
+            document = None
+        if document is not None and document['profile_user'].username == username:
+            return document
+    user_id = get_object_or_404(User.objects.values_list('id', flat=True), username=username)
+    cache.set(key, user_id, USERNAME_TIMEOUT)
+    return get_document(user_id)
+
+
+def invalidate(*user_ids):
+    pagecache.invalidate('profile', *user_ids)
@@ -0,0 +1,245 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import pagecache
+from .models import Course, Enrollment, Lesson, LessonCompletion
+
+
+def _completed_count():
+    """Subquery: completed lessons of the outer Enrollment."""
+    return Coalesce(Subquery(
+        LessonCompletion.objects.filter(enrollment=OuterRef('pk'), completed=True)
+        .order_by().values('enrollment').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def _next_lesson():
+    """Subquery: first lesson, in course order, the outer Enrollment has not completed."""
+    completed = LessonCompletion.objects.filter(enrollment=OuterRef(OuterRef('pk')), completed=True)
+    return Subquery(
+        Lesson.objects.filter(course=OuterRef('course'))
+        .exclude(id__in=completed.values('lesson'))
+        .order_by('order', 'id').values('id')[:1]
+    )
+
+
+def _lesson_count():
+    """Subquery: lessons of the outer Course."""
+    return Coalesce(Subquery(
+        Lesson.objects.filter(course=OuterRef('pk'))
+        .order_by().values('course').annotate(count=Count('id')).values('count'),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def has_bit(bits, slot):
+    index = slot >> 3
+    return index < len(bits) and bool(bits[index] >> (slot & 7) & 1)
+
+
+def set_bit(bits, slot):
+    index = slot >> 3
+    bits = bytearray(bits)
+    if index >= len(bits):
+        bits.extend(bytes(index + 1 - len(bits)))
+    bits[index] |= 1 << (slot & 7)
+    return bytes(bits)
+
+
+def _course_lessons(course_id):
+    """``[(lesson_id, slot), ...]`` in course order."""
+    return list(Lesson.objects.filter(course_id=course_id).order_by('order', 'id').values_list('id', 'slot'))
+
+
+def _bitmap_progress(bits, lessons):
+    """``(completed_count, next_lesson_id)`` of a compact enrollment."""
+    completed = 0
+    next_lesson_id = None
+    for lesson_id, slot in lessons:
+        if has_bit(bits, slot):
+            completed += 1
+        elif next_lesson_id is None:
+            next_lesson_id = lesson_id
+    return completed, next_lesson_id
+
+
+def completed_lesson_ids(enrollment, lessons):
+    """
+    Ids of the completed lessons among ``lessons``: read from the bitmap for
+    compact enrollments, with one query for the rest.
+    """
+    if enrollment.compact:
+        bits = bytes(enrollment.completion_bits)
+        return {lesson.id for lesson in lessons if has_bit(bits, lesson.slot)}
+    return set(
+        LessonCompletion.objects.filter(enrollment=enrollment, completed=True).values_list('lesson_id', flat=True)
+    )
+
+
+def enroll(user, course, lessons):
+    """
+    Enroll ``user`` in ``course``, whose ``lessons`` are in course order.
+    Returns ``(enrollment, created)``. A compact enrollment is a single
+    INSERT; otherwise one LessonCompletion row is created per lesson.
+    """
+    first_lesson = lessons[0] if lessons else None
+    if getattr(settings, 'COMPACT_LESSON_PROGRESS', False):
+        return Enrollment.objects.get_or_create(
+            user=user, course=course, defaults={'compact': True, 'next_lesson': first_lesson},
+        )
+
+    with transaction.atomic():
+        enrollment, created = Enrollment.objects.get_or_create(
+            user=user, course=course, defaults={'next_lesson': first_lesson},
+        )
+        if created:
+            LessonCompletion.objects.bulk_create([
+                LessonCompletion(enrollment=enrollment, lesson=lesson, completed=False) for lesson in lessons
+            ])
+    return enrollment, created
+
+
+def refresh_next_lessons(enrollments):
+    """Recompute ``next_lesson`` for a queryset of row-based enrollments in one UPDATE."""
+    return enrollments.filter(compact=False).update(next_lesson=_next_lesson())
+
+
+def _refresh_compact(course_id):
+    """Recompute the counters of every compact enrollment in a course; returns how many changed."""
+    lessons = _course_lessons(course_id)
+    now = timezone.now()
+    changed = []
+    for enrollment in Enrollment.objects.filter(course_id=course_id, compact=True).only(
+        'completion_bits', 'completed_lessons_count', 'next_lesson',
+    ):
+        completed, next_lesson_id = _bitmap_progress(bytes(enrollment.completion_bits), lessons)
+        if (completed, next_lesson_id) != (enrollment.completed_lessons_count, enrollment.next_lesson_id):
+            enrollment.completed_lessons_count = completed
+            enrollment.next_lesson_id = next_lesson_id
+            enrollment.progress_changed_at = now
+            changed.append(enrollment)
+    Enrollment.objects.bulk_update(
+        changed, ['completed_lessons_count', 'next_lesson', 'progress_changed_at'], batch_size=500,
+    )
+    return len(changed)
+
+
+def refresh_course(course_id):
+    """Recompute next lessons, and bitmap counts, of every enrollment in a course."""
+    with transaction.atomic():
+        refresh_next_lessons(Enrollment.objects.filter(course_id=course_id))
+        _refresh_compact(course_id)
+
+
+def _complete_compact(enrollment, lesson):
+    lessons = _course_lessons(enrollment.course_id)
+    while True:
+        bits = bytes(Enrollment.objects.values_list('completion_bits', flat=True).get(pk=enrollment.pk))
+        if has_bit(bits, lesson.slot):
+            return False
+        new_bits = set_bit(bits, lesson.slot)
+        completed, next_lesson_id = _bitmap_progress(new_bits, lessons)
+        # Compare-and-swap on the old bitmap; retry if another request got in first
+        if Enrollment.objects.filter(pk=enrollment.pk, completion_bits=bits).update(
+            completion_bits=new_bits, completed_lessons_count=completed, next_lesson_id=next_lesson_id,
+            progress_changed_at=timezone.now(),
+        ):
+            break
+    # The sparse side table keeps the date (and later the time spent)
+    LessonCompletion.objects.update_or_create(
+        enrollment=enrollment, lesson=lesson,
+        defaults={'completed': True, 'completed_date': timezone.now()},
+    )
+    return True
+
+
+def _complete_rows(enrollment, lesson):
+    completion, _ = LessonCompletion.objects.get_or_create(enrollment=enrollment, lesson=lesson)
+    with transaction.atomic():
+        flipped = LessonCompletion.objects.filter(pk=completion.pk, completed=False).update(
+            completed=True, completed_date=timezone.now(),
+        )
+        if not flipped:
+            return False
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            completed_lessons_count=F('completed_lessons_count') + 1, progress_changed_at=timezone.now(),
+        )
+        if enrollment.next_lesson_id in (None, lesson.id):
+            refresh_next_lessons(Enrollment.objects.filter(pk=enrollment.pk))
+    return True
+
+
+def complete_lesson(enrollment, lesson):
+    """
+    Mark ``lesson`` completed for ``enrollment``. Returns False if it already
+    was. Both representations flip the completed state with a conditional
+    UPDATE, so concurrent requests cannot count the same lesson twice.
+    """
+    complete = _complete_compact if enrollment.compact else _complete_rows
+    if not complete(enrollment, lesson):
+        return False
+    # Queryset updates bypass post_save, which would otherwise do this
+    pagecache.invalidate('progress', enrollment.user_id)
+    return True
+
+
+def lesson_added(lesson):
+    with transaction.atomic():
+        Course.objects.filter(pk=lesson.course_id).update(
+            total_lessons=F('total_lessons') + 1, enrollments_changed_at=timezone.now(),
+        )
+        refresh_course(lesson.course_id)
+
+
+def lesson_deleting(lesson):
+    # Runs before the cascade removes the lesson's completions; compact
+    # enrollments are recounted from their bitmaps afterwards instead
+    Enrollment.objects.filter(
+        compact=False, lessoncompletion__lesson=lesson, lessoncompletion__completed=True,
+    ).update(completed_lessons_count=F('completed_lessons_count') - 1, progress_changed_at=timezone.now())
+
+
+def lesson_deleted(lesson):
+    with transaction.atomic():
+        Course.objects.filter(pk=lesson.course_id).update(
+            total_lessons=F('total_lessons') - 1, enrollments_changed_at=timezone.now(),
+        )
+        refresh_course(lesson.course_id)
+
+
+def reconcile():
+    """
+    Recompute every stored counter from the completion rows and bitmaps and
+    fix the ones that drifted. Returns ``(courses_fixed, enrollments_fixed)``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        course_ids = list(
+            Course.objects.annotate(actual=_lesson_count())
+            .exclude(total_lessons=F('actual')).values_list('pk', flat=True)
+        )
+        Course.objects.filter(pk__in=course_ids).update(total_lessons=_lesson_count(), enrollments_changed_at=now)
+
+        enrollment_ids = list(
+            Enrollment.objects.filter(compact=False)
+            .annotate(actual_count=_completed_count(), actual_next=_next_lesson())
+            .filter(
+                ~Q(completed_lessons_count=F('actual_count')) |
+                Q(next_lesson__isnull=True, actual_next__isnull=False) |
+                Q(next_lesson__isnull=False, actual_next__isnull=True) |
+                (Q(next_lesson__isnull=False, actual_next__isnull=False) & ~Q(next_lesson=F('actual_next')))
+            ).values_list('pk', flat=True)
+        )
+        Enrollment.objects.filter(pk__in=enrollment_ids).update(
+            completed_lessons_count=_completed_count(), next_lesson=_next_lesson(), progress_changed_at=now,
+        )
+
+        compact_fixed = sum(
+            _refresh_compact(course_id)
+            for course_id in Enrollment.objects.filter(compact=True).values_list('course_id', flat=True).distinct()
+        )
+    return len(course_ids), len(enrollment_ids) + compact_fixed
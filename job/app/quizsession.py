@@ -0,0 +1,177 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import answerkey, counters, pagecache
+from .models import QuizAttempt, UserAnswer
+
+# Sessions outlive the quiz timer by this much, then rebuild from UserAnswer
+SESSION_GRACE = 60 * 60
+
+
+def _key(attempt_id):
+    return f'quizsession:{attempt_id}'
+
+
+def _answer(attempt_id, question_id, choice_id, text, is_correct):
+    return UserAnswer(
+        attempt_id=attempt_id, question_id=question_id, selected_choice_id=choice_id,
+        answer_text='' if choice_id is not None else text.strip(), is_correct=bool(is_correct),
+    )
+
+
+class QuizSession:
+    """
+    Progress of one attempt through its quiz's answer key: how many questions
+    are answered (the cursor, since questions are taken in order), how many of
+    those were right and the points they earned. Kept in this process's
+    cache so answering costs one INSERT, and recounted from UserAnswer when
+    it falls behind.
+    """
+
+    def __init__(self, attempt, key, cursor=0, correct=0, earned=0):
+        self.attempt = attempt
+        self.key = key
+        self.cursor = cursor
+        self.correct = correct
+        self.earned = earned
+
+    @property
+    def total(self):
+        return len(self.key)
+
+    def current_question(self):
+        """The next unanswered question, as answer key data, or None when done."""
+        if self.cursor < self.total:
+            return self.key.questions[self.cursor]
+        return None
+
+    def remaining_questions(self):
+        return self.key.questions[self.cursor:]
+
+    def _count(self, question, is_correct):
+        self.cursor += 1
+        if is_correct:
+            self.correct += 1
+            self.earned += question['points']
+
+    def answer(self, question_id, choice_id=None, text=''):
+        """
+        Record the answer to the current question and move on. Answers to any
+        other question (a resubmitted form) or that don't fit the question are
+        ignored. Returns True if the answer was recorded.
+        """
+        current = self.current_question()
+        if current is None or current['id'] != question_id:
+            # The cached cursor may lag answers taken through another process
+            self.rebuild()
+            current = self.current_question()
+            if current is None or current['id'] != question_id:
+                return False
+        is_correct = self.key.grade(question_id, choice_id, text)
+        if is_correct is None:
+            return False
+
+        try:
+            with transaction.atomic():
+                _answer(self.attempt.id, question_id, choice_id, text, is_correct).save()
+        except IntegrityError:
+            # Answered already, through another process or a concurrent
+            # submit: catch up so the next question is shown
+            self.rebuild()
+            return False
+        self._count(current, is_correct)
+        self.save()
+        return True
+
+    def submit_all(self, answers):
+        """
+        Grade every remaining question at once and complete the attempt.
+        ``answers`` maps question ids to ``(choice_id, text)``; questions
+        without a valid answer are recorded as wrong. Returns False if the
+        attempt was already completed.
+        """
+        # Counted from the stored answers, not the cached cursor, which may
+        # lag answers taken through another process
+        self.rebuild()
+        while True:
+            rows = []
+            for question in self.remaining_questions():
+                choice_id, text = answers.get(question['id'], (None, ''))
+                is_correct = self.key.grade(question['id'], choice_id, text)
+                if is_correct is None:
+                    choice_id, text = None, ''
+                rows.append(_answer(self.attempt.id, question['id'], choice_id, text, is_correct))
+                self._count(question, is_correct)
+            try:
+                return self.complete(rows)
+            except IntegrityError:
+                # A question was answered meanwhile; keep that answer
+                self.rebuild()
+
+    def complete(self, answers=()):
+        """
+        Score the attempt from the session and mark it completed, storing any
+        unsaved ``answers`` in the same transaction. The completion is a
+        conditional UPDATE, so only one request completes (and counts) an
+        attempt. Returns False if it was already completed.
+        """
+        attempt = self.attempt
+        attempt.score = self.key.score(self.earned)
+        attempt.passed = attempt.score >= attempt.quiz.passing_score
+        attempt.completed_at = timezone.now()
+        with transaction.atomic():
+            completed = QuizAttempt.objects.filter(id=attempt.id, completed_at__isnull=True).update(
+                score=attempt.score, passed=attempt.passed, completed_at=attempt.completed_at,
+            )
+            if completed:
+                UserAnswer.objects.bulk_create(answers)
+        self.discard()
+        if not completed:
+            return False
+        counters.attempt_completed(attempt)
+        # Queryset updates bypass post_save, which would otherwise do this
+        pagecache.invalidate('attempts', attempt.user_id)
+        return True
+
+    def rebuild(self):
+        """Recount the session from the attempt's stored answers and cache it."""
+        answers = dict(UserAnswer.objects.filter(attempt_id=self.attempt.id).values_list('question_id', 'is_correct'))
+        self.cursor = self.correct = self.earned = 0
+        for question in self.key.questions:
+            if question['id'] not in answers:
+                break
+            self._count(question, answers[question['id']])
+        self.save()
+
+    def save(self):
+        timeout = self.attempt.quiz.duration_minutes * 60 + SESSION_GRACE
+        state = (self.key.version, self.cursor, self.correct, self.earned)
+        cache.set(_key(self.attempt.id), state, timeout)
+
+    def discard(self):
+        cache.delete(_key(self.attempt.id))
+
+
+def start(attempt):
+    """Session for a new attempt; warms the quiz's answer key."""
+    session = QuizSession(attempt, answerkey.get_key(attempt.quiz_id))
+    session.save()
+    return session
+
+
+def load(attempt):
+    """
+    Session of an attempt, from this process's cache. After an eviction, or
+    when the quiz was edited mid-attempt, it is rebuilt from the attempt's
+    answers; a cursor left behind by answers taken through another process
+    is caught up the same way when an answer doesn't fit it.
+    """
+    key = answerkey.get_key(attempt.quiz_id)
+    state = cache.get(_key(attempt.id))
+    if state is not None and state[0] == key.version:
+        return QuizSession(attempt, key, *state[1:])
+
+    session = QuizSession(attempt, key)
+    session.rebuild()
+    return session
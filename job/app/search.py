@@ -0,0 +1,61 @@
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import fts
+from .fts import build_match_expression  # noqa: F401
+from .models import Job
+
+# SQLite FTS5 table mirroring the searchable text of every Job (rowid = job id)
+FTS_TABLE = 'app_job_fts'
+
+index = fts.FullTextIndex(
+    Job, FTS_TABLE,
+    # FTS column -> Job lookup, in table order, with their bm25() weights
+    {
+        'title': 'title',
+        'company_name': 'company__name',
+        'skills_required': 'skills_required',
+        'description': 'description',
+        'requirements': 'requirements',
+    },
+    weights=[10.0, 5.0, 4.0, 1.0, 1.0],
+    snippet_tokens=24,
+)
+
+create_index = index.create
+fts_available = index.available
+index_jobs = index.index
+unindex_jobs = index.unindex
+rebuild_index = index.rebuild
+match_jobs = index.match
+
+
+def reindex_company(company):
+    """Refresh the denormalized company name on every job of the company."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET company_name = %s "
+            f"WHERE rowid IN (SELECT id FROM app_job WHERE company_id = %s)",
+            [company.name, company.id],
+        )
+
+
+def search_jobs(queryset, query):
+    """
+    Restrict a Job queryset to the jobs matching ``query`` and order them by
+    relevance. Each job gets ``search_rank`` (lower is better) and
+    ``search_snippet`` (raw FTS snippet, see ``highlight``) annotations,
+    constant when the query has no words to match (e.g. only punctuation).
+    """
+    return index.search(queryset, query).order_by('search_rank', '-posted_date', '-id')
+
+
+def highlight(snippet):
+    """Escape a raw FTS snippet and wrap the matched terms in <mark> tags."""
+    if not snippet:
+        return ''
+    html = escape(snippet).replace(fts.MARK_START, '<mark>').replace(fts.MARK_END, '</mark>')
+    return mark_safe(html)
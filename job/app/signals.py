@@ -0,0 +1,222 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import answerkey, autocomplete, coenrollment, counters, course_facets, course_search, facets, images, matching, pagecache, profiles, progress, search, tags
+from .models import (
+    Certificate, Choice, Company, Course, CourseCategory, Education, Enrollment, Experience, Job, Language,
+    Lesson, LessonCompletion, Project, Question, Quiz, QuizAttempt, QuizCategory, Skill, UserProfile,
+)
+
+
+@receiver(post_save, sender=Job)
+def index_job(sender, instance, **kwargs):
+    tags.sync_tags(instance)
+    search.index_jobs([instance.id])
+    facets.invalidate()
+    matching.invalidate()
+    autocomplete.job_saved(instance)
+    pagecache.invalidate('job', instance.id)
+    pagecache.invalidate('catalog', 'job')
+
+
+@receiver(post_delete, sender=Job)
+def unindex_job(sender, instance, **kwargs):
+    search.unindex_jobs([instance.id])
+    facets.invalidate()
+    matching.invalidate()
+    autocomplete.job_deleted(instance)
+    pagecache.invalidate('job', instance.id)
+    pagecache.invalidate('catalog', 'job')
+
+
+@receiver(post_save, sender=Company)
+def reindex_company_jobs(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_company(instance)
+        autocomplete.company_saved(instance)
+        pagecache.invalidate('job', *instance.job_set.values_list('id', flat=True))
+        pagecache.invalidate('catalog', 'job')
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Project)
+def sync_skill_tags(sender, instance, **kwargs):
+    tags.sync_tags(instance)
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    course_search.index_courses([instance.id])
+    course_facets.invalidate()
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    course_search.unindex_courses([instance.id])
+    course_facets.invalidate()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_page(sender, instance, **kwargs):
+    pagecache.invalidate('course', instance.id)
+    pagecache.invalidate('catalog', 'course')
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_course_page(sender, instance, **kwargs):
+    # The curriculum is part of the course, so it counts as a course change
+    Course.objects.filter(id=instance.course_id).update(updated_at=timezone.now())
+    pagecache.invalidate('course', instance.course_id)
+    pagecache.invalidate('catalog', 'course')
+
+
+@receiver(post_save, sender=Lesson)
+def count_saved_lesson(sender, instance, created, **kwargs):
+    if created:
+        progress.lesson_added(instance)
+    else:
+        # A new order can change which lesson comes next
+        progress.refresh_course(instance.course_id)
+
+
+@receiver(pre_delete, sender=Lesson)
+def uncount_lesson_completions(sender, instance, **kwargs):
+    progress.lesson_deleting(instance)
+
+
+@receiver(post_delete, sender=Lesson)
+def uncount_deleted_lesson(sender, instance, **kwargs):
+    progress.lesson_deleted(instance)
+
+
+@receiver(post_save, sender=CourseCategory)
+def invalidate_category_course_pages(sender, instance, created, **kwargs):
+    # Deleting a category cascades to its courses, whose own signals fire
+    if not created:
+        pagecache.invalidate('course', *instance.course_set.values_list('id', flat=True))
+    pagecache.invalidate('catalog', 'course')
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_page(sender, instance, **kwargs):
+    pagecache.invalidate('quiz', instance.id)
+    answerkey.forget(instance.id)
+    pagecache.invalidate('catalog', 'quiz')
+
+
+def _touch_quiz(quiz_id):
+    # Questions and choices are part of the quiz, so they count as a quiz change
+    Quiz.objects.filter(id=quiz_id).update(updated_at=timezone.now())
+    pagecache.invalidate('quiz', quiz_id)
+    pagecache.invalidate('catalog', 'quiz')
+    answerkey.forget(quiz_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_quiz_page(sender, instance, **kwargs):
+    _touch_quiz(instance.quiz_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_quiz_page(sender, instance, **kwargs):
+    # By id: during a cascade the question row may already be gone
+    for quiz_id in Question.objects.filter(id=instance.question_id).values_list('quiz_id', flat=True):
+        _touch_quiz(quiz_id)
+
+
+@receiver(post_save, sender=QuizCategory)
+def invalidate_category_quiz_pages(sender, instance, created, **kwargs):
+    if not created:
+        pagecache.invalidate('quiz', *instance.quiz_set.values_list('id', flat=True))
+    pagecache.invalidate('catalog', 'quiz')
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_progress(sender, instance, **kwargs):
+    pagecache.invalidate('progress', instance.user_id)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, **kwargs):
+    if created:
+        counters.enrollment_added(instance)
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    counters.enrollment_removed(instance)
+
+
+@receiver(post_delete, sender=Enrollment)
+def record_enrollment_removal(sender, instance, **kwargs):
+    coenrollment.enrollment_removed(instance)
+
+
+@receiver(post_save, sender=LessonCompletion)
+@receiver(post_delete, sender=LessonCompletion)
+def invalidate_completion_progress(sender, instance, **kwargs):
+    user_ids = Enrollment.objects.filter(id=instance.enrollment_id).values_list('user_id', flat=True)
+    pagecache.invalidate('progress', *user_ids)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+def invalidate_quiz_attempts(sender, instance, **kwargs):
+    pagecache.invalidate('attempts', instance.user_id)
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def uncount_quiz_attempt(sender, instance, **kwargs):
+    counters.attempt_removed(instance)
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, **kwargs):
+    if created:
+        UserProfile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_profile_document(sender, instance, **kwargs):
+    # Logins save last_login only, which the profile page doesn't show
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    profiles.invalidate(instance.id)
+
+
+# Registered after sync_skill_tags, so a saved project's tags are synced
+# before its user's document can be rebuilt
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=Experience)
+@receiver(post_delete, sender=Experience)
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def invalidate_profile_document(sender, instance, **kwargs):
+    profiles.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=UserProfile)
+def render_image_derivatives(sender, instance, **kwargs):
+    images.pregenerate(instance)
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils._os import safe_makedirs
+
+
+class DedupStorage(FileSystemStorage):
+    """
+    File system storage that keeps each distinct content once, as a blob
+    named by its SHA-256 under ``blobs/``. Saved names stay ordinary paths:
+    each is a hard link to its blob, so existing URLs, ``.path`` and the
+    front server keep working. A blob's link count is its reference count;
+    deleting a file drops one link. ``collect_garbage`` removes the blobs
+    nothing links to any more.
+    """
+
+    BLOB_DIR = 'blobs'
+    # Directories of files written around the storage (regenerable caches),
+    # which adopt_files leaves alone
+    SKIP_DIRS = (BLOB_DIR, 'derived', 'cv')
+
+    def blob_path(self, digest):
+        return os.path.join(self.location, self.BLOB_DIR, digest[:2], digest)
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            safe_makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def _write_blob(self, content):
+        """Stream ``content`` into the blob store, hashing as it is written; returns the blob's path."""
+        temp_dir = os.path.join(self.location, self.BLOB_DIR, 'tmp')
+        self._makedirs(temp_dir)
+        digest = hashlib.sha256()
+        fd, temp = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    f.write(chunk)
+            blob = self.blob_path(digest.hexdigest())
+            if os.path.exists(blob):
+                os.remove(temp)
+            else:
+                self._makedirs(os.path.dirname(blob))
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp, self.file_permissions_mode)
+                # Same content under the same name, so a concurrent writer winning is fine
+                os.replace(temp, blob)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        return blob
+
+    def _save(self, name, content):
+        blob = self._write_blob(content)
+        full_path = self.path(name)
+        self._makedirs(os.path.dirname(full_path))
+        # Like FileSystemStorage, pick a new name if another save took this one
+        while True:
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                if self._allow_overwrite:
+                    os.remove(full_path)
+                    continue
+                name = self.get_available_name(name)
+                full_path = self.path(name)
+            except FileNotFoundError:
+                # collect_garbage took an unlinked blob _write_blob had just
+                # found; write it again (chunks() rewinds the content)
+                blob = self._write_blob(content)
+            else:
+                break
+        validate_file_name(name, allow_relative_path=True)
+        return str(name).replace('\\', '/')
+
+    def _files(self):
+        """Absolute paths of the stored files, outside SKIP_DIRS."""
+        for directory, subdirectories, files in os.walk(self.location):
+            if directory == str(self.location):
+                subdirectories[:] = [d for d in subdirectories if d not in self.SKIP_DIRS]
+            for file in files:
+                yield os.path.join(directory, file)
+
+    def adopt_files(self):
+        """
+        Move files saved before this storage (or copied in by hand) into the
+        blob store, so duplicates share one blob. Each file is swapped for a
+        link with an atomic rename. Returns the number adopted.
+        """
+        adopted = 0
+        for path in self._files():
+            if os.lstat(path).st_nlink > 1 or os.path.islink(path):
+                continue
+            link = f'{path}.{os.getpid()}.tmp'
+            with open(path, 'rb') as f:
+                content = File(f)
+                while True:
+                    blob = self._write_blob(content)
+                    try:
+                        os.link(blob, link)
+                    except FileNotFoundError:
+                        continue  # Collected in between, as in _save
+                    break
+            os.replace(link, path)
+            adopted += 1
+        return adopted
+
+    def collect_garbage(self, grace=60 * 60):
+        """
+        Delete blobs no file links to. Blobs whose links changed in the last
+        ``grace`` seconds are kept, so a save between writing its blob and
+        linking to it is never caught out. Returns ``(blobs, bytes)`` freed.
+        """
+        blob_root = os.path.join(self.location, self.BLOB_DIR)
+        cutoff = time.time() - grace
+        removed = freed = 0
+        for directory, _, files in os.walk(blob_root):
+            for file in files:
+                path = os.path.join(directory, file)
+                stat = os.stat(path)
+                # st_ctime moves on every link and unlink, and on creation
+                if stat.st_nlink == 1 and stat.st_ctime < cutoff:
+                    os.remove(path)
+                    removed += 1
+                    freed += stat.st_size
+        return removed, freed
+
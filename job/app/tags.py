@@ -0,0 +1,85 @@
+from django.db import transaction
+
+from .models import Course, CourseTag, Job, JobTag, Project, ProjectTag, Tag
+
+# Tagged model -> (CSV source field, through model, FK name on the through model)
+TAGGED_MODELS = {
+    Job: ('skills_required', JobTag, 'job'),
+    Course: ('skills_covered', CourseTag, 'course'),
+    Project: ('technologies', ProjectTag, 'project'),
+}
+
+
+def parse_tags(value):
+    """Split a comma-separated field into display names, dropping blanks and duplicates."""
+    names = []
+    seen = set()
+    for name in (value or '').split(','):
+        # Truncated first, so names that only differ past the limit are one tag
+        name = ' '.join(name.split())[:100].rstrip()
+        key = Tag.normalize(name)
+        if name and key not in seen:
+            seen.add(key)
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """Return ``{normalized_name: Tag}`` for ``names``, creating missing tags in bulk."""
+    wanted = {Tag.normalize(name): name for name in names}
+    tags = {tag.normalized_name: tag for tag in Tag.objects.filter(normalized_name__in=wanted)}
+    missing = [
+        Tag(name=name, normalized_name=key)
+        for key, name in wanted.items() if key not in tags
+    ]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        tags.update(
+            (tag.normalized_name, tag)
+            for tag in Tag.objects.filter(normalized_name__in=[tag.normalized_name for tag in missing])
+        )
+    return tags
+
+
+def sync_tags(instance):
+    """Rebuild the tag links of a Job, Course or Project from its CSV field."""
+    field, through, fk_name = TAGGED_MODELS[type(instance)]
+    names = parse_tags(getattr(instance, field))
+    tags = get_or_create_tags(names)
+    wanted = [tags[Tag.normalize(name)].id for name in names]
+
+    current = list(
+        through.objects.filter(**{fk_name: instance}).order_by('position').values_list('tag_id', flat=True)
+    )
+    if current == wanted:
+        return
+
+    with transaction.atomic():
+        through.objects.filter(**{fk_name: instance}).delete()
+        through.objects.bulk_create([
+            through(**{fk_name: instance, 'tag_id': tag_id, 'position': position})
+            for position, tag_id in enumerate(wanted)
+        ])
+
+
+def sync_tags_bulk(model, objects):
+    """
+    Rebuild tag links for many objects of one model with a constant number
+    of queries; used by bulk imports that bypass ``post_save``.
+    """
+    field, through, fk_name = TAGGED_MODELS[model]
+    parsed = [(obj, parse_tags(getattr(obj, field))) for obj in objects]
+    tags = get_or_create_tags(name for _, names in parsed for name in names)
+
+    with transaction.atomic():
+        through.objects.filter(**{f'{fk_name}__in': [obj.pk for obj, _ in parsed]}).delete()
+        through.objects.bulk_create([
+            through(**{fk_name: obj, 'tag_id': tags[Tag.normalize(name)].id, 'position': position})
+            for obj, names in parsed
+            for position, name in enumerate(names)
+        ])
+
+
+def with_tags(queryset):
+    """Prefetch tag links so ``get_skills_list``/``get_technologies_list`` skip parsing."""
+    return queryset.prefetch_related('tag_links__tag')
@@ -0,0 +1,16 @@
+from django import template
+
+from .. import images
+
+register = template.Library()
+
+
+@register.filter
+def image_url(file, size):
+    """
+    URL of a resized copy of an uploaded image, e.g.
+    ``{{ course.thumbnail|image_url:'card' }}``; add ``.jpg`` to the size
+    (``'card.jpg'``) for JPEG instead of the default WebP.
+    """
+    size, _, fmt = size.partition('.')
+    return images.derivative_url(file, size, fmt or images.DEFAULT_FORMAT)
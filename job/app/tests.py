@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from concurrent.futures import Future
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    answerkey, autocomplete, coenrollment, counters, cv, facets, heartbeats, images, itemanalysis, matching,
+    pagecache, profiles, progress, quizsession, tags,
+)
+from .models import (
+    Choice, Company, CounterShard, Course, CourseCategory, CourseNeighbor, Enrollment, Job, Lesson, LessonCompletion,
+    Experience, Question, Quiz, QuizAttempt, QuizCategory, Skill, UserAnswer, UserProfile,
+)
+from .storage import DedupStorage
+
+
+def make_job(company, **fields):
+    defaults = {
+        'title': 'Python Developer', 'location': 'Dhaka', 'salary_min': 50, 'salary_max': 80,
+        'description': 'Build web services', 'requirements': 'Django experience',
+        'skills_required': 'Python, Django',
+    }
+    defaults.update(fields)
+    return Job.objects.create(company=company, **defaults)
+
+
+def make_course(category, **fields):
+    defaults = {
+        'title': 'Django for Beginners', 'instructor': 'Rahim', 'description': 'Build sites with Django',
+        'short_description': 'Django basics', 'difficulty': 'beginner', 'price': 500,
+        'duration_weeks': 4, 'lessons_count': 12, 'skills_covered': 'Python, Django',
+    }
+    defaults.update(fields)
+    return Course.objects.create(category=category, **defaults)
+
+
+class JobSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='Acme')
+        self.python = make_job(self.company)
+        self.rust = make_job(self.company, title='Rust Engineer', skills_required='Rust', description='Systems')
+
+    def test_search_ranks_matches(self):
+        response = self.client.get('/jobs/', {'q': 'python'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Python Developer')
+        self.assertNotContains(response, 'Rust Engineer')
+
+    def test_punctuation_only_query_lists_every_job(self):
+        for query in ['-', '"', '""', '*()']:
+            with self.subTest(query=query):
+                response = self.client.get('/jobs/', {'q': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Python Developer')
+                self.assertContains(response, 'Rust Engineer')
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name='Acme')
+        # Created in the same instant as often as not, so ties on posted_date are broken by id
+        self.jobs = [make_job(company, title=f'Python Developer {i}') for i in range(5)]
+
+    def page(self, **params):
+        response = self.client.get('/jobs/', {'page_size': 2, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.context['jobs']
+
+    def walk(self, **params):
+        pages = [self.page(**params)]
+        while pages[-1].has_next:
+            pages.append(self.page(cursor=pages[-1].next_token, **params))
+        return pages
+
+    def test_cursors_walk_every_job_once(self):
+        pages = self.walk()
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        seen = [job.pk for page in pages for job in page]
+        self.assertEqual(seen, sorted((job.pk for job in self.jobs), reverse=True))
+        self.assertFalse(pages[0].has_previous)
+
+        back = self.page(cursor=pages[2].previous_token)
+        self.assertEqual([job.pk for job in back], [job.pk for job in pages[1]])
+        self.assertTrue(back.has_next and back.has_previous)
+
+    def test_search_results_paginate_by_rank(self):
+        self.jobs[3].description = 'Python Python Python'
+        self.jobs[3].save()
+        pages = self.walk(q='python')
+        seen = [job.pk for page in pages for job in page]
+        self.assertEqual(sorted(seen), sorted(job.pk for job in self.jobs))
+        self.assertEqual(seen[0], self.jobs[3].pk)
+
+    def test_invalid_cursor_falls_back_to_the_first_page(self):
+        first = [job.pk for job in self.page()]
+        for cursor in ['garbage', self.page().next_token[:-2] + 'xx']:
+            with self.subTest(cursor=cursor):
+                self.assertEqual([job.pk for job in self.page(cursor=cursor)], first)
+
+
+class TagTests(TestCase):
+    def test_parse_tags(self):
+        self.assertEqual(tags.parse_tags(' Python,  django ,PYTHON,, Django'), ['Python', 'django'])
+
+    def test_names_equal_once_truncated_are_one_tag(self):
+        long = 'x' * 100
+        self.assertEqual(tags.parse_tags(f'{long}a, {long}b, {"y" * 99} z'), [long, 'y' * 99])
+
+    def test_job_tags_follow_skills(self):
+        job = make_job(Company.objects.create(name='Acme'), skills_required='Python, Django, python')
+        self.assertEqual(sorted(job.tags.values_list('normalized_name', flat=True)), ['django', 'python'])
+
+
+class JobFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name='Acme')
+        make_job(company)
+        make_job(company, title='Remote Python', location='Sylhet', work_mode='remote', job_type='contract')
+
+    def test_each_facet_ignores_its_own_filter(self):
+        result = facets.job_facets(selected={'job_type': 'contract'})
+        job_types = {option['value']: option['count'] for option in result['job_type']}
+        self.assertEqual(job_types['full_time'], 1)
+        self.assertEqual(job_types['contract'], 1)
+        self.assertEqual({option['value']: option['count'] for option in result['location']}, {'Sylhet': 1})
+
+    def test_remote_location_means_work_mode(self):
+        self.assertEqual(facets.job_count(selected={'location': 'remote'}), 1)
+        self.assertEqual(facets.job_count(selected={'location': 'dhaka'}), 1)
+        self.assertEqual(facets.job_count(selected={'location': ''}), 2)
+
+    def test_counts_follow_job_writes(self):
+        self.assertEqual(facets.job_count('python'), 2)
+        Job.objects.filter(title='Remote Python').get().delete()
+        self.assertEqual(facets.job_count('python'), 1)
+
+    def test_evicted_versions_never_serve_old_counts(self):
+        self.assertEqual(facets.job_count('python'), 2)
+        facets.invalidate()
+        self.assertEqual(facets.job_count('python'), 2)
+        Job.objects.filter(title='Remote Python').delete()  # another process deleted it
+        facets.invalidate()
+        # The versions cache culls the version key: counts cached in this
+        # process under any earlier version must not come back
+        caches['versions'].clear()
+        self.assertEqual(facets.job_count('python'), 1)
+        facets.invalidate()
+        self.assertEqual(facets.job_count('python'), 1)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.job = make_job(Company.objects.create(name='Acme'))
+
+    def test_versions_live_in_the_shared_cache(self):
+        version = pagecache.version('job', self.job.pk)
+        cache.clear()  # another process has nothing cached locally
+        self.assertEqual(pagecache.version('job', self.job.pk), version)
+        self.assertEqual(caches['versions'].get(pagecache._version_key('job', self.job.pk)), version)
+
+    def test_a_write_elsewhere_reaches_cached_pages(self):
+        self.assertContains(self.client.get(f'/jobs/{self.job.pk}/'), 'Python Developer')
+        # Another process updates the job: the row and the shared version change, this cache doesn't
+        Job.objects.filter(pk=self.job.pk).update(title='Staff Python Developer')
+        caches['versions'].set(pagecache._version_key('job', self.job.pk), 1, None)
+        self.assertContains(self.client.get(f'/jobs/{self.job.pk}/'), 'Staff Python Developer')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.job = make_job(Company.objects.create(name='Acme'))
+
+    def test_job_list_etag(self):
+        etag = self.client.get('/jobs/')['ETag']
+        self.assertEqual(self.client.get('/jobs/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Every worker derives the same tag from the shared versions
+        cache.clear()
+        self.assertEqual(self.client.get('/jobs/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Query strings are part of the tag
+        self.assertEqual(self.client.get('/jobs/', {'q': 'python'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        make_job(self.job.company, title='Rust Engineer')
+        response = self.client.get('/jobs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_job_detail_last_modified(self):
+        response = self.client.get(f'/jobs/{self.job.pk}/')
+        last_modified = response['Last-Modified']
+        self.assertEqual(
+            self.client.get(f'/jobs/{self.job.pk}/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304,
+        )
+        self.assertEqual(
+            self.client.get(f'/jobs/{self.job.pk}/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304,
+        )
+
+    def test_logged_in_pages_have_their_own_tags(self):
+        etag = self.client.get('/jobs/')['ETag']
+        user = User.objects.create_user('seeker')
+        self.client.force_login(user)
+        response = self.client.get('/jobs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', self.client.get(f'/jobs/{self.job.pk}/'))
+
+
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        answerkey._local.clear()
+        self.addCleanup(answerkey._local.clear)
+        quiz = Quiz.objects.create(title='Python Basics', category=QuizCategory.objects.create(name='Programming'))
+        self.quiz_id = quiz.pk
+        self.question = Question.objects.create(quiz=quiz, question_text='2 + 2?')
+        self.three = Choice.objects.create(question=self.question, choice_text='3', is_correct=True)
+        self.four = Choice.objects.create(question=self.question, choice_text='4')
+
+    def test_key_follows_local_edits(self):
+        self.assertTrue(answerkey.get_key(self.quiz_id).grade(self.question.pk, self.three.pk))
+        self.three.is_correct = False
+        self.three.save()
+        self.four.is_correct = True
+        self.four.save()
+        key = answerkey.get_key(self.quiz_id)
+        self.assertFalse(key.grade(self.question.pk, self.three.pk))
+        self.assertTrue(key.grade(self.question.pk, self.four.pk))
+
+    def test_key_follows_edits_made_by_another_process(self):
+        stale = answerkey.get_key(self.quiz_id)
+        self.assertIs(answerkey.get_key(self.quiz_id), stale)
+        # Another worker fixes the answer: its signals bump the shared version
+        # but can't reach this process's copies
+        Choice.objects.filter(pk=self.three.pk).update(is_correct=False)
+        Choice.objects.filter(pk=self.four.pk).update(is_correct=True)
+        caches['versions'].set(pagecache._version_key('quiz', self.quiz_id), 1, None)
+        key = answerkey.get_key(self.quiz_id)
+        self.assertIsNot(key, stale)
+        self.assertTrue(key.grade(self.question.pk, self.four.pk))
+
+    def test_local_keys_evict_the_least_recently_used(self):
+        category = QuizCategory.objects.get()
+        others = [Quiz.objects.create(title=f'Quiz {i}', category=category).pk for i in range(2)]
+        with mock.patch.object(answerkey, 'LOCAL_KEYS', 2):
+            first = answerkey.get_key(self.quiz_id)
+            answerkey.get_key(others[0])
+            self.assertIs(answerkey.get_key(self.quiz_id), first)
+            answerkey.get_key(others[1])
+        self.assertEqual(list(answerkey._local), [self.quiz_id, others[1]])
+
+
+class QuizSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        answerkey._local.clear()
+        self.addCleanup(answerkey._local.clear)
+        self.user = User.objects.create_user('learner')
+        self.quiz = Quiz.objects.create(title='Python Basics', category=QuizCategory.objects.create(name='Programming'))
+        self.questions, self.right, self.wrong = [], {}, {}
+        for order in range(3):
+            question = Question.objects.create(quiz=self.quiz, question_text=f'Question {order}', order=order)
+            self.questions.append(question.pk)
+            self.right[question.pk] = Choice.objects.create(question=question, choice_text='Yes', is_correct=True).pk
+            self.wrong[question.pk] = Choice.objects.create(question=question, choice_text='No').pk
+        self.attempt = QuizAttempt.objects.create(user=self.user, quiz=self.quiz)
+
+    def stale_session(self, answered):
+        """A session whose cached cursor missed ``answered``, taken through another process."""
+        session = quizsession.start(self.attempt)
+        state = cache.get(quizsession._key(self.attempt.pk))
+        for question_id in answered:
+            self.assertTrue(session.answer(question_id, self.right[question_id]))
+        cache.set(quizsession._key(self.attempt.pk), state)
+        return quizsession.load(self.attempt)
+
+    def test_answers_move_through_the_quiz(self):
+        first, second, _ = self.questions
+        session = quizsession.start(self.attempt)
+        self.assertTrue(session.answer(first, self.right[first]))
+        self.assertFalse(session.answer(first, self.wrong[first]))  # a resubmitted form
+        self.assertEqual(session.current_question()['id'], second)
+        session = quizsession.load(self.attempt)
+        self.assertEqual((session.cursor, session.correct), (1, 1))
+
+    def test_an_evicted_session_is_rebuilt(self):
+        first, second, _ = self.questions
+        session = quizsession.start(self.attempt)
+        session.answer(first, self.right[first])
+        session.answer(second, self.wrong[second])
+        cache.clear()
+        session = quizsession.load(self.attempt)
+        self.assertEqual((session.cursor, session.correct, session.earned), (2, 1, 1))
+
+    def test_a_stale_cursor_catches_up_on_an_answered_question(self):
+        first, second, _ = self.questions
+        session = self.stale_session([first])
+        self.assertEqual(session.current_question()['id'], first)
+        self.assertFalse(session.answer(first, self.wrong[first]))
+        self.assertEqual(session.current_question()['id'], second)
+        self.assertTrue(session.answer(second, self.right[second]))
+        self.assertEqual(session.cursor, 2)
+
+    def test_a_stale_cursor_accepts_the_question_shown_elsewhere(self):
+        first, second, _ = self.questions
+        session = self.stale_session([first])
+        self.assertTrue(session.answer(second, self.right[second]))
+        self.assertEqual((session.cursor, session.correct), (2, 2))
+        self.assertEqual(UserAnswer.objects.filter(attempt=self.attempt).count(), 2)
+
+    def test_submit_all_keeps_answers_taken_elsewhere(self):
+        first, second, third = self.questions
+        session = self.stale_session([first])
+        self.assertTrue(session.submit_all({first: (self.wrong[first], ''), second: (self.right[second], '')}))
+        answers = dict(UserAnswer.objects.filter(attempt=self.attempt).values_list('question_id', 'is_correct'))
+        self.assertEqual(answers, {first: True, second: True, third: False})
+        self.attempt.refresh_from_db()
+        self.assertIsNotNone(self.attempt.completed_at)
+        self.assertAlmostEqual(float(self.attempt.score), 200 / 3, places=1)
+
+    def test_take_quiz_answers_each_question_then_completes(self):
+        self.client.force_login(self.user)
+        url = f'/quiz/attempt/{self.attempt.pk}/'
+        for question_id in self.questions:
+            self.assertContains(self.client.get(url), f'Question {self.questions.index(question_id)}')
+            self.client.post(url, {'question_id': question_id, f'choice_{question_id}': self.right[question_id]})
+        self.assertRedirects(
+            self.client.get(url), f'/quiz/attempt/{self.attempt.pk}/result/', fetch_redirect_response=False,
+        )
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, 100)
+        self.assertTrue(self.attempt.passed)
+
+
+class QuizGradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        answerkey._local.clear()
+        self.addCleanup(answerkey._local.clear)
+        self.quiz = Quiz.objects.create(title='Python Basics', category=QuizCategory.objects.create(name='Programming'))
+        self.choice_question = Question.objects.create(quiz=self.quiz, question_text='2 + 2?', order=0, points=1)
+        self.four = Choice.objects.create(question=self.choice_question, choice_text='4', is_correct=True)
+        self.five = Choice.objects.create(question=self.choice_question, choice_text='5')
+        self.true_false = Question.objects.create(
+            quiz=self.quiz, question_text='Python is typed dynamically.', question_type='true_false', order=1, points=1,
+        )
+        self.true = Choice.objects.create(question=self.true_false, choice_text='True', is_correct=True)
+        Choice.objects.create(question=self.true_false, choice_text='False')
+        self.short_answer = Question.objects.create(
+            quiz=self.quiz, question_text='Who created Python?', question_type='short_answer', order=2, points=2,
+        )
+        Choice.objects.create(question=self.short_answer, choice_text='Guido van Rossum', is_correct=True)
+        self.attempt = QuizAttempt.objects.create(user=User.objects.create_user('learner'), quiz=self.quiz)
+
+    def test_true_false_answered_by_text(self):
+        key = answerkey.get_key(self.quiz.pk)
+        self.assertTrue(key.grade(self.true_false.pk, text=' TRUE '))
+        self.assertFalse(key.grade(self.true_false.pk, text='false'))
+        self.assertIsNone(key.grade(self.true_false.pk, text='maybe'))
+        self.assertTrue(key.grade(self.true_false.pk, self.true.pk))
+
+    def test_short_answers_are_normalized(self):
+        key = answerkey.get_key(self.quiz.pk)
+        self.assertTrue(key.grade(self.short_answer.pk, text='  guido   VAN rossum '))
+        self.assertFalse(key.grade(self.short_answer.pk, text='Larry Wall'))
+        self.assertIsNone(key.grade(self.short_answer.pk, text='   '))
+        # The accepted answers are not offered as choices
+        self.assertEqual(key.question(self.short_answer.pk)['choices'], [])
+
+    def test_scores_are_weighted_by_points(self):
+        session = quizsession.start(self.attempt)
+        self.assertTrue(session.submit_all({
+            self.choice_question.pk: (self.five.pk, ''),
+            self.true_false.pk: (None, 'true'),
+            self.short_answer.pk: (None, 'Guido van Rossum'),
+        }))
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, 75)
+        self.assertTrue(self.attempt.passed)
+
+    def test_invalid_choices_are_recorded_as_wrong(self):
+        session = quizsession.start(self.attempt)
+        self.assertTrue(session.submit_all({
+            self.choice_question.pk: (self.true.pk, ''),  # a choice of another question
+            self.true_false.pk: (self.five.pk + 100, ''),  # no such choice
+        }))
+        answers = UserAnswer.objects.filter(attempt=self.attempt).order_by('question__order')
+        self.assertEqual(
+            list(answers.values_list('question_id', 'selected_choice_id', 'is_correct')),
+            [
+                (self.choice_question.pk, None, False), (self.true_false.pk, None, False),
+                (self.short_answer.pk, None, False),
+            ],
+        )
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, 0)
+
+    def test_a_second_submit_is_refused(self):
+        answers = {self.choice_question.pk: (self.four.pk, '')}
+        self.assertTrue(quizsession.start(self.attempt).submit_all(answers))
+        self.assertFalse(quizsession.load(self.attempt).submit_all(answers))
+        counters.rollup()
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.attempts_count, 1)
+        self.assertEqual(UserAnswer.objects.filter(attempt=self.attempt).count(), 3)
+
+
+class JobMatrixTests(TestCase):
+    def setUp(self):
+        self.reset()
+        self.addCleanup(self.reset)
+        self.company = Company.objects.create(name='Acme')
+        make_job(self.company)
+        # Run background rebuilds inline: another thread can't see the test's transaction
+        patcher = mock.patch.object(matching, '_start_rebuild', side_effect=matching._rebuild)
+        self.start_rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def reset():
+        matching._matrix = matching._matrix_version = None
+        matching._built_at = 0.0
+        matching._rebuilding = False
+
+    def test_writes_are_debounced_and_serve_the_previous_matrix(self):
+        matrix = matching.get_matrix()
+        self.assertEqual(len(matrix), 1)
+        make_job(self.company, title='Rust Engineer', skills_required='Rust')
+        make_job(self.company, title='Go Engineer', skills_required='Go')
+        self.assertIs(matching.get_matrix(), matrix)
+        self.start_rebuild.assert_not_called()
+
+        with mock.patch.object(matching, 'REBUILD_INTERVAL', 0):
+            matching.get_matrix()
+        self.start_rebuild.assert_called_once()
+        self.assertEqual(len(matching.get_matrix()), 3)
+
+    def test_wait_rebuilds_a_stale_matrix(self):
+        matching.get_matrix()
+        make_job(self.company, title='Rust Engineer', skills_required='Rust')
+        self.assertEqual(len(matching.get_matrix(wait=True)), 2)
+        self.start_rebuild.assert_not_called()
+
+    def test_an_evicted_version_makes_the_matrix_stale(self):
+        matching.get_matrix()
+        Job.objects.update(is_active=False)  # another process closed the job
+        matching.invalidate()
+        caches['versions'].clear()
+        self.assertEqual(len(matching.get_matrix(wait=True)), 0)
+
+
+class CoenrollmentTests(TestCase):
+    def setUp(self):
+        category = CourseCategory.objects.create(name='Programming')
+        self.courses = [make_course(category, title=f'Course {i}') for i in range(5)]
+        taken = [(0, 1, 2), (0, 1), (0, 1, 3), (1, 2, 3), (2, 3), (3, 4), (0, 2, 4)]
+        for i, course_indexes in enumerate(taken):
+            user = User.objects.create_user(f'learner{i}')
+            for index in course_indexes:
+                Enrollment.objects.create(user=user, course=self.courses[index], completed_lessons_count=i % 3)
+
+    def neighbors(self):
+        return {
+            (course_id, neighbor_id): round(score, 9)
+            for course_id, neighbor_id, score in CourseNeighbor.objects.values_list('course_id', 'neighbor_id', 'score')
+        }
+
+    def test_incremental_refresh_matches_a_full_one(self):
+        coenrollment.compute_neighbors()
+        full = self.neighbors()
+        self.assertTrue(full)
+        CourseNeighbor.objects.all().delete()
+        refreshed = [self.courses[1].pk, self.courses[3].pk]
+        self.assertEqual(coenrollment.compute_neighbors(refreshed), 2)
+        self.assertEqual(self.neighbors(), {pair: score for pair, score in full.items() if pair[0] in refreshed})
+
+    @staticmethod
+    def age():
+        """Move every recorded change two days back."""
+        earlier = timezone.now() - timedelta(days=2)
+        Enrollment.objects.update(progress_changed_at=earlier, last_accessed=earlier)
+        Course.objects.update(enrollments_changed_at=earlier)
+
+    def changed(self):
+        return coenrollment.changed_courses(timezone.now() - timedelta(days=1))
+
+    def test_changed_courses_include_courses_sharing_learners(self):
+        self.age()
+        Enrollment.objects.filter(course=self.courses[4]).update(progress_changed_at=timezone.now())
+        self.assertEqual(self.changed(), sorted(self.courses[i].pk for i in (0, 2, 3, 4)))
+
+    def test_lesson_completions_change_their_course(self):
+        lesson = Lesson.objects.create(course=self.courses[4], title='Intro', description='', duration_minutes=5)
+        self.age()
+        self.assertEqual(self.changed(), [])
+        for enrollment in Enrollment.objects.filter(course=self.courses[4]):
+            enrollment.compact = enrollment.user.username == 'learner6'
+            enrollment.save()
+            self.age()
+            progress.complete_lesson(enrollment, lesson)
+            self.assertEqual(self.changed(), sorted(self.courses[i].pk for i in (0, 2, 3, 4)))
+
+    def test_removed_enrollments_change_their_course(self):
+        self.age()
+        Enrollment.objects.get(user__username='learner5', course=self.courses[4]).delete()
+        self.assertEqual(self.changed(), sorted(self.courses[i].pk for i in (0, 2, 4)))
+
+    def test_visits_alone_change_nothing(self):
+        self.age()
+        Enrollment.objects.update(last_accessed=timezone.now())
+        self.assertEqual(self.changed(), [])
+
+
+def make_lesson(course, title, order):
+    return Lesson.objects.create(course=course, title=title, description='', duration_minutes=10, order=order)
+
+
+@override_settings(COMPACT_LESSON_PROGRESS=False)
+class ProgressCounterTests(TestCase):
+    def setUp(self):
+        self.course = make_course(CourseCategory.objects.create(name='Programming'))
+        self.intro = make_lesson(self.course, 'Intro', 1)
+        self.models = make_lesson(self.course, 'Models', 2)
+        user = User.objects.create_user('learner')
+        self.enrollment, _ = progress.enroll(user, self.course, [self.intro, self.models])
+        self.assertFalse(self.enrollment.compact)
+
+    def counters(self):
+        self.course.refresh_from_db()
+        self.enrollment.refresh_from_db()
+        next_lesson = self.enrollment.next_lesson.title if self.enrollment.next_lesson else None
+        return self.course.total_lessons, self.enrollment.completed_lessons_count, next_lesson
+
+    def test_completions_move_the_counters(self):
+        self.assertEqual(self.counters(), (2, 0, 'Intro'))
+        self.assertTrue(progress.complete_lesson(self.enrollment, self.intro))
+        self.assertFalse(progress.complete_lesson(self.enrollment, self.intro))
+        self.assertEqual(self.counters(), (2, 1, 'Models'))
+        self.assertTrue(progress.complete_lesson(self.enrollment, self.models))
+        self.assertEqual(self.counters(), (2, 2, None))
+
+    def test_lesson_changes_move_the_counters(self):
+        progress.complete_lesson(self.enrollment, self.intro)
+        make_lesson(self.course, 'Setup', 0)
+        self.assertEqual(self.counters(), (3, 1, 'Setup'))
+        self.intro.delete()
+        self.assertEqual(self.counters(), (2, 0, 'Setup'))
+
+    def test_reconcile_repairs_drift(self):
+        progress.complete_lesson(self.enrollment, self.intro)
+        Course.objects.filter(pk=self.course.pk).update(total_lessons=7)
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(completed_lessons_count=0, next_lesson=None)
+        out = StringIO()
+        call_command('reconcile_progress', stdout=out)
+        self.assertIn('Fixed 1 courses and 1 enrollments', out.getvalue())
+        self.assertEqual(self.counters(), (2, 1, 'Models'))
+
+        out = StringIO()
+        call_command('reconcile_progress', stdout=out)
+        self.assertIn('Fixed 0 courses and 0 enrollments', out.getvalue())
+
+    def test_reconcile_repairs_compact_enrollments(self):
+        with self.settings(COMPACT_LESSON_PROGRESS=True):
+            compact, _ = progress.enroll(User.objects.create_user('other'), self.course, [self.intro, self.models])
+        progress.complete_lesson(compact, self.models)
+        Enrollment.objects.filter(pk=compact.pk).update(completed_lessons_count=2, next_lesson=None)
+        self.assertEqual(progress.reconcile(), (0, 1))
+        compact.refresh_from_db()
+        self.assertEqual((compact.completed_lessons_count, compact.next_lesson_id), (1, self.intro.pk))
+
+
+class LessonBitmapTests(TestCase):
+    def setUp(self):
+        self.course = make_course(CourseCategory.objects.create(name='Programming'))
+        self.intro = make_lesson(self.course, 'Intro', 1)
+        self.models = make_lesson(self.course, 'Models', 2)
+        user = User.objects.create_user('learner')
+        self.enrollment, _ = progress.enroll(user, self.course, [self.intro, self.models])
+        self.assertTrue(self.enrollment.compact)
+        self.assertTrue(progress.complete_lesson(self.enrollment, self.intro))
+
+    def state(self):
+        self.enrollment.refresh_from_db()
+        lessons = list(Lesson.objects.filter(course=self.course))
+        completed_ids = progress.completed_lesson_ids(self.enrollment, lessons)
+        completed = {lesson.title for lesson in lessons if lesson.id in completed_ids}
+        next_lesson = self.enrollment.next_lesson.title if self.enrollment.next_lesson else None
+        return completed, self.enrollment.completed_lessons_count, next_lesson
+
+    def test_completion_is_counted_once(self):
+        self.assertFalse(progress.complete_lesson(self.enrollment, self.intro))
+        self.assertEqual(self.state(), ({'Intro'}, 1, 'Models'))
+
+    def test_completion_survives_inserting_a_lesson(self):
+        make_lesson(self.course, 'Setup', 0)
+        self.assertEqual(self.state(), ({'Intro'}, 1, 'Setup'))
+
+    def test_completion_survives_reordering(self):
+        self.models.order = 0
+        self.models.save()
+        self.intro.order = 5
+        self.intro.save()
+        self.assertEqual(self.state(), ({'Intro'}, 1, 'Models'))
+
+    def test_completion_survives_deleting_a_lesson(self):
+        self.assertTrue(progress.complete_lesson(self.enrollment, self.models))
+        self.intro.delete()
+        self.assertEqual(self.state(), ({'Models'}, 1, None))
+        # The deleted lesson's slot, still set in the bitmap, is never handed out again
+        make_lesson(self.course, 'Admin', 3)
+        self.assertEqual(self.state(), ({'Models'}, 1, 'Admin'))
+
+    def test_concurrent_completions_keep_both_bits(self):
+        bitmap_progress = progress._bitmap_progress
+        calls = []
+
+        def complete_meanwhile(bits, lessons):
+            calls.append(bits)
+            if len(calls) == 1:
+                # Another request completes a lesson after this one read the bitmap
+                self.assertTrue(progress.complete_lesson(self.enrollment, self.models))
+            return bitmap_progress(bits, lessons)
+
+        setup = make_lesson(self.course, 'Setup', 3)
+        with mock.patch.object(progress, '_bitmap_progress', side_effect=complete_meanwhile):
+            self.assertTrue(progress.complete_lesson(self.enrollment, setup))
+        self.assertEqual(len(calls), 3)  # the first compare-and-swap failed and was retried
+        self.assertEqual(self.state(), ({'Intro', 'Models', 'Setup'}, 3, None))
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        self.quiz = Quiz.objects.create(title='Python Basics', category=QuizCategory.objects.create(name='Programming'))
+        self.question = Question.objects.create(quiz=self.quiz, question_text='2 + 2?')
+        self.choice = Choice.objects.create(question=self.question, choice_text='4', is_correct=True)
+        self.attempts = [self.attempt(f'learner{i}') for i in range(2)]
+        itemanalysis.refresh()
+
+    def attempt(self, username, completed=True):
+        attempt = QuizAttempt.objects.create(
+            user=User.objects.create_user(username), quiz=self.quiz, completed_at=timezone.now() if completed else None,
+        )
+        UserAnswer.objects.create(attempt=attempt, question=self.question, selected_choice=self.choice, is_correct=True)
+        return attempt
+
+    def test_fresh_stats_are_not_stale(self):
+        self.assertEqual(self.quiz.stats.attempts, 2)
+        self.assertEqual(itemanalysis.stale_quizzes(), [])
+
+    def test_unfinished_attempts_do_not_make_stats_stale(self):
+        self.attempt('starter', completed=False)
+        self.assertEqual(itemanalysis.stale_quizzes(), [])
+
+    def test_completed_and_deleted_attempts_make_stats_stale(self):
+        self.attempt('finisher')
+        self.assertEqual(itemanalysis.stale_quizzes(), [self.quiz.pk])
+        itemanalysis.refresh()
+        self.assertEqual(itemanalysis.stale_quizzes(), [])
+        self.attempts[0].delete()
+        self.assertEqual(itemanalysis.stale_quizzes(), [self.quiz.pk])
+
+
+class QuizCounterTests(TestCase):
+    def test_retakes_keep_counting_attempts(self):
+        quiz = Quiz.objects.create(title='Python Basics', category=QuizCategory.objects.create(name='Programming'))
+        attempt = QuizAttempt.objects.create(user=User.objects.create_user('learner'), quiz=quiz, completed_at=timezone.now())
+        counters.attempt_completed(attempt)
+        self.assertTrue(counters.rate_quiz(attempt, 4))
+        # start_quiz deletes the earlier attempt of a retake
+        attempt.refresh_from_db()
+        attempt.delete()
+        counters.rollup()
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.attempts_count, 1)
+        self.assertEqual(quiz.rating_count, 0)
+
+
+class CounterRollupTests(TestCase):
+    def setUp(self):
+        self.course = make_course(CourseCategory.objects.create(name='Programming'))
+        patcher = mock.patch.object(counters, 'SHARDS', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_increments_during_a_rollup_stay_pending(self):
+        counters.increment(Course, self.course.pk, 'students_count', 2)
+        counters.increment(Course, self.course.pk, 'rating_total', 4)
+        counters.increment(Course, self.course.pk, 'rating_count', 1)
+        refresh_rating = counters._refresh_rating
+
+        def enroll_meanwhile(model, object_id):
+            refresh_rating(model, object_id)
+            # Lands in a shard this rollup has already read
+            counters.increment(Course, self.course.pk, 'students_count')
+
+        with mock.patch.object(counters, '_refresh_rating', side_effect=enroll_meanwhile):
+            counters.rollup()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.students_count, self.course.rating_count), (2, 1))
+        self.assertEqual(list(CounterShard.objects.values_list('field', 'value')), [('students_count', 1)])
+
+        counters.rollup()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.students_count, 3)
+        self.assertFalse(CounterShard.objects.exists())
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reset()
+        self.addCleanup(self.reset)
+        self.company = Company.objects.create(name='Acme')
+        make_job(self.company)
+        # Run background refreshes inline: another thread can't see the test's transaction
+        patcher = mock.patch.object(autocomplete, '_start_refresh', side_effect=autocomplete._refresh)
+        self.start_refresh = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def reset():
+        autocomplete._index = None
+        autocomplete._checked_at = 0.0
+        autocomplete._refreshing = False
+
+    def suggestions(self, query):
+        return [suggestion['text'] for suggestion in autocomplete.suggest(query)]
+
+    def test_suggestions_are_served_from_memory(self):
+        autocomplete.get_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggestions('pyth'), ['Python Developer'])
+        self.start_refresh.assert_not_called()
+
+    def test_local_writes_patch_the_index(self):
+        index = autocomplete.get_index()
+        make_job(self.company, title='Pythonista')
+        self.assertIs(autocomplete.get_index(), index)
+        self.assertIn('Pythonista', self.suggestions('pyth'))
+
+    def test_remote_writes_rebuild_in_the_background(self):
+        index = autocomplete.get_index()
+        # Another process renamed the job
+        Job.objects.update(title='Rust Engineer')
+        autocomplete.invalidate()
+        self.assertIs(autocomplete.get_index(), index)
+        self.start_refresh.assert_not_called()
+
+        with mock.patch.object(autocomplete, 'REFRESH_INTERVAL', 0):
+            # The refresh runs, but this request is still answered by the old index
+            self.assertIs(autocomplete.get_index(), index)
+        self.start_refresh.assert_called_once()
+        self.assertIsNot(autocomplete.get_index(), index)
+        self.assertEqual(self.suggestions('rust'), ['Rust Engineer'])
+
+    def test_a_current_index_is_kept(self):
+        index = autocomplete.get_index()
+        with mock.patch.object(autocomplete, 'REFRESH_INTERVAL', 0):
+            autocomplete.get_index()
+        self.start_refresh.assert_called_once()
+        self.assertIs(autocomplete.get_index(), index)
+
+    def test_an_evicted_version_never_repeats(self):
+        index = autocomplete.get_index()
+        caches['versions'].clear()
+        self.assertNotEqual(autocomplete.version(), index.version)
+
+
+class SalaryFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        company = Company.objects.create(name='Acme')
+        make_job(company)
+        make_job(company, title='Senior Rust Engineer', salary_min=150, salary_max=200)
+
+    def test_parse_salary(self):
+        self.assertEqual(facets.parse_salary('100'), Decimal('100.00'))
+        self.assertEqual(facets.parse_salary(' 99.999 '), Decimal('100.00'))
+        for value in ['', 'abc', 'NaN', 'sNaN', 'Infinity', '-inf', '1e999', '1e8', '99999999.999']:
+            with self.subTest(value=value):
+                self.assertIsNone(facets.parse_salary(value))
+
+    def test_overlapping_ranges(self):
+        response = self.client.get('/jobs/', {'salary_from': '100'})
+        self.assertNotContains(response, 'Python Developer')
+        self.assertContains(response, 'Senior Rust Engineer')
+
+    def test_invalid_bounds_filter_nothing(self):
+        for value in ['NaN', 'sNaN', 'Infinity', '1e999']:
+            with self.subTest(value=value):
+                response = self.client.get('/jobs/', {'salary_from': value, 'salary_to': value})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Python Developer')
+                self.assertContains(response, 'Senior Rust Engineer')
+
+
+class ImportJobsTests(TestCase):
+    VALID = {'title': 'Data Engineer', 'company': 'Feedco', 'location': 'Dhaka', 'salary_min': 40,
+             'salary_max': 60, 'description': 'Pipelines', 'external_id': 'feed-1'}
+
+    def import_rows(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            for row in rows:
+                f.write((row if isinstance(row, str) else json.dumps(row)) + '\n')
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_jobs', path, stdout=stdout, stderr=stderr)
+        return stderr.getvalue()
+
+    def test_bad_rows_are_skipped_and_good_rows_kept(self):
+        errors = self.import_rows([
+            self.VALID,
+            dict(self.VALID, external_id='feed-2', salary_min='NaN'),
+            dict(self.VALID, external_id='feed-3', salary_max='1e20'),
+            dict(self.VALID, external_id='feed-4', salary_min='Infinity'),
+            ['not', 'an', 'object'],
+            '"just a string"',
+            '{broken',
+        ])
+        self.assertEqual(list(Job.objects.values_list('external_id', flat=True)), ['feed-1'])
+        self.assertIn("Line 2: invalid salary_min: 'NaN'", errors)
+        self.assertIn("Line 3: invalid salary_max: '1e20'", errors)
+        self.assertIn("Line 4: invalid salary_min: 'Infinity'", errors)
+        self.assertIn('Line 5: expected an object, got list', errors)
+        self.assertIn('Line 6: expected an object, got str', errors)
+        self.assertIn('Line 7: invalid JSON', errors)
+
+    def test_reimport_updates_by_external_id(self):
+        self.import_rows([self.VALID])
+        self.import_rows([dict(self.VALID, title='Senior Data Engineer', salary_max='75.5')])
+        job = Job.objects.get()
+        self.assertEqual(job.title, 'Senior Data Engineer')
+        self.assertEqual(job.salary_max, Decimal('75.50'))
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = CourseCategory.objects.create(name='Programming')
+        make_course(self.category)
+        make_course(
+            self.category, title='Rust in Depth', description='Systems programming', short_description='Rust',
+            skills_covered='Rust', price=0,
+        )
+
+    def test_search_ranks_matches(self):
+        response = self.client.get('/courses/', {'q': 'django'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Django for Beginners')
+        self.assertNotContains(response, 'Rust in Depth')
+
+    def test_punctuation_only_query_lists_every_course(self):
+        for query in ['"', '-', '*()']:
+            with self.subTest(query=query):
+                response = self.client.get('/courses/', {'q': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Django for Beginners')
+                self.assertContains(response, 'Rust in Depth')
+
+    def test_price_facet_counts(self):
+        response = self.client.get('/courses/', {'difficulty': 'beginner'})
+        counts = {option['value']: option['count'] for option in response.context['facets']['price']}
+        self.assertEqual(counts, {'free': 1, 'under_1000': 2, 'over_1000': 0})
+
+
+class HeartbeatTests(TestCase):
+    def setUp(self):
+        self.clear_buffers()
+        # Or the exit-time flush would write them to the real database
+        self.addCleanup(self.clear_buffers)
+        self.now = 1000.0
+        for patcher in (
+            mock.patch.object(heartbeats, '_ensure_flusher'),
+            mock.patch.object(heartbeats.time, 'monotonic', lambda: self.now),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        user = User.objects.create_user('learner')
+        course = make_course(CourseCategory.objects.create(name='Programming'))
+        self.enrollment = Enrollment.objects.create(user=user, course=course)
+        self.lessons = [
+            Lesson.objects.create(course=course, title=f'Lesson {i}', description='', duration_minutes=10, order=i)
+            for i in range(3)
+        ]
+
+    @staticmethod
+    def clear_buffers():
+        for buffer in (heartbeats._seconds, heartbeats._ready, heartbeats._beat_at,
+                       heartbeats._enrollment_beat_at, heartbeats._last_seen):
+            buffer.clear()
+        heartbeats._wake.clear()
+
+    def beat(self, lesson, seconds, after):
+        self.now += after
+        heartbeats.record(self.enrollment.pk, lesson.pk, seconds)
+
+    def test_remainders_do_not_wake_the_flusher(self):
+        with mock.patch.object(heartbeats, 'FLUSH_SIZE', 2):
+            for lesson in self.lessons:
+                self.beat(lesson, 20, after=20)
+            self.assertFalse(heartbeats._wake.is_set())
+            for lesson in self.lessons[:2]:
+                self.beat(lesson, 50, after=50)
+            self.assertTrue(heartbeats._wake.is_set())
+
+    def test_claims_are_capped_by_time_between_beats(self):
+        self.beat(self.lessons[0], 60, after=0)
+        self.beat(self.lessons[0], 60, after=5)
+        self.beat(self.lessons[1], 60, after=1)
+        self.assertEqual(heartbeats._seconds, {
+            (self.enrollment.pk, self.lessons[0].pk): 65,
+            (self.enrollment.pk, self.lessons[1].pk): 1,
+        })
+
+    def test_flush_writes_minutes_and_keeps_remainders(self):
+        key = (self.enrollment.pk, self.lessons[0].pk)
+        for _ in range(5):
+            self.beat(self.lessons[0], 30, after=30)
+        heartbeats.flush()
+        completion = LessonCompletion.objects.get(enrollment=self.enrollment, lesson=self.lessons[0])
+        self.assertEqual(completion.time_spent_minutes, 2)
+        self.assertEqual(heartbeats._seconds, {key: 30})
+
+        # Once the lesson goes idle its remainder is rounded and written
+        self.now += heartbeats.IDLE_SECONDS
+        heartbeats.flush()
+        completion.refresh_from_db()
+        self.assertEqual(completion.time_spent_minutes, 3)
+        self.assertEqual(heartbeats._seconds, {})
+        self.assertEqual(heartbeats._beat_at, {})
+        self.assertEqual(heartbeats._enrollment_beat_at, {})
+
+
+class DedupStorageTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        self.storage = DedupStorage(location=location)
+
+    def test_identical_content_shares_one_blob(self):
+        first = self.storage.save('resumes/a.pdf', ContentFile(b'same bytes'))
+        second = self.storage.save('resumes/b.pdf', ContentFile(b'same bytes'))
+        self.assertEqual(os.stat(self.storage.path(first)).st_ino, os.stat(self.storage.path(second)).st_ino)
+        self.assertEqual(os.stat(self.storage.path(first)).st_nlink, 3)
+
+    def test_blob_collected_before_linking_is_rewritten(self):
+        write_blob = self.storage._write_blob
+        calls = []
+
+        def collected(content):
+            blob = write_blob(content)
+            if not calls:
+                os.remove(blob)  # collect_garbage runs in between
+            calls.append(blob)
+            return blob
+
+        self.storage._write_blob = collected
+        name = self.storage.save('resumes/a.pdf', ContentFile(b'content'))
+        self.assertEqual(len(calls), 2)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'content')
+
+
+class ProfileDocumentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('seeker')
+        self.skill = Skill.objects.create(user=self.user, name='Python', percentage=90)
+
+    def test_document_is_cached(self):
+        profiles.get_document(self.user.pk)
+        with self.assertNumQueries(1):  # the shared version
+            document = profiles.get_document(self.user.pk)
+        self.assertEqual([skill.name for skill in document['skills']], ['Python'])
+
+    def test_saving_a_section_invalidates_the_document(self):
+        profiles.get_document(self.user.pk)
+        Experience.objects.create(
+            user=self.user, position='Developer', company='Acme', start_date=timezone.now().date(),
+        )
+        self.assertEqual([e.company for e in profiles.get_document(self.user.pk)['experiences']], ['Acme'])
+        self.skill.percentage = 50
+        self.skill.save()
+        self.assertEqual(profiles.get_document(self.user.pk)['skills'][0].percentage, 50)
+        self.skill.delete()
+        self.assertEqual(profiles.get_document(self.user.pk)['skills'], [])
+        profile = UserProfile.objects.get(user=self.user)
+        profile.title = 'Backend Engineer'
+        profile.save()
+        self.assertEqual(profiles.get_document(self.user.pk)['profile'].title, 'Backend Engineer')
+
+    def test_renamed_users_are_not_found_by_their_old_name(self):
+        self.assertEqual(profiles.get_document_by_username('seeker')['profile_user'], self.user)
+        self.user.username = 'finder'
+        self.user.save()
+        with self.assertRaises(Http404):
+            profiles.get_document_by_username('seeker')
+        self.assertEqual(profiles.get_document_by_username('finder')['profile_user'], self.user)
+
+    def test_viewing_a_profile_creates_no_profile_row(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        self.client.force_login(User.objects.create_user('visitor'))
+        response = self.client.get('/profile/seeker/')
+        self.assertContains(response, 'Python')
+        self.assertFalse(UserProfile.objects.filter(user=self.user).exists())
+
+
+class QueuedExecutor:
+    """Stands in for a worker pool: submitted calls wait until ``run``."""
+
+    def __init__(self):
+        self.queued = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.queued.append((future, fn, args))
+        return future
+
+    def run(self):
+        for future, fn, args in self.queued:
+            future.set_result(fn(*args))
+        self.queued = []
+
+
+class CVTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.executor = QueuedExecutor()
+        for name, value in (('CV_ROOT', Path(root)), ('_executor', self.executor)):
+            patcher = mock.patch.object(cv, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('seeker', first_name='Amina', last_name='Khan')
+        Skill.objects.create(user=self.user, name='Python', percentage=90)
+
+    def data(self):
+        return cv.cv_data(profiles.get_document(self.user.pk))
+
+    def test_content_hash_follows_the_profile(self):
+        first = cv.content_hash(self.data())
+        self.assertEqual(cv.content_hash(self.data()), first)
+        profile = UserProfile.objects.get(user=self.user)
+        profile.title = 'Backend Engineer'
+        profile.save()
+        self.assertEqual(self.data()['title'], 'Backend Engineer')
+        self.assertNotEqual(cv.content_hash(self.data()), first)
+
+    def test_each_version_is_rendered_once(self):
+        document = profiles.get_document(self.user.pk)
+        self.assertIsNone(cv.get_cv(self.user.pk, document))
+        self.assertIsNone(cv.get_cv(self.user.pk, document))
+        self.assertEqual(len(self.executor.queued), 1)  # downloads of one version share a render
+        self.executor.run()
+        path = cv.get_cv(self.user.pk, document)
+        self.assertTrue(path.read_bytes().startswith(b'%PDF-1.4'))
+        with mock.patch.object(cv, 'render_pdf') as render_pdf:
+            self.assertEqual(cv.get_cv(self.user.pk, profiles.get_document(self.user.pk)), path)
+        render_pdf.assert_not_called()
+
+        Skill.objects.create(user=self.user, name='Django', percentage=80)
+        self.assertIsNone(cv.get_cv(self.user.pk, profiles.get_document(self.user.pk)))
+        self.executor.run()
+        self.assertFalse(path.exists())  # superseded
+
+    def test_download_asks_to_retry_until_the_cv_is_ready(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/profile/download-cv/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(cv.RETRY_AFTER))
+        self.executor.run()
+        response = self.client.get('/profile/download-cv/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('seeker-cv.pdf', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class FileServeTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = self.settings(MEDIA_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for name in ('logos/acme.txt', 'resumes/seeker.pdf'):
+            os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(b'0123456789')
+
+    def get(self, path='/media/logos/acme.txt', **headers):
+        return self.client.get(path, headers=headers)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_byte_ranges(self):
+        response = self.get(range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.content(response), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+        response = self.get(range='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.content(response), b'789')
+        self.assertEqual(response['Content-Range'], 'bytes 7-9/10')
+
+        response = self.get(range='bytes=8-')
+        self.assertEqual(self.content(response), b'89')
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(range='bytes=2-5', if_range=etag).status_code, 206)
+        response = self.get(range='bytes=2-5', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), b'0123456789')
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    def test_protected_and_outside_paths_are_not_served(self):
+        self.assertEqual(self.get('/media/resumes/seeker.pdf').status_code, 404)
+        self.assertEqual(self.get('/media/logos/../resumes/seeker.pdf').status_code, 404)
+        self.assertEqual(self.get('/media/missing.txt').status_code, 404)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = self.settings(MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for name in ('logos/acme.png', 'resumes/seeker.png'):
+            os.makedirs(os.path.dirname(os.path.join(self.root, name)), exist_ok=True)
+            Image.new('RGB', (300, 200), 'navy').save(os.path.join(self.root, name))
+        self.name = images.derivative_name('logos/acme.png', 'avatar')
+
+    def assertNotFound(self, name):
+        with self.assertRaises(Http404):
+            images.derivative_path(name)
+
+    def test_forged_names_are_rejected(self):
+        digest = self.name.split('/')[2]
+        self.assertNotFound('derived/avatar/0123456789abcdef/logos/acme.png.webp')
+        self.assertNotFound(f'derived/hero/{digest}/logos/acme.png.webp')  # another size
+        self.assertNotFound(f'derived/avatar/{digest}/logos/acme.png.jpg')  # another format
+        self.assertNotFound(f'derived/huge/{digest}/logos/acme.png.webp')
+        self.assertNotFound(f'derived/avatar/{digest}/logos/../resumes/seeker.png.webp')
+        # Protected uploads have no derivatives, even under a valid name
+        self.assertNotFound(images.derivative_name('resumes/seeker.png', 'avatar'))
+
+    def test_names_go_stale_with_their_source(self):
+        source = os.path.join(self.root, 'logos/acme.png')
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertNotFound(self.name)
+        fresh = images.derivative_name('logos/acme.png', 'avatar')
+        self.assertNotEqual(fresh, self.name)
+        self.assertTrue(images.derivative_path(fresh).exists())
+
+    def test_each_derivative_is_rendered_once(self):
+        with mock.patch.object(images, 'render', wraps=images.render) as render:
+            path = images.derivative_path(self.name)
+            self.assertEqual(images.derivative_path(self.name), path)
+            response = self.client.get('/media/' + self.name)
+        render.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+        with Image.open(path) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (96, 96)))
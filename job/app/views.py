@@ -1,40 +1,64 @@
-from django.http import FileResponse
-from django.utils import timezone
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from .models import Choice, Job, Course, Company, CourseCategory,Course, CourseCategory, Enrollment,LessonCompletion,Lesson, Question, Quiz, QuizAttempt, UserAnswer
-from .models import UserProfile, Experience, Education, Skill, Project, Language, Certificate
+from django.views.decorators.http import condition, require_POST
+from .models import Job, Course, Company, CourseCategory,Course, CourseCategory, Enrollment,LessonCompletion,Lesson, Quiz, QuizAttempt
+from .models import UserProfile, Tag
+from . import answerkey, autocomplete, coenrollment, conditional, counters, course_facets, course_search, cv, facets, fileserve, heartbeats, images, matching, pagecache, profiles, progress, quizsession, search
+from .tags import with_tags
+from .pagination import paginate
 
+JOB_ORDERING = ('-posted_date', '-id')
+SEARCH_ORDERING = ('search_rank',) + JOB_ORDERING
+CATALOG_ORDERING = ('-created_date', '-id')
+CATALOG_SEARCH_ORDERING = ('search_rank',) + CATALOG_ORDERING
 
 
+
+@condition(etag_func=conditional.home_etag)
 def home(request):
 
-    featured_jobs = Job.objects.filter(is_active=True).order_by('-posted_date')[:3]
+    featured_jobs = with_tags(Job.objects.filter(is_active=True).select_related('company')).order_by('-posted_date')[:3]
+    
+    popular_courses = with_tags(Course.objects.filter(is_active=True)).order_by('-created_date')[:3]
     
-    popular_courses = Course.objects.filter(is_active=True).order_by('-created_date')[:3]
+    recommended_jobs = matching.recommended_jobs(request.user) if request.user.is_authenticated else []
     
     context = {
         'featured_jobs': featured_jobs,
         'popular_courses': popular_courses,
+        'recommended_jobs': recommended_jobs,
     }
     return render(request, 'welcome.html', context)
 
+@condition(etag_func=conditional.job_list_etag)
 def job_list(request):
-    jobs = Job.objects.filter(is_active=True).order_by('-posted_date')
+    jobs = with_tags(Job.objects.filter(is_active=True).select_related('company')).order_by('-posted_date')
     
     # Get filter parameters
     location_filter = request.GET.get('location', '')
     job_type_filter = request.GET.get('job_type', '')
     experience_filter = request.GET.get('experience', '')
+    work_mode_filter = request.GET.get('work_mode', '')
+    category_filter = request.GET.get('category', '')
+    skill_filter = request.GET.get('skill', '')
+    salary_from = request.GET.get('salary_from', '')
+    salary_to = request.GET.get('salary_to', '')
     search_query = request.GET.get('q', '')
+    salary = (facets.parse_salary(salary_from), facets.parse_salary(salary_to))
     
     # Apply filters
     if search_query:
-        jobs = jobs.filter(title__icontains=search_query)
+        jobs = search.search_jobs(jobs, search_query)
+    
+    if skill_filter:
+        jobs = jobs.filter(tags__normalized_name=Tag.normalize(skill_filter))
+    
+    # Salary ranges that overlap [salary_from, salary_to]
+    jobs = facets.filter_salary(jobs, salary)
     
     if location_filter:
         if location_filter == 'remote':
@@ -48,27 +72,73 @@ def job_list(request):
     if experience_filter:
         jobs = jobs.filter(experience_level=experience_filter)
     
-    # Get unique values for filter dropdowns
-    locations = Job.objects.filter(is_active=True).values_list('location', flat=True).distinct()
-    job_types = Job.JOB_TYPES
-    experience_levels = Job.EXPERIENCE_LEVELS
+    if work_mode_filter:
+        jobs = jobs.filter(work_mode=work_mode_filter)
+    
+    if category_filter:
+        jobs = jobs.filter(category=category_filter)
+    
+    jobs = paginate(jobs, request, SEARCH_ORDERING if search_query else JOB_ORDERING)
+    for job in jobs:
+        job.search_highlight = search.highlight(getattr(job, 'search_snippet', ''))
+    
+    # Facet counts for the filter dropdowns (one cached aggregate)
+    selected = {
+        'location': location_filter,
+        'job_type': job_type_filter,
+        'experience_level': experience_filter,
+        'work_mode': work_mode_filter,
+        'category': category_filter,
+    }
     
     context = {
         'jobs': jobs,
-        'locations': locations,
-        'job_types': job_types,
-        'experience_levels': experience_levels,
+        'jobs_count': facets.job_count(search_query, selected, skill_filter, salary),
+        'facets': facets.job_facets(search_query, selected, skill_filter, salary),
         'selected_location': location_filter,
         'selected_job_type': job_type_filter,
         'selected_experience': experience_filter,
+        'selected_work_mode': work_mode_filter,
+        'selected_category': category_filter,
+        'selected_skill': skill_filter,
+        'salary_from': salary_from,
+        'salary_to': salary_to,
         'search_query': search_query,
     }
     return render(request, 'jobs/job_list.html', context)
 
+def salary_histogram(request):
+    category = request.GET.get('category', '')
+    experience = request.GET.get('experience', '')
+    return JsonResponse({
+        'bucket_width': facets.SALARY_BUCKET_WIDTH,
+        'category': category,
+        'experience': experience,
+        'buckets': facets.salary_histogram(category, experience),
+    })
+
+def job_autocomplete(request):
+    # Served from the in-process index; once it is built, staleness checks and
+    # rebuilds run in a background thread, never in the request
+    try:
+        limit = min(int(request.GET.get('limit', autocomplete.SUGGESTION_LIMIT)), autocomplete.MAX_LIMIT)
+    except ValueError:
+        limit = autocomplete.SUGGESTION_LIMIT
+    query = request.GET.get('q', '')
+    return JsonResponse({
+        'query': query,
+        'suggestions': autocomplete.suggest(query, max(limit, 1)),
+    })
+
+@condition(etag_func=conditional.job_detail_etag, last_modified_func=conditional.job_detail_last_modified)
 def job_detail(request, job_id):
-    job = get_object_or_404(Job, id=job_id, is_active=True)
+    # Job, company and tags come from the cache until the job or its company is saved
+    cache_version = pagecache.version('job', job_id)
+    job = pagecache.get_job(job_id, cache_version)
     context = {
         'job': job,
+        'cache_version': cache_version,
+        'cache_timeout': pagecache.CACHE_TIMEOUT,
     }
     return render(request, 'jobs/job_detail.html', context)
 
@@ -92,23 +162,8 @@ def course_detail(request, course_id):
     return render(request, 'courses/course_detail.html', context)
 
 def search_jobs(request):
-    query = request.GET.get('q', '')
-    location = request.GET.get('location', '')
-    
-    jobs = Job.objects.filter(is_active=True)
-    
-    if query:
-        jobs = jobs.filter(title__icontains=query)
-    
-    if location:
-        jobs = jobs.filter(location__icontains=location)
-    
-    context = {
-        'jobs': jobs,
-        'query': query,
-        'location': location,
-    }
-    return render(request, 'jobs/job_search.html', context)
+    # Same filters and facets as the job list; kept for the search form URL
+    return job_list(request)
 
 
 @login_required
@@ -119,6 +174,7 @@ def logout_view(request):
 
 
 
+@condition(etag_func=conditional.course_list_etag)
 def course_list(request):
     # Determine active tab
     tab = request.GET.get('tab', 'all')
@@ -131,41 +187,47 @@ def course_list(request):
         category_filter = request.GET.get('category', '')
         difficulty_filter = request.GET.get('difficulty', '')
         price_filter = request.GET.get('price', '')
+        skill_filter = request.GET.get('skill', '')
         search_query = request.GET.get('q', '')
+        categories = list(CourseCategory.objects.all())
+        # Filter on the ids behind the name instead of joining on the unindexed name
+        category_ids = {category.id for category in categories if category.name == category_filter}
         
         # Apply filters
         if search_query:
-            courses = courses.filter(
-                Q(title__icontains=search_query) |
-                Q(instructor__icontains=search_query) |
-                Q(skills_covered__icontains=search_query)
-            )
+            courses = course_search.search_courses(courses, search_query)
+        
+        if skill_filter:
+            courses = courses.filter(tags__normalized_name=Tag.normalize(skill_filter))
         
         if category_filter:
-            courses = courses.filter(category__name=category_filter)
+            courses = courses.filter(category_id__in=category_ids)
         
         if difficulty_filter:
             courses = courses.filter(difficulty=difficulty_filter)
         
-        if price_filter:
-            if price_filter == 'free':
-                courses = courses.filter(price=0)
-            elif price_filter == 'under_1000':
-                courses = courses.filter(price__lt=1000)
-            elif price_filter == 'over_1000':
-                courses = courses.filter(price__gte=1000)
+        courses = course_facets.filter_price(courses, price_filter)
         
-        # Get unique values for filter dropdowns
-        categories = CourseCategory.objects.all()
-        difficulty_levels = Course.DIFFICULTY_LEVELS
+        courses = paginate(
+            courses.select_related('category'), request,
+            CATALOG_SEARCH_ORDERING if search_query else CATALOG_ORDERING,
+        )
+        
+        # Facet counts for the filter dropdowns (one cached aggregate)
+        selected = {
+            'category': category_ids if category_filter else None,
+            'difficulty': difficulty_filter,
+            'price': price_filter,
+        }
         
         context = {
             'courses': courses,
-            'categories': categories,
-            'difficulty_levels': difficulty_levels,
+            'courses_count': course_facets.course_count(search_query, selected, skill_filter),
+            'facets': course_facets.course_facets(categories, search_query, selected, skill_filter),
             'selected_category': category_filter,
             'selected_difficulty': difficulty_filter,
             'selected_price': price_filter,
+            'selected_skill': skill_filter,
             'search_query': search_query,
             'active_tab': tab,
             'show_filters': True,  # Show filters for "All Courses"
@@ -173,7 +235,7 @@ def course_list(request):
     
     # For "My Courses" tab
     elif tab == 'my_courses' and request.user.is_authenticated:
-        enrollments = Enrollment.objects.filter(user=request.user).select_related('course')
+        enrollments = Enrollment.objects.filter(user=request.user).select_related('course__category', 'next_lesson')
         
         # Calculate progress for each enrollment
         courses_with_progress = []
@@ -183,7 +245,7 @@ def course_list(request):
         for enrollment in enrollments:
             progress_percentage = enrollment.get_progress_percentage()
             completed_lessons = enrollment.get_completed_lessons_count()
-            total_lessons = enrollment.course.lessons.count()
+            total_lessons = enrollment.course.total_lessons
             
             total_lessons_completed += completed_lessons
             
@@ -199,11 +261,9 @@ def course_list(request):
                 'next_lesson': enrollment.get_next_lesson(),
             })
         
-        # Get suggested courses (excluding already enrolled ones)
-        enrolled_course_ids = enrollments.values_list('course_id', flat=True)
-        suggested_courses = Course.objects.filter(is_active=True).exclude(
-            id__in=enrolled_course_ids
-        )[:4]
+        # Get suggested courses: most often taken with the enrolled ones
+        enrolled_course_ids = [enrollment.course_id for enrollment in enrollments]
+        suggested_courses = coenrollment.suggested_courses(enrolled_course_ids)
         
         context = {
             'courses_with_progress': courses_with_progress,
@@ -285,14 +345,14 @@ def enroll_course(request, course_id):
 
 @login_required
 def my_courses(request):
-    enrollments = Enrollment.objects.filter(user=request.user).select_related('course')
+    enrollments = Enrollment.objects.filter(user=request.user).select_related('course__category', 'next_lesson')
     
     # Calculate progress for each enrollment
     courses_with_progress = []
     for enrollment in enrollments:
         progress_percentage = enrollment.get_progress_percentage()
         completed_lessons = enrollment.get_completed_lessons_count()
-        total_lessons = enrollment.course.lessons.count()
+        total_lessons = enrollment.course.total_lessons
         
         courses_with_progress.append({
             'enrollment': enrollment,
@@ -310,24 +370,22 @@ def my_courses(request):
     return render(request, 'courses/my_courses.html', context)
 
 @login_required
+@condition(etag_func=conditional.course_detail_etag)
 def course_detail(request, course_id):
-    course = get_object_or_404(Course, id=course_id, is_active=True)
+    cache_version = pagecache.version('course', course_id)
+    course = pagecache.get_course(course_id, cache_version)
     enrollment = Enrollment.objects.filter(user=request.user, course=course).first()
     lessons = course.lessons.all()
+    if enrollment:
+        enrollment.course = course
     
-    # Get completion status for each lesson
+    # Get completion status for each lesson, from the bitmap or one query
+    completed = progress.completed_lesson_ids(enrollment, lessons) if enrollment else set()
     lessons_with_completion = []
     for lesson in lessons:
-        completion = None
-        if enrollment:
-            completion = LessonCompletion.objects.filter(
-                enrollment=enrollment, 
-                lesson=lesson
-            ).first()
-        
         lessons_with_completion.append({
             'lesson': lesson,
-            'completion': completion,
+            'completed': lesson.id in completed,
         })
     
     context = {
@@ -335,54 +393,72 @@ def course_detail(request, course_id):
         'enrollment': enrollment,
         'lessons_with_completion': lessons_with_completion,
         'progress_percentage': enrollment.get_progress_percentage() if enrollment else 0,
+        # Called by the template only when the related fragment is not cached
+        'related_courses': lambda: coenrollment.related_courses(course),
+        'cache_version': cache_version,
+        'cache_timeout': pagecache.CACHE_TIMEOUT,
     }
     return render(request, 'courses/course_detail.html', context)
 
 @login_required
 def enroll_course(request, course_id):
-    course = get_object_or_404(Course, id=course_id, is_active=True)
+    course = pagecache.get_course(course_id, pagecache.version('course', course_id))
     
     # Check if already enrolled
-    enrollment, created = Enrollment.objects.get_or_create(
-        user=request.user,
-        course=course
-    )
+    enrollment, created = progress.enroll(request.user, course, list(course.lessons.all()))
     
     if created:
-        # Create lesson completion records for all lessons
-        lessons = course.lessons.all()
-        for lesson in lessons:
-            LessonCompletion.objects.create(
-                enrollment=enrollment,
-                lesson=lesson,
-                completed=False
-            )
         messages.success(request, f'Successfully enrolled in {course.title}!')
     else:
         messages.info(request, f'You are already enrolled in {course.title}')
     
     return redirect('app:course_detail', course_id=course_id)
 
+@login_required
+@require_POST
+def rate_course(request, course_id):
+    enrollment = get_object_or_404(Enrollment, course_id=course_id, user=request.user)
+    try:
+        stars = int(request.POST.get('rating', ''))
+    except ValueError:
+        stars = 0
+    
+    if counters.rate_course(enrollment, stars):
+        messages.success(request, 'Thanks for rating this course!')
+    else:
+        messages.error(request, 'Please pick a rating from 1 to 5 stars.')
+    
+    return redirect('app:course_detail', course_id=course_id)
+
 @login_required
 def mark_lesson_complete(request, enrollment_id, lesson_id):
     enrollment = get_object_or_404(Enrollment, id=enrollment_id, user=request.user)
     lesson = get_object_or_404(Lesson, id=lesson_id, course=enrollment.course)
     
-    completion, created = LessonCompletion.objects.get_or_create(
-        enrollment=enrollment,
-        lesson=lesson
-    )
-    
-    if not completion.completed:
-        completion.completed = True
-        completion.completed_date = timezone.now()
-        completion.save()
+    if progress.complete_lesson(enrollment, lesson):
         messages.success(request, f'Lesson "{lesson.title}" marked as completed!')
     else:
         messages.info(request, f'Lesson "{lesson.title}" was already completed')
     
     return redirect('app:course_detail', course_id=enrollment.course.id)
 
+@login_required
+@require_POST
+def lesson_heartbeat(request, enrollment_id, lesson_id):
+    # Sent by the player every few seconds; buffered and written in batches
+    owner = heartbeats.enrollment_owner(enrollment_id)
+    if owner is None or owner[0] != request.user.id:
+        raise Http404
+    course = pagecache.get_course(owner[1], pagecache.version('course', owner[1]))
+    if not any(lesson.id == lesson_id for lesson in course.lessons.all()):
+        raise Http404
+    try:
+        seconds = int(request.POST.get('seconds', ''))
+    except ValueError:
+        return JsonResponse({'error': 'seconds must be an integer'}, status=400)
+    heartbeats.record(enrollment_id, lesson_id, seconds)
+    return HttpResponse(status=204)
+
 @login_required
 def continue_learning(request, course_id):
     course = get_object_or_404(Course, id=course_id, is_active=True)
@@ -401,14 +477,17 @@ def about_view(request):
 
 
 
+@condition(etag_func=conditional.quiz_list_etag)
 def quiz_list(request):
     quizzes = Quiz.objects.filter(is_active=True).order_by('-created_date')
+    quizzes = paginate(quizzes, request, CATALOG_ORDERING)
     
     context = {
         'quizzes': quizzes,
     }
     return render(request, 'quizzes/quiz_list.html', context)
 
+@condition(etag_func=conditional.quiz_detail_etag, last_modified_func=conditional.quiz_detail_last_modified)
 def quiz_detail(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id, is_active=True)
     questions = quiz.questions.all().prefetch_related('choices')
@@ -450,99 +529,128 @@ def start_quiz(request, quiz_id):
         user=request.user,
         quiz=quiz
     )
+    quizsession.start(attempt)
     
     return redirect('app:take_quiz', attempt_id=attempt.id)
 
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
 @login_required
 def take_quiz(request, attempt_id):
-    attempt = get_object_or_404(QuizAttempt, id=attempt_id, user=request.user)
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('quiz'), id=attempt_id, user=request.user)
     
     if attempt.completed_at:
         messages.info(request, 'This quiz has already been completed.')
         return redirect('app:quiz_result', attempt_id=attempt.id)
     
-    # Get unanswered questions
-    answered_question_ids = attempt.user_answers.values_list('question_id', flat=True)
-    current_question = attempt.quiz.questions.exclude(id__in=answered_question_ids).first()
-    
-    if not current_question:
-        # All questions answered, calculate score
-        return calculate_quiz_score(attempt)
+    # Questions, choices and the cursor come from the cached session
+    session = quizsession.load(attempt)
     
     if request.method == 'POST':
-        # Process the answer
-        question_id = request.POST.get('question_id')
-        question = get_object_or_404(Question, id=question_id, quiz=attempt.quiz)
-        
-        if question.question_type == 'multiple_choice':
-            choice_id = request.POST.get('choice_id')
-            if choice_id:
-                selected_choice = get_object_or_404(Choice, id=choice_id, question=question)
-                is_correct = selected_choice.is_correct
-                
-                UserAnswer.objects.create(
-                    attempt=attempt,
-                    question=question,
-                    selected_choice=selected_choice,
-                    is_correct=is_correct
-                )
-        elif question.question_type == 'true_false':
-            answer = request.POST.get('answer') == 'true'
-            # For true/false, we need to know the correct answer
-            # This is a simplified version - you'd need to store correct answers differently
-            pass
-        
-        # Get next question or finish quiz
-        next_question = attempt.quiz.questions.exclude(
-            id__in=attempt.user_answers.values_list('question_id', flat=True)
-        ).first()
-        
-        if next_question:
-            current_question = next_question
-        else:
-            return calculate_quiz_score(attempt)
+        # Process the answer; anything but the current question is ignored
+        question_id = _int_or_none(request.POST.get('question_id'))
+        session.answer(
+            question_id,
+            _int_or_none(request.POST.get(f'choice_{question_id}')),
+            request.POST.get(f'answer_{question_id}', ''),
+        )
+    
+    current_question = session.current_question()
+    if current_question is None:
+        # All questions answered, calculate score
+        session.complete()
+        return redirect('app:quiz_result', attempt_id=attempt.id)
     
     context = {
         'attempt': attempt,
-        'current_question': current_question,
+        'answered_count': session.cursor,
+        'total_questions': session.total,
     }
+    if request.GET.get('mode') == 'all':
+        context['questions'] = session.remaining_questions()
+        return render(request, 'quizzes/take_quiz_all.html', context)
+    
+    context['current_question'] = current_question
     return render(request, 'quizzes/take_quiz.html', context)
 
-def calculate_quiz_score(attempt):
-    total_questions = attempt.quiz.questions.count()
-    correct_answers = attempt.user_answers.filter(is_correct=True).count()
+@login_required
+@require_POST
+def submit_quiz(request, attempt_id):
+    # Every remaining answer in one POST, graded and stored in one transaction
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('quiz'), id=attempt_id, user=request.user)
+    if attempt.completed_at:
+        messages.info(request, 'This quiz has already been completed.')
+        return redirect('app:quiz_result', attempt_id=attempt.id)
     
-    if total_questions > 0:
-        score = (correct_answers / total_questions) * 100
-    else:
-        score = 0
+    session = quizsession.load(attempt)
+    answers = {}
+    for question in session.remaining_questions():
+        answers[question['id']] = (
+            _int_or_none(request.POST.get(f'choice_{question["id"]}')),
+            request.POST.get(f'answer_{question["id"]}', ''),
+        )
     
-    attempt.score = score
-    attempt.passed = score >= attempt.quiz.passing_score
-    attempt.completed_at = timezone.now()
-    attempt.save()
+    if session.submit_all(answers):
+        messages.success(request, 'Your answers have been submitted.')
+    else:
+        messages.info(request, 'This quiz has already been completed.')
     
-    # Update quiz statistics
-    attempt.quiz.attempts_count += 1
-    attempt.quiz.save()
+    return redirect('app:quiz_result', attempt_id=attempt.id)
+
+@login_required
+@require_POST
+def rate_quiz(request, attempt_id):
+    attempt = get_object_or_404(QuizAttempt, id=attempt_id, user=request.user, completed_at__isnull=False)
+    try:
+        stars = int(request.POST.get('rating', ''))
+    except ValueError:
+        stars = 0
+    
+    if counters.rate_quiz(attempt, stars):
+        messages.success(request, 'Thanks for rating this quiz!')
+    else:
+        messages.error(request, 'Please pick a rating from 1 to 5 stars.')
     
     return redirect('app:quiz_result', attempt_id=attempt.id)
 
 @login_required
 def quiz_result(request, attempt_id):
-    attempt = get_object_or_404(QuizAttempt, id=attempt_id, user=request.user)
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('quiz'), id=attempt_id, user=request.user)
     
     if not attempt.completed_at:
         messages.error(request, 'Quiz not completed yet.')
         return redirect('app:take_quiz', attempt_id=attempt.id)
     
-    for ua in attempt.user_answers.all():
-        ua.correct_choices = ua.question.choices.filter(is_correct=True)
+    # Questions, choices and correct answers come from the quiz's answer key,
+    # so the page costs one query for the answers however long the quiz is
+    key = answerkey.get_key(attempt.quiz_id)
+    answers = {
+        question_id: (choice_id, text, is_correct)
+        for question_id, choice_id, text, is_correct in attempt.user_answers.values_list(
+            'question_id', 'selected_choice_id', 'answer_text', 'is_correct',
+        )
+    }
+    results = []
+    for question in key.questions:
+        if question['id'] not in answers:
+            continue
+        choice_id, text, is_correct = answers[question['id']]
+        results.append({
+            'question_text': question['question_text'],
+            'answer': key.choice_texts.get(choice_id, '') if choice_id is not None else text,
+            'is_correct': is_correct,
+            'correct_answers': key.correct_texts(question['id']),
+        })
 
     context = {
         'attempt': attempt,
-        'correct_answers': attempt.user_answers.filter(is_correct=True).count(),
-        'total_questions': attempt.quiz.questions.count(),
+        'results': results,
+        'correct_answers': sum(result['is_correct'] for result in results),
+        'total_questions': len(key),
     }
     return render(request, 'quizzes/quiz_result.html', context)
 
@@ -551,35 +659,25 @@ def quiz_result(request, attempt_id):
 
 @login_required
 def profile(request, username=None):
-    # If no username provided, show current user's profile
+    # If no username provided, show current user's profile; the user, their
+    # profile and every section come from one cached document
     if username:
-        profile_user = get_object_or_404(User, username=username)
+        document = profiles.get_document_by_username(username)
     else:
-        profile_user = request.user
+        document = profiles.get_document(request.user.id)
+    profile_user = document['profile_user']
     
     # Get active tab
     active_tab = request.GET.get('tab', 'overview')
     
-    # Get profile data
-    profile, created = UserProfile.objects.get_or_create(user=profile_user)
-    experiences = Experience.objects.filter(user=profile_user).order_by('-start_date')
-    educations = Education.objects.filter(user=profile_user).order_by('-start_date')
-    skills = Skill.objects.filter(user=profile_user).order_by('-percentage')
-    projects = Project.objects.filter(user=profile_user).order_by('-start_date')
-    languages = Language.objects.filter(user=profile_user)
-    certificates = Certificate.objects.filter(user=profile_user).order_by('-issue_date')
+    is_own_profile = profile_user.id == request.user.id
+    recommended_jobs = matching.recommended_jobs(profile_user) if is_own_profile else []
     
     context = {
-        'profile_user': profile_user,
-        'profile': profile,
-        'experiences': experiences,
-        'educations': educations,
-        'skills': skills,
-        'projects': projects,
-        'languages': languages,
-        'certificates': certificates,
+        **document,
         'active_tab': active_tab,
-        'is_own_profile': profile_user == request.user,
+        'is_own_profile': is_own_profile,
+        'recommended_jobs': recommended_jobs,
     }
     return render(request, 'profile/profile.html', context)
 
@@ -611,11 +709,33 @@ def edit_profile(request):
     return render(request, 'profile/edit_profile.html', context)
 
 @login_required
-def download_cv(request):
-    profile = get_object_or_404(UserProfile, user=request.user)
-    if profile.resume:
-        response = FileResponse(profile.resume, as_attachment=True)
-        return response
+def download_cv(request, username=None):
+    """The uploaded resume if there is one, else a CV generated from the profile."""
+    if username:
+        document = profiles.get_document_by_username(username)
     else:
-        messages.error(request, 'No resume uploaded yet.')
-        return redirect('app:profile')
\ No newline at end of file
+        document = profiles.get_document(request.user.id)
+    profile_user = document['profile_user']
+    resume = document['profile'].resume
+    if resume:
+        return fileserve.serve_file(request, resume.path, as_attachment=True)
+    
+    path = cv.get_cv(profile_user.id, document)
+    if path is None:
+        response = HttpResponse('The CV is being generated, please try again shortly.', status=503)
+        response['Retry-After'] = str(cv.RETRY_AFTER)
+        return response
+    return fileserve.serve_file(request, path, filename=f'{profile_user.username}-cv.pdf', as_attachment=True)
+
+
+def serve_media(request, path):
+    """
+    Public uploads (logos, photos, thumbnails) and their resized derivatives,
+    rendered on first request; resumes and CVs only go through download_cv.
+    """
+    if path.startswith('derived/'):
+        return fileserve.serve_file(request, images.derivative_path(path), immutable=True)
+    path = fileserve.media_path(path)
+    if fileserve.is_protected(path):
+        raise Http404('File not found')
+    return fileserve.serve_file(request, path, public=True)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'job.settings')
 
 application = get_asgi_application()
+
+# Build in-process indexes before the first request reaches this worker
+from app import autocomplete  # noqa: E402
+
+autocomplete.warm()
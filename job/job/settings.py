@@ -94,6 +94,30 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# 'default' keeps cached objects, fragments and counts in each process.
+# 'versions' keeps the small version tokens saying which of those are still
+# current, and must be shared by every worker process so that a write seen
+# by one reaches the others. The database cache needs no extra service (its
+# table is made by migrate, or manage.py createcachetable); any shared
+# backend such as Redis or memcached works as well.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'app_cache_versions',
+        # One token per cached object. Culling can evict any key, so keys
+        # must hold tokens that never repeat (see pagecache.version), not
+        # counters that would restart at a number already in use
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,4 +163,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / "media"
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / "media"
+# Uploads are stored once per distinct content (see app.storage); run
+# manage.py gc_media to drop blobs no upload uses any more
+STORAGES = {
+    'default': {'BACKEND': 'app.storage.DedupStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# New enrollments keep lesson completion as a bitmap on Enrollment (see app.progress)
+COMPACT_LESSON_PROGRESS = True
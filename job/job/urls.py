@@ -16,9 +16,8 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from app.views import home,  logout_view, about_view
+from app.views import home,  logout_view, about_view, serve_media
 from accounts.views import employee_view, signup_view,login_view
-from django.conf.urls.static import static
 from django.conf import settings
 
 app_name = 'job'
@@ -31,8 +30,8 @@ urlpatterns = [
     path('signup/', signup_view, name='signup'), 
     path('logout/', logout_view, name='logout'),
     path('about/', about_view, name='about_view'),
+    # Media goes through a view so protected uploads stay protected; with
+    # FILE_SERVE_BACKEND set, the front server still moves the bytes
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
     path('',include('app.urls', namespace='app'))
-]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'job.settings')
 
 application = get_wsgi_application()
+
+# Build in-process indexes before the first request reaches this worker
+from app import autocomplete  # noqa: E402
+
+autocomplete.warm()